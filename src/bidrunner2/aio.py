@@ -0,0 +1,395 @@
+import asyncio
+import importlib.util
+import time
+
+from bidrunner2.batch import MANIFEST_FIELDS, row_size, validate_manifest_row
+from bidrunner2.clients import EXPIRED_TOKEN_CODES
+from bidrunner2.sizing import task_size
+
+
+def available():
+    # aiobotocore (the `aio` extra) loads botocore, only import it when a backend opens
+    return importlib.util.find_spec("aiobotocore") is not None
+
+
+def require_aiobotocore():
+    if not available():
+        raise RuntimeError(
+            "the async backend needs aiobotocore, install it with `pip install bidrunner2[aio]`"
+        )
+
+
+class AsyncBackend:
+    """
+    The AWS calls `BidRunner` makes most, on aiobotocore: RunTask, DescribeTasks,
+    receiving and deleting queue messages and listing buckets. Results go through the
+    same runner, tracker, message store and listing cache as the threaded calls.
+
+    Use as `async with AsyncBackend(runner) as backend:`. One client is created per
+    (service, region) for the life of the backend, and calls fan out with
+    `asyncio.gather`, at most `max_concurrency` in flight per service. As with
+    `ClientRegistry`, a call that fails because the session token expired is retried
+    once with new credentials.
+    """
+
+    def __init__(self, runner, max_concurrency=16):
+        require_aiobotocore()
+        self.runner = runner
+        self.max_concurrency = max_concurrency
+        self._session = None
+        self._clients = {}
+        # clients dropped after a credential refresh, calls may still be using them
+        self._retired = []
+        self._client_lock = None
+        self._semaphores = {}
+
+    async def __aenter__(self):
+        return self.open()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def open(self):
+        """
+        Start a session, for a backend kept open across calls (e.g. by the app) and
+        closed with `close`, on the same event loop.
+        """
+        from aiobotocore.session import get_session
+
+        self._session = get_session()
+        if self.runner.metrics is not None:
+            self.runner.metrics.install(self._session)
+        self._client_lock = asyncio.Lock()
+        return self
+
+    async def close(self):
+        clients = self._retired + list(self._clients.values())
+        self._clients, self._retired = {}, []
+        for client in clients:
+            await client.close()
+
+    async def client(self, service, region_name):
+        key = (service, region_name)
+        async with self._client_lock:
+            if key not in self._clients:
+                from aiobotocore.config import AioConfig
+
+                registry = self.runner.clients
+                config = AioConfig(
+                    max_pool_connections=max(
+                        self.max_concurrency, registry.max_pool_connections
+                    ),
+                    connect_timeout=registry.connect_timeout,
+                    read_timeout=registry.read_timeout,
+                )
+                self._clients[key] = await self._session.create_client(
+                    service,
+                    region_name=region_name,
+                    config=config,
+                    **registry.aws_creds,
+                ).__aenter__()
+            return self._clients[key]
+
+    async def refresh_credentials(self, stale_client):
+        """
+        Pick up new credentials through `ClientRegistry.refresh_credentials` and drop
+        every client, unless another call already did since `stale_client` was made.
+        """
+        async with self._client_lock:
+            if stale_client not in self._clients.values():
+                return
+            await asyncio.to_thread(self.runner.clients.refresh_credentials)
+            self._retired.extend(self._clients.values())
+            self._clients = {}
+
+    def semaphore(self, service):
+        if service not in self._semaphores:
+            self._semaphores[service] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[service]
+
+    async def with_client(self, service, region_name, request):
+        """
+        Await `request(client)` with the client for `service` in `region_name`,
+        retrying once with new credentials when the session token expired.
+        """
+        from botocore.exceptions import ClientError
+
+        for retry in (False, True):
+            client = await self.client(service, region_name)
+            try:
+                async with self.semaphore(service):
+                    return await request(client)
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code")
+                if retry or code not in EXPIRED_TOKEN_CODES:
+                    raise
+                await self.refresh_credentials(client)
+
+    async def call(self, service, region_name, operation, **params):
+        return await self.with_client(
+            service,
+            region_name,
+            lambda client: getattr(client, operation)(**params),
+        )
+
+    # S3 ----------------------------------------
+
+    async def s3_list_folders(self, bucket, prefix=""):
+        """
+        Folder prefixes directly under `prefix`, as `BidRunner.s3_list` with a "/"
+        delimiter.
+        """
+
+        async def list_folders(client):
+            folders = []
+            paginator = client.get_paginator("list_objects_v2")
+            async for page in paginator.paginate(
+                Bucket=bucket, Prefix=prefix, Delimiter="/"
+            ):
+                folders.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+            return folders
+
+        return await self.with_client("s3", "us-west-2", list_folders)
+
+    async def s3_refresh_buckets(self, s3_roots, force=False):
+        """
+        List every root whose cached listing is stale (or all of them with `force`) at
+        the same time, see `BidRunner.s3_refresh_buckets`.
+        """
+        runner = self.runner
+        if force:
+            stale = list(s3_roots)
+        else:
+            stale = [r for r in s3_roots if not runner.s3_get_cached_buckets(r)[1]]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self.s3_list_folders(r) for r in stale))
+        listings = {}
+        for s3_root, folders in zip(stale, results):
+            await asyncio.to_thread(runner.listing_cache.put, s3_root, folders)
+            listings[s3_root] = [(f, f) for f in folders]
+        runner.metrics.observe("refresh_listings", time.perf_counter() - start)
+        return listings
+
+    # SQS ---------------------------------------
+
+    async def sqs_receive_messages(self, queue_url, wait_time=20):
+        resp = await self.call(
+            "sqs",
+            "us-east-2",
+            "receive_message",
+            QueueUrl=queue_url,
+            AttributeNames=["All"],
+            MessageAttributeNames=["All"],
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=wait_time,
+        )
+        messages = [
+            self.runner.sqs_process_message(m) for m in resp.get("Messages", [])
+        ]
+        return sorted(messages, key=lambda x: x["timestamp"])
+
+    async def sqs_delete_messages(self, queue_url, messages):
+        """
+        Acknowledge messages 10 at a time, every batch at once. Returns the ids of any
+        messages that could not be deleted.
+        """
+        batches = [messages[i : i + 10] for i in range(0, len(messages), 10)]
+        responses = await asyncio.gather(
+            *(
+                self.call(
+                    "sqs",
+                    "us-east-2",
+                    "delete_message_batch",
+                    QueueUrl=queue_url,
+                    Entries=[
+                        {"Id": str(n), "ReceiptHandle": m.get("receipt")}
+                        for n, m in enumerate(batch)
+                    ],
+                )
+                for batch in batches
+            )
+        )
+        return [
+            batch[int(f["Id"])].get("id")
+            for batch, resp in zip(batches, responses)
+            for f in resp.get("Failed", [])
+        ]
+
+    async def sqs_poll(self, queue_url, wait_time=1, max_batches=5):
+        """
+        Drain up to `max_batches` batches of the queue into the message store, as a
+        demuxing `SqsConsumer` cycle. Returns the messages not stored before.
+        """
+        # the first receive waits a little, short polls can miss messages on an
+        # almost empty queue
+        runner = self.runner
+        added = []
+        for batch_number in range(max_batches):
+            messages = await self.sqs_receive_messages(
+                queue_url, wait_time if batch_number == 0 else 0
+            )
+            # the store is shared with the consumer thread, never wait on it here
+            new = await asyncio.to_thread(runner.message_store.add_messages, messages)
+            if messages:
+                await self.sqs_delete_messages(queue_url, messages)
+            for message in new:
+                runner.metrics.end_span(
+                    "submit_to_first_message", message.get("bid_name")
+                )
+            added.extend(new)
+            if len(messages) < 10:
+                break
+        return added
+
+    async def consume_queue(
+        self, queue_url, on_messages, on_error=None, wait_time=20, error_backoff=5
+    ):
+        """
+        Keep draining the queue into the message store, as a demuxing `SqsConsumer`
+        thread does: each cycle long-polls up to `wait_time` seconds, and the messages
+        not stored before are handed to `on_messages`. Runs until cancelled.
+        """
+        while True:
+            try:
+                new = await self.sqs_poll(queue_url, wait_time=wait_time)
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+                await asyncio.sleep(error_backoff)
+                continue
+            if new:
+                on_messages(new)
+
+    # ECS ---------------------------------------
+
+    async def refresh_tasks(self):
+        """
+        Describe every tracked task that has not stopped yet, all clusters and
+        regions at once. Returns the arns whose status changed.
+        """
+        tracker = self.runner.tracker
+        responses = await asyncio.gather(
+            *(
+                self.call("ecs", region, "describe_tasks", cluster=cluster, tasks=arns)
+                for region, cluster, arns in tracker.describe_batches()
+            )
+        )
+        return await asyncio.to_thread(tracker.apply_responses, responses)
+
+    async def follow_tasks(self, on_update, on_error=None, wake_check=0.25):
+        """
+        Keep refreshing the tracked tasks, as the `TaskTracker` thread does: every
+        `next_interval` seconds, or sooner when a new task is tracked (checked every
+        `wake_check` seconds). `on_update` gets the arns whose status changed. Runs
+        until cancelled.
+        """
+        tracker = self.runner.tracker
+        while True:
+            tracker.clear_wake()
+            try:
+                changed = await self.refresh_tasks() if tracker.active_tasks() else []
+                if changed:
+                    on_update(changed)
+                interval = tracker.next_interval(changed=bool(changed))
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+                interval = tracker.slow_interval
+            deadline = None if interval is None else time.monotonic() + interval
+            while not tracker.woken and (
+                deadline is None or time.monotonic() < deadline
+            ):
+                await asyncio.sleep(wake_check)
+
+    async def submit_task(self, args, cpu=None, memory=None):
+        """
+        Start a task for a bid, as `BidRunner.submit_task`.
+        """
+        runner = self.runner
+        cpu, memory = task_size(cpu, memory)
+        overrides = runner.task_overrides(args, cpu, memory)
+        # the bucket region is looked up once, later bids find it cached
+        targets = await asyncio.to_thread(runner.placements_for_input)
+        for attempt, placement in enumerate(targets, start=1):
+            await asyncio.sleep(runner.run_task_limiter.reserve())
+            resp = await self.call(
+                "ecs",
+                placement["region"],
+                "run_task",
+                **runner.run_task_params(placement, overrides),
+            )
+            task_arn = runner.started_task_arn(
+                resp, args, placement, last=attempt == len(targets)
+            )
+            if task_arn:
+                break
+        # the run history is sqlite, written to off the event loop
+        await asyncio.to_thread(
+            runner.record_task, args, placement["cluster"], task_arn, cpu, memory
+        )
+        return task_arn
+
+    async def submit_batch(self, rows, on_result=None):
+        """
+        Submit every row of a manifest at once, see `batch.submit_batch` for the
+        results.
+        """
+
+        async def submit_row(index, row):
+            result = {
+                "row": index,
+                "bid_name": row.get("bid_name"),
+                "task_arn": None,
+                "latency": 0.0,
+                "error": validate_manifest_row(row),
+            }
+            if result["error"] is None:
+                start = time.perf_counter()
+                try:
+                    args = [row[k] for k in MANIFEST_FIELDS]
+                    cpu, memory = row_size(row)
+                    result["task_arn"] = await self.submit_task(
+                        args, cpu=cpu, memory=memory
+                    )
+                except Exception as e:
+                    result["error"] = str(e)
+                result["latency"] = time.perf_counter() - start
+            if on_result:
+                on_result(result)
+            return result
+
+        return await asyncio.gather(
+            *(submit_row(i, row) for i, row in enumerate(rows, start=1))
+        )
+
+    # ---------------------------------------------
+
+    async def refresh(self, s3_roots=(), queue_url=None, force=False):
+        """
+        List the stale bucket roots, drain the queue (when `queue_url` is given) and
+        refresh task statuses at the same time.
+
+        Returns {"listings", "messages", "changed"}, each the result of its step or the
+        exception it raised, so one failing does not lose the others.
+        """
+        steps = {
+            "listings": self.s3_refresh_buckets(s3_roots, force=force),
+            "changed": self.refresh_tasks(),
+        }
+        if queue_url:
+            steps["messages"] = self.sqs_poll(queue_url)
+        results = await asyncio.gather(*steps.values(), return_exceptions=True)
+        return {"messages": [], **dict(zip(steps, results))}
+
+
+def submit_batch(runner, rows, workers=16, on_result=None):
+    """
+    `batch.submit_batch` on the async backend, with up to `workers` RunTask calls in
+    flight. Runs its own event loop, call it from a thread that has none.
+    """
+
+    async def submit():
+        async with AsyncBackend(runner, max_concurrency=workers) as backend:
+            return await backend.submit_batch(rows, on_result=on_result)
+
+    return asyncio.run(submit())
@@ -0,0 +1,163 @@
+import csv
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import toml
+
+from bidrunner2.sizing import task_size
+
+# columns expected in every manifest row, in the order `BidRunner.run` expects them
+MANIFEST_FIELDS = ["bid_name", "input_prefix", "shapefile", "output_prefix"]
+
+# optional columns, the task size of a bid (cpu units and memory in MiB)
+SIZE_FIELDS = ["cpu", "memory"]
+
+# optional column, bids with a higher priority leave the submission queue first
+PRIORITY_FIELD = "priority"
+
+
+def read_manifest(manifest_path):
+    """
+    Read a batch manifest into a list of row dicts.
+
+    CSV manifests need a header row with the columns in MANIFEST_FIELDS, and may add
+    those in SIZE_FIELDS and PRIORITY_FIELD. TOML manifests list each bid as a `[[bids]]` table with the
+    same keys.
+    """
+    manifest_path = pathlib.Path(manifest_path).expanduser()
+    if manifest_path.suffix.lower() == ".toml":
+        with open(manifest_path, "r") as f:
+            rows = toml.load(f).get("bids", [])
+    else:
+        with open(manifest_path, "r", newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    return [
+        {
+            k: str(row.get(k) or "").strip()
+            for k in MANIFEST_FIELDS + SIZE_FIELDS + [PRIORITY_FIELD]
+        }
+        for row in rows
+    ]
+
+
+def validate_manifest_row(row):
+    missing = [k for k in MANIFEST_FIELDS if not row.get(k)]
+    if missing:
+        return f"missing values for: {', '.join(missing)}"
+    invalid = [k for k in SIZE_FIELDS if row.get(k) and not str(row[k]).isdigit()]
+    if invalid:
+        return f"expected whole numbers for: {', '.join(invalid)}"
+    try:
+        task_size(row.get("cpu"), row.get("memory"))
+    except ValueError as e:
+        return str(e)
+    if row.get(PRIORITY_FIELD) and not str(row[PRIORITY_FIELD]).lstrip("-").isdigit():
+        return f"expected a whole number for: {PRIORITY_FIELD}"
+    return None
+
+
+def row_size(row):
+    """
+    The (cpu, memory) a manifest row runs at, see `sizing.task_size`. (None, None)
+    when it has neither.
+    """
+    return task_size(*(row.get(k) for k in SIZE_FIELDS))
+
+
+def row_priority(row, default=0):
+    """
+    The queue priority of a manifest row, `default` if it has none.
+    """
+    return int(row[PRIORITY_FIELD]) if row.get(PRIORITY_FIELD) else default
+
+
+def queue_batch(runner, rows, priority=0):
+    """
+    Queue every valid row of a manifest on the runner's `SubmissionScheduler`, which
+    holds them back while `max_running` tasks run and retries throttled submissions
+    and those refused for lack of capacity. Rows without a priority of their own
+    get `priority`.
+
+    Returns the queued jobs, and (row number, bid name, error) for the invalid rows.
+    """
+    jobs = []
+    invalid = []
+    for index, row in enumerate(rows, start=1):
+        error = validate_manifest_row(row)
+        if error:
+            invalid.append((index, row.get("bid_name"), error))
+            continue
+        cpu, memory = row_size(row)
+        jobs.append(
+            runner.scheduler.submit(
+                [row[k] for k in MANIFEST_FIELDS],
+                priority=row_priority(row, priority),
+                cpu=cpu,
+                memory=memory,
+            )
+        )
+    return jobs, invalid
+
+
+def submit_batch(runner, rows, workers=16, on_result=None):
+    """
+    Submit every row of a manifest at once through a pool of `workers` threads,
+    without the limits and retries of the submission queue (see `queue_batch`).
+
+    Returns one result dict per row (in manifest order) with the task arn, the time
+    it took to submit and the error if the submission failed. `on_result` is called
+    with each result as soon as it is available.
+    """
+    # every worker may be calling RunTask in the same region at once
+    for region in {placement["region"] for placement in runner.placements}:
+        runner.ecs_client(region, max_pool_connections=workers)
+
+    def submit_row(index, row):
+        result = {
+            "row": index,
+            "bid_name": row.get("bid_name"),
+            "task_arn": None,
+            "latency": 0.0,
+            "error": validate_manifest_row(row),
+        }
+        if result["error"] is None:
+            start = time.perf_counter()
+            try:
+                args = [row[k] for k in MANIFEST_FIELDS]
+                cpu, memory = row_size(row)
+                result["task_arn"] = runner.submit_task(args, cpu=cpu, memory=memory)
+            except Exception as e:
+                result["error"] = str(e)
+            result["latency"] = time.perf_counter() - start
+        if on_result:
+            on_result(result)
+        return result
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(submit_row, i, row) for i, row in enumerate(rows, start=1)
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    return sorted(results, key=lambda r: r["row"])
+
+
+def summarize_batch(results, elapsed):
+    submitted = [r for r in results if r["task_arn"]]
+    latencies = sorted(r["latency"] for r in submitted)
+    summary = {
+        "total": len(results),
+        "submitted": len(submitted),
+        "failed": len(results) - len(submitted),
+        "elapsed": elapsed,
+        "latency_p50": 0.0,
+        "latency_max": 0.0,
+    }
+    if latencies:
+        summary["latency_p50"] = latencies[len(latencies) // 2]
+        summary["latency_max"] = latencies[-1]
+    return summary
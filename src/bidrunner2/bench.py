@@ -0,0 +1,422 @@
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+from bidrunner2.batch import submit_batch, summarize_batch
+from bidrunner2.logs import LogBuffer, LogView
+from bidrunner2.runner import BidRunner
+from bidrunner2.sqs import SqsConsumer
+
+# Benchmarks of BidRunner against in-process stand-ins for S3, SQS and ECS, so they
+# measure the app's own overhead and need neither AWS nor a network.
+#
+#   python -m bidrunner2.bench --output bench.json
+#   python -m bidrunner2.bench --compare bench.json
+#
+# The JSON output keeps the same layout across runs: `results` maps each benchmark
+# to its parameters and metrics, compare two files to spot regressions.
+
+SCHEMA_VERSION = 1
+
+QUEUE_URL = "https://sqs.us-east-2.amazonaws.com/000000000000/bench"
+
+
+# AWS stand-ins ----------------------------------------
+
+
+class StubPaginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **params):
+        token = None
+        while True:
+            page = self.method(
+                **params, **({"ContinuationToken": token} if token else {})
+            )
+            yield page
+            token = page.get("NextContinuationToken")
+            if not token:
+                return
+
+
+class StubS3:
+    """
+    A bucket of `prefixes` top level folders, listed 1000 keys per page like S3.
+    """
+
+    def __init__(self, prefixes):
+        self.prefixes = [f"auction-{i:06d}/" for i in range(prefixes)]
+
+    def list_objects_v2(
+        self, Bucket, Prefix="", Delimiter=None, ContinuationToken=None
+    ):
+        start = int(ContinuationToken or 0)
+        page = {"CommonPrefixes": [], "Contents": []}
+        chunk = self.prefixes[start : start + 1000]
+        if Delimiter:
+            page["CommonPrefixes"] = [{"Prefix": p} for p in chunk]
+        if start + 1000 < len(self.prefixes):
+            page["NextContinuationToken"] = str(start + 1000)
+        return page
+
+    def get_paginator(self, name):
+        return StubPaginator(getattr(self, name))
+
+
+class StubSQS:
+    """
+    A queue holding `messages` messages for `bids` bids, at most 10 per receive.
+    """
+
+    def __init__(self, messages, bids=50):
+        self.lock = threading.Lock()
+        self.messages = {}
+        for i in range(messages):
+            self.messages[f"m{i}"] = {
+                "MessageId": f"m{i}",
+                "ReceiptHandle": f"r{i}",
+                "Body": f"bid progress message {i}",
+                "Attributes": {"SentTimestamp": str(1700000000000 + i)},
+                "MessageAttributes": {
+                    "bid_name": {"StringValue": f"bid-{i % bids}", "DataType": "String"}
+                },
+            }
+        self.in_flight = iter(list(self.messages))
+
+    def receive_message(self, MaxNumberOfMessages=10, **params):
+        with self.lock:
+            batch = []
+            for message_id in self.in_flight:
+                batch.append(self.messages[message_id])
+                if len(batch) == MaxNumberOfMessages:
+                    break
+        return {"Messages": batch} if batch else {}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        with self.lock:
+            for entry in Entries:
+                self.messages.pop("m" + entry["ReceiptHandle"][1:], None)
+        return {"Successful": [{"Id": e["Id"]} for e in Entries], "Failed": []}
+
+
+class StubECS:
+    """
+    Starts tasks after `latency` seconds and reports every one of them as RUNNING.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def run_task(self, **params):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.count += 1
+            n = self.count
+        return {
+            "tasks": [{"taskArn": f"arn:aws:ecs:us-east-2:0:task/bench/{n:08d}"}],
+            "failures": [],
+        }
+
+    def describe_tasks(self, cluster, tasks):
+        return {
+            "tasks": [
+                {"taskArn": arn, "lastStatus": "RUNNING", "containers": [{}]}
+                for arn in tasks
+            ],
+            "failures": [],
+        }
+
+
+class StubClients:
+    """
+    Stands in for `ClientRegistry`, handing out the same stub for every region.
+    """
+
+    def __init__(self, **stubs):
+        self.stubs = stubs
+
+    def client(self, service, region_name, max_pool_connections=None):
+        return self.stubs[service]
+
+
+def make_runner(app_dir, **stubs):
+    runner = BidRunner()
+    runner.app_dir = pathlib.Path(app_dir)
+    runner.config = {
+        "app": {"s3_input_root": "bench-input", "s3_output_root": "bench-output"},
+        "aws": {"queue_url": QUEUE_URL},
+        # the benchmarks measure the app, not the RunTask rate limit
+        "scheduler": {"run_task_rate": 1e9, "run_task_burst": 1e9},
+    }
+    runner.clients = StubClients(**stubs)
+    runner.tracker.history = runner.run_history
+    runner.set_logger(LogBuffer())
+    return runner
+
+
+# Benchmarks ----------------------------------------
+
+
+def bench_submit(app_dir, bids=1000, workers=16, latency=0.002):
+    """
+    Submit `bids` bids through the batch path, each RunTask taking `latency` seconds.
+    """
+    runner = make_runner(app_dir, ecs=StubECS(latency))
+    rows = [
+        {
+            "bid_name": f"bid-{i}",
+            "input_prefix": "auction-1/",
+            "shapefile": "auction_1.shp",
+            "output_prefix": f"bid-{i}/",
+        }
+        for i in range(bids)
+    ]
+    start = time.perf_counter()
+    results = submit_batch(runner, rows, workers=workers)
+    elapsed = time.perf_counter() - start
+    summary = summarize_batch(results, elapsed)
+    return {
+        "seconds": elapsed,
+        "bids_per_second": bids / elapsed,
+        "latency_p50": summary["latency_p50"],
+        "latency_max": summary["latency_max"],
+        "failed": summary["failed"],
+    }
+
+
+def bench_status(app_dir, tasks=2000):
+    """
+    One tracker refresh (describe_tasks) over `tasks` running tasks.
+    """
+    runner = make_runner(app_dir, ecs=StubECS())
+    for i in range(tasks):
+        runner.tracker.track("bench", f"arn:aws:ecs:us-east-2:0:task/bench/{i:08d}")
+    start = time.perf_counter()
+    changed = runner.tracker.refresh()
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "tasks_per_second": tasks / elapsed,
+        "changed": len(changed),
+    }
+
+
+def bench_sqs_drain(app_dir, messages=10000):
+    """
+    Drain a queue of `messages` messages through the consumer into the message store.
+    """
+    sqs = StubSQS(messages)
+    runner = make_runner(app_dir, sqs=sqs)
+    received = []
+    consumer = SqsConsumer(
+        runner, QUEUE_URL, on_message=received.append, demux=True, wait_time=0
+    )
+    start = time.perf_counter()
+    while consumer.poll_once():
+        pass
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "messages_per_second": messages / elapsed,
+        "received": len(received),
+        "left_in_queue": len(sqs.messages),
+    }
+
+
+def bench_list_prefixes(app_dir, prefixes=50000):
+    """
+    `s3_get_all_buckets` over a bucket with `prefixes` top level folders.
+    """
+    runner = make_runner(app_dir, s3=StubS3(prefixes))
+    start = time.perf_counter()
+    listing = runner.s3_get_all_buckets("bench-input")
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "prefixes_per_second": prefixes / elapsed,
+        "listed": len(listing),
+    }
+
+
+def bench_richlog(app_dir, lines=100000, frame_lines=1000):
+    """
+    Render `lines` run log lines into a RichLog the way the app does, in one write per
+    `frame_lines` lines, and compare with one write per line for a tenth of them.
+    """
+    try:
+        from textual.app import App
+        from textual.widgets import RichLog
+    except ImportError:
+        return {"skipped": "textual is not installed"}
+
+    class LogApp(App):
+        def compose(self):
+            yield RichLog(markup=True, highlight=True, wrap=True)
+
+    result = {}
+
+    async def run():
+        app = LogApp()
+        async with app.run_test(size=(120, 40)) as pilot:
+            rich_log = app.query_one(RichLog)
+            buffer = LogBuffer(maxlen=lines)
+            view = LogView(buffer, rich_log)
+            start = time.perf_counter()
+            for i in range(lines):
+                buffer.append(
+                    f"[bold green]bid-{i % 50}[/bold green] progress line {i}"
+                )
+                if i % frame_lines == frame_lines - 1:
+                    view.flush()
+            view.flush()
+            await pilot.pause()
+            result["batched_seconds"] = time.perf_counter() - start
+            result["batched_lines_per_second"] = lines / result["batched_seconds"]
+
+            view.clear()
+            per_line = max(1, lines // 10)
+            start = time.perf_counter()
+            for i in range(per_line):
+                rich_log.write(
+                    f"[bold green]bid-{i % 50}[/bold green] progress line {i}"
+                )
+            await pilot.pause()
+            elapsed = time.perf_counter() - start
+            result["per_line_lines_per_second"] = per_line / elapsed
+
+    asyncio.run(run())
+    result["seconds"] = result["batched_seconds"]
+    return result
+
+
+BENCHMARKS = {
+    "submit": bench_submit,
+    "status": bench_status,
+    "sqs_drain": bench_sqs_drain,
+    "list_prefixes": bench_list_prefixes,
+    "richlog": bench_richlog,
+}
+
+# parameters of each benchmark, scaled down with --quick
+DEFAULT_PARAMS = {
+    "submit": {"bids": 1000, "workers": 16, "latency": 0.002},
+    "status": {"tasks": 2000},
+    "sqs_drain": {"messages": 10000},
+    "list_prefixes": {"prefixes": 50000},
+    "richlog": {"lines": 100000, "frame_lines": 1000},
+}
+
+
+def run_benchmarks(names, repeat=3, quick=False):
+    results = {}
+    for name in names:
+        params = dict(DEFAULT_PARAMS[name])
+        if quick:
+            params = {
+                k: max(1, v // 10) if isinstance(v, int) and k != "workers" else v
+                for k, v in params.items()
+            }
+        runs = []
+        for _ in range(repeat):
+            # a fresh directory per run, so databases start empty
+            with tempfile.TemporaryDirectory() as app_dir:
+                runs.append(BENCHMARKS[name](app_dir, **params))
+        if "skipped" in runs[0]:
+            results[name] = {"params": params, "skipped": runs[0]["skipped"]}
+            continue
+        # the median run by time, with every metric taken from that run
+        runs.sort(key=lambda r: r["seconds"])
+        results[name] = {
+            "params": params,
+            "repeat": repeat,
+            "metrics": runs[len(runs) // 2],
+            "seconds_min": runs[0]["seconds"],
+            "seconds_max": runs[-1]["seconds"],
+        }
+    return results
+
+
+def environment():
+    try:
+        from importlib.metadata import version
+
+        package_version = version("bidrunner2")
+    except Exception:
+        package_version = "unknown"
+    return {
+        "bidrunner2": package_version,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(baseline, current):
+    """
+    Lines comparing the time of each benchmark with a baseline result file.
+    """
+    lines = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name, {}).get("metrics")
+        after = result.get("metrics")
+        if not before or not after:
+            continue
+        ratio = after["seconds"] / before["seconds"] if before["seconds"] else 0
+        lines.append(
+            f"{name:15} {before['seconds']:9.4f}s -> {after['seconds']:9.4f}s  x{ratio:.2f}"
+        )
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bidrunner2.bench")
+    parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="BENCHMARK",
+        help=f"benchmarks to run, all by default: {', '.join(BENCHMARKS)}",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--quick", action="store_true", help="a tenth of the default sizes"
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare")
+    args = parser.parse_args(argv)
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    report = {
+        "schema": SCHEMA_VERSION,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment(),
+        "results": run_benchmarks(names, repeat=args.repeat, quick=args.quick),
+    }
+    content = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        pathlib.Path(args.output).write_text(content + "\n")
+    else:
+        print(content)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(baseline, report)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
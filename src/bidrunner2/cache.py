@@ -0,0 +1,136 @@
+import bisect
+import itertools
+import json
+import os
+import pathlib
+import threading
+import time
+
+
+class ListingCache:
+    """
+    On-disk cache of the folder listings of each bucket, so the app can show them
+    straight away on startup and refresh them in the background.
+
+    Listings older than `ttl` seconds are still returned but reported as stale.
+    """
+
+    def __init__(self, path, ttl=300):
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._listings = None
+
+    def _load(self):
+        if self._listings is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._listings = json.load(f)
+            except (OSError, ValueError):
+                self._listings = {}
+        return self._listings
+
+    def get(self, bucket):
+        """
+        Returns (prefixes, fresh) for a bucket, ([], False) if it was never listed.
+        """
+        with self.lock:
+            listing = self._load().get(bucket)
+        if listing is None:
+            return [], False
+        fresh = time.time() - listing["fetched_at"] < self.ttl
+        return listing["prefixes"], fresh
+
+    def put(self, bucket, prefixes):
+        with self.lock:
+            self._load()[bucket] = {"fetched_at": time.time(), "prefixes": prefixes}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(self._listings, f)
+            os.replace(tmp_path, self.path)
+
+
+class ObjectIndex:
+    """
+    On-disk index of the object keys under folders of a bucket, kept sorted so the
+    keys starting with some text are found with a binary search, e.g. to suggest a
+    shapefile while it is typed.
+
+    Each folder is listed on its own when first needed or once older than `ttl`
+    seconds, and keys seen in between (uploaded from the app, or found to exist when
+    validating a bid) are added to the folders already indexed.
+    """
+
+    def __init__(self, path, ttl=300):
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._folders = None
+
+    def _load(self):
+        if self._folders is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._folders = json.load(f)
+            except (OSError, ValueError):
+                self._folders = {}
+        return self._folders
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._folders, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, bucket, prefix):
+        """
+        Returns (keys, fresh) for a folder, keys relative to `prefix` and sorted, or
+        ([], False) if it was never indexed.
+        """
+        with self.lock:
+            folder = self._load().get(bucket, {}).get(prefix)
+        if folder is None:
+            return [], False
+        fresh = time.time() - folder["fetched_at"] < self.ttl
+        return folder["keys"], fresh
+
+    def put(self, bucket, prefix, keys):
+        with self.lock:
+            self._load().setdefault(bucket, {})[prefix] = {
+                "fetched_at": time.time(),
+                "keys": sorted(keys),
+            }
+            self._save()
+
+    def add(self, bucket, keys):
+        """
+        Add full object keys to every indexed folder of `bucket` they are in.
+        """
+        with self.lock:
+            folders = self._load().get(bucket, {})
+            changed = False
+            for key in keys:
+                for prefix, folder in folders.items():
+                    if not key.startswith(prefix):
+                        continue
+                    relative_key = key[len(prefix) :]
+                    i = bisect.bisect_left(folder["keys"], relative_key)
+                    if i == len(folder["keys"]) or folder["keys"][i] != relative_key:
+                        folder["keys"].insert(i, relative_key)
+                        changed = True
+            if changed:
+                self._save()
+
+    def complete(self, bucket, prefix, text, limit=None):
+        """
+        Keys of a folder that start with `text`, in order, at most `limit` of them.
+        """
+        keys, _ = self.get(bucket, prefix)
+        matches = []
+        for key in itertools.islice(keys, bisect.bisect_left(keys, text), None):
+            if not key.startswith(text) or len(matches) == limit:
+                break
+            matches.append(key)
+        return matches
@@ -0,0 +1,526 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import date, datetime, timezone
+
+from rich.text import Text
+
+from bidrunner2.batch import (
+    MANIFEST_FIELDS,
+    queue_batch,
+    read_manifest,
+    submit_batch,
+)
+from bidrunner2.compare import top_changes, write_comparison
+from bidrunner2.placement import parse_task_arn
+from bidrunner2.runner import BidRunner
+from bidrunner2.sqs import SqsConsumer
+
+# Entry point of the `bidrunner2` command. Without a subcommand it starts the app, the
+# subcommands run headless (Textual is never imported) and write one JSON event per
+# line to stdout.
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class EventWriter:
+    """
+    Writes NDJSON events to `stream`, safe to use from several threads. Also works as
+    the runner's logger, logged lines become `log` events with the markup removed.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        record = {"event": event, "time": datetime.now(timezone.utc).isoformat()}
+        record.update(fields)
+        line = json.dumps(record, default=_json_default)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def write(self, content):
+        self.emit("log", message=Text.from_markup(str(content)).plain)
+
+
+def load_runner(events):
+    runner = BidRunner()
+    runner.load_config()
+    runner.configure_clients()
+    aws_config = runner.config.get("aws", {})
+    runner.aws_set_credentials(
+        aws_config.get("aws_access_key_id"),
+        aws_config.get("aws_secret_access_key"),
+        aws_config.get("aws_session_token"),
+    )
+    runner.set_logger(events)
+    return runner
+
+
+def message_fields(message):
+    return {
+        "id": message.get("id"),
+        "bid_name": message.get("bid_name"),
+        "sent_timestamp": message.get("sent_timestamp"),
+        "body": message.get("body"),
+    }
+
+
+def task_fields(task):
+    return {
+        "task_arn": task["task_arn"],
+        "bid_name": task["bid_name"],
+        "cluster": task["cluster"],
+        "status": task["last_status"],
+        "stop_code": task["stop_code"],
+        "stopped_reason": task["stopped_reason"],
+        "exit_code": task["exit_code"],
+        "started_at": task["started_at"],
+        "stopped_at": task["stopped_at"],
+    }
+
+
+def task_cluster(runner, args, task_arn):
+    """
+    Cluster of a task passed with --task: --cluster if given, else the one named in
+    its arn, else the cluster of the first placement target.
+    """
+    _, cluster = parse_task_arn(task_arn)
+    return args.cluster or cluster or runner.placements[0]["cluster"]
+
+
+def task_failed(task):
+    return task["last_status"] == "STOPPED" and task["exit_code"] not in (0, None)
+
+
+# Commands ----------------------------------------
+
+
+def cmd_submit(runner, events, args):
+    if args.manifest:
+        rows = read_manifest(args.manifest)
+    elif len(args.values) == len(MANIFEST_FIELDS):
+        rows = [dict(zip(MANIFEST_FIELDS, args.values))]
+    else:
+        events.emit(
+            "error",
+            message=f"expected {' '.join(MANIFEST_FIELDS)} or --manifest",
+        )
+        return 2
+    # rows without a size of their own take the one given on the command line
+    for row in rows:
+        for field in ("cpu", "memory"):
+            if not row.get(field) and getattr(args, field):
+                row[field] = str(getattr(args, field))
+
+    if not args.direct:
+        return submit_queued(runner, events, rows, args)
+
+    def on_result(result):
+        if result["error"]:
+            events.emit(
+                "submit_failed",
+                row=result["row"],
+                bid_name=result["bid_name"],
+                error=result["error"],
+                latency=round(result["latency"], 4),
+            )
+        else:
+            events.emit(
+                "submitted",
+                row=result["row"],
+                bid_name=result["bid_name"],
+                task_arn=result["task_arn"],
+                latency=round(result["latency"], 4),
+            )
+
+    if runner.use_async_backend:
+        from bidrunner2 import aio
+
+        results = aio.submit_batch(
+            runner, rows, workers=args.workers, on_result=on_result
+        )
+    else:
+        results = submit_batch(runner, rows, workers=args.workers, on_result=on_result)
+    failed = any(r["error"] for r in results)
+    if args.watch:
+        bids = [r["bid_name"] for r in results if r["task_arn"]]
+        code = watch(runner, events, bids, until_stopped=True, timeout=args.timeout)
+        return 1 if failed else code
+    return 1 if failed else 0
+
+
+def submit_queued(runner, events, rows, args):
+    """
+    Submit through the scheduler, which holds bids back while `max_running` tasks are
+    running and retries throttled submissions.
+    """
+    event_names = {
+        "queued": "queued",
+        "submitted": "submitted",
+        "retry": "submit_retry",
+        "failed": "submit_failed",
+    }
+
+    def on_event(event, job):
+        events.emit(
+            event_names[event],
+            bid_name=job["bid_name"],
+            priority=job["priority"],
+            attempts=job["attempts"],
+            task_arn=job["task_arn"],
+            error=job["error"],
+        )
+
+    runner.scheduler.on_event = on_event
+    jobs, invalid = queue_batch(runner, rows, priority=args.priority)
+    for row, bid_name, error in invalid:
+        events.emit("submit_failed", row=row, bid_name=bid_name, error=error)
+    failed = bool(invalid)
+
+    if args.watch:
+        bids = [job["bid_name"] for job in jobs]
+        code = watch(
+            runner, events, bids, until_stopped=True, timeout=args.timeout, jobs=jobs
+        )
+    else:
+        # the tracker notices stopped tasks, making room for the queued bids
+        runner.tracker.on_update = lambda changed: runner.scheduler.wake()
+        runner.tracker.start()
+        code = 0 if runner.scheduler.wait(jobs, timeout=args.timeout) else 1
+        runner.tracker.stop()
+    runner.scheduler.stop()
+    failed = failed or any(job["state"] != "submitted" for job in jobs)
+    return 1 if failed else code
+
+
+def cmd_watch(runner, events, args):
+    for task_arn in args.task:
+        runner.tracker.track(task_cluster(runner, args, task_arn), task_arn)
+    return watch(
+        runner,
+        events,
+        args.bid,
+        until_stopped=args.until_stopped,
+        timeout=args.timeout,
+    )
+
+
+def watch(runner, events, bids, until_stopped=False, timeout=None, jobs=()):
+    """
+    Stream status transitions of the tracked tasks and queue messages of `bids` (of
+    every bid when empty) until interrupted, until every task stopped (and every
+    scheduler job in `jobs` was submitted or failed) with `until_stopped`, or for
+    `timeout` seconds. Returns 1 if a task exited with an error.
+    """
+    bids = set(bids)
+    seen = {}
+    seen_lock = threading.Lock()
+
+    def on_update(changed):
+        runner.scheduler.wake()
+        tasks = {t["task_arn"]: t for t in runner.tracker.snapshot()}
+        with seen_lock:
+            for task_arn in changed:
+                task = tasks[task_arn]
+                events.emit(
+                    "status",
+                    previous_status=seen.get(task_arn, "SUBMITTED"),
+                    **task_fields(task),
+                )
+                seen[task_arn] = task["last_status"]
+
+    def on_message(message):
+        if not bids or message.get("bid_name") in bids:
+            events.emit("message", **message_fields(message))
+
+    runner.tracker.on_update = on_update
+    runner.tracker.on_error = lambda e: events.emit("error", message=str(e))
+    runner.tracker.start()
+
+    consumer = None
+    queue_url = runner.config.get("aws", {}).get("queue_url")
+    if queue_url:
+        consumer = SqsConsumer(
+            runner,
+            queue_url,
+            on_message=on_message,
+            on_error=lambda e: events.emit("error", message=str(e)),
+            demux=True,
+        )
+        consumer.start()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            queued = any(not job["done"].is_set() for job in jobs)
+            if until_stopped and not queued and not runner.tracker.active_tasks():
+                # wait for the final transitions to be written
+                with seen_lock:
+                    if all(
+                        seen.get(t["task_arn"]) == "STOPPED"
+                        for t in runner.tracker.snapshot()
+                    ):
+                        break
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.tracker.stop()
+        if consumer is not None:
+            consumer.stop()
+
+    tasks = runner.tracker.snapshot()
+    events.emit(
+        "watch_done",
+        tasks=len(tasks),
+        stopped=sum(t["last_status"] == "STOPPED" for t in tasks),
+        failed=sum(task_failed(t) for t in tasks),
+    )
+    return 1 if any(task_failed(t) for t in tasks) else 0
+
+
+def cmd_status(runner, events, args):
+    for task_arn in args.task:
+        runner.tracker.track(task_cluster(runner, args, task_arn), task_arn)
+    if args.task:
+        runner.tracker.refresh()
+        for task in runner.tracker.snapshot():
+            events.emit("status", **task_fields(task))
+
+    queue_url = runner.config.get("aws", {}).get("queue_url")
+    if args.bid and queue_url and not args.no_poll:
+        # collect whatever is waiting in the queue without long polling
+        messages = runner.sqs_receive_messages(queue_url, wait_time=0)
+        runner.sqs_store_messages(queue_url, messages)
+    for bid_name in args.bid:
+        for message in runner.message_store.messages_for(bid_name):
+            events.emit("message", **message_fields(message))
+    return 1 if any(task_failed(t) for t in runner.tracker.snapshot()) else 0
+
+
+def cmd_list_inputs(runner, events, args):
+    s3_input_root = runner.config["app"]["s3_input_root"]
+    listing, fresh = runner.s3_get_cached_buckets(s3_input_root)
+    if args.refresh or not fresh:
+        listing = runner.s3_refresh_buckets([s3_input_root], force=True)[s3_input_root]
+    for prefix, _ in listing:
+        events.emit("input", bucket=s3_input_root, prefix=prefix)
+    return 0
+
+
+def cmd_recommend_size(runner, events, args):
+    recommendation = runner.recommend_size(args.input_prefix, args.shapefile)
+    events.emit(
+        "size",
+        input_prefix=args.input_prefix,
+        shapefile=args.shapefile,
+        **recommendation,
+    )
+    return 0
+
+
+def cmd_compare(runner, events, args):
+    compare_config = runner.config.get("compare", {})
+    summaries, comparison = runner.compare_outputs(
+        args.output_prefix,
+        args.value,
+        key_column=args.key or compare_config.get("key_column"),
+        pattern=args.pattern or compare_config.get("pattern", "*.csv"),
+        workers=compare_config.get("workers", 4),
+    )
+    for output_prefix, summary in summaries.items():
+        events.emit(
+            "bid_summary",
+            output_prefix=output_prefix,
+            keys=len(summary["keys"]),
+            rows=int(summary["counts"].sum()),
+            totals=dict(zip(summary["columns"], summary["sums"].sum(axis=0).tolist())),
+        )
+    for k in top_changes(comparison, limit=args.top):
+        events.emit(
+            "comparison",
+            key=comparison["keys"][k].item(),
+            column=args.value,
+            bids=[
+                {
+                    "output_prefix": bid,
+                    "value": _number(comparison["values"][b, k]),
+                    "delta": _number(comparison["deltas"][b, k]),
+                    "rank": int(comparison["ranks"][b, k]),
+                    "rank_change": int(comparison["rank_changes"][b, k]),
+                }
+                for b, bid in enumerate(comparison["bids"])
+            ],
+        )
+    if args.output:
+        events.emit("compare_done", path=str(write_comparison(args.output, comparison)))
+    return 0
+
+
+def _number(value):
+    # NaN, a key the bid has no rows for, is not valid JSON
+    return None if value != value else float(value)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="bidrunner2",
+        description="Without a command the interactive app is started.",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="start the app, exit after the first frame and report import and startup times",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="when a command finishes, write AWS call metrics to PATH (JSON if it ends in .json, Prometheus text otherwise)",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    submit = commands.add_parser("submit", help="submit bids without the app")
+    submit.add_argument(
+        "values",
+        nargs="*",
+        metavar="VALUE",
+        help=f"{' '.join(MANIFEST_FIELDS)} of a single bid",
+    )
+    submit.add_argument("--manifest", help="CSV or TOML manifest of bids to submit")
+    submit.add_argument(
+        "--workers", type=int, default=16, help="threads submitting bids with --direct"
+    )
+    submit.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep streaming events until the submitted tasks stop",
+    )
+    submit.add_argument("--timeout", type=float, default=None)
+    submit.add_argument(
+        "--direct",
+        action="store_true",
+        help="submit every bid at once with --workers threads, without the queue's [scheduler] limits and retries",
+    )
+    submit.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help="bids with a higher priority are submitted first, for rows without a priority column",
+    )
+    submit.add_argument(
+        "--cpu",
+        type=int,
+        help="cpu units of the tasks (1024 = 1 vCPU), instead of the task definition's",
+    )
+    submit.add_argument(
+        "--memory",
+        type=int,
+        help="memory of the tasks in MiB, instead of the task definition's",
+    )
+
+    watch_parser = commands.add_parser(
+        "watch", help="stream task status transitions and queue messages"
+    )
+    watch_parser.add_argument("--bid", action="append", default=[])
+    watch_parser.add_argument("--task", action="append", default=[])
+    watch_parser.add_argument(
+        "--cluster", help="cluster of the --task arns, read from them by default"
+    )
+    watch_parser.add_argument("--until-stopped", action="store_true")
+    watch_parser.add_argument("--timeout", type=float, default=None)
+
+    status = commands.add_parser(
+        "status", help="current status of tasks and stored messages of bids"
+    )
+    status.add_argument("--bid", action="append", default=[])
+    status.add_argument("--task", action="append", default=[])
+    status.add_argument(
+        "--cluster", help="cluster of the --task arns, read from them by default"
+    )
+    status.add_argument(
+        "--no-poll",
+        action="store_true",
+        help="only show stored messages, do not read the queue",
+    )
+
+    list_inputs = commands.add_parser(
+        "list-inputs", help="auction folders in the input bucket"
+    )
+    list_inputs.add_argument(
+        "--refresh", action="store_true", help="ignore the saved listing"
+    )
+
+    recommend = commands.add_parser(
+        "recommend-size",
+        help="suggest the cpu and memory of a bid from past runs on similar inputs",
+    )
+    recommend.add_argument("input_prefix")
+    recommend.add_argument("shapefile")
+
+    compare_parser = commands.add_parser(
+        "compare",
+        help="compare the output tables of several bids, the first one is the baseline",
+    )
+    compare_parser.add_argument("output_prefix", nargs="+")
+    compare_parser.add_argument(
+        "--value", required=True, help="numeric column to compare"
+    )
+    compare_parser.add_argument(
+        "--key", help="column the rows are totalled by, the first column by default"
+    )
+    compare_parser.add_argument(
+        "--pattern", help="output files to read, default *.csv (.csv.gz also works)"
+    )
+    compare_parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="keys that changed the most to report, default 20",
+    )
+    compare_parser.add_argument(
+        "--output", help="write the full comparison of every key to this CSV file"
+    )
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        # the app is only imported when it is going to be shown
+        from bidrunner2.main import main as app_main
+
+        return app_main(["--profile-startup"] if args.profile_startup else [])
+
+    events = EventWriter()
+    runner = None
+    try:
+        runner = load_runner(events)
+        handler = {
+            "submit": cmd_submit,
+            "watch": cmd_watch,
+            "status": cmd_status,
+            "list-inputs": cmd_list_inputs,
+            "recommend-size": cmd_recommend_size,
+            "compare": cmd_compare,
+        }[args.command]
+        return handler(runner, events, args)
+    except Exception as e:
+        events.emit("error", message=str(e))
+        return 2
+    finally:
+        if args.metrics and runner is not None:
+            events.emit("metrics", path=runner.metrics.export(args.metrics))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
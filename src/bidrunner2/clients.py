@@ -0,0 +1,141 @@
+import threading
+
+# boto3 and botocore are imported on first use, they are slow to import and not
+# needed to draw the app
+
+# error codes returned by AWS once a session token is no longer valid
+EXPIRED_TOKEN_CODES = {
+    "ExpiredToken",
+    "ExpiredTokenException",
+    "RequestExpired",
+    "InvalidClientTokenId",
+}
+
+
+class ClientRegistry:
+    """
+    Keeps a single boto3 Session and one client per (service, region) on top of it, so
+    endpoint resolution, credential lookup and connections are reused across calls.
+
+    Clients are rebuilt whenever the credentials change, or when AWS reports that the
+    session token expired, in which case `credential_source` is called for new ones.
+    Every call made through them is recorded by `metrics` (a `Metrics`) if given.
+    """
+
+    def __init__(
+        self,
+        max_pool_connections=10,
+        tcp_keepalive=True,
+        connect_timeout=10,
+        read_timeout=60,
+        credential_source=None,
+        metrics=None,
+    ):
+        self.max_pool_connections = max_pool_connections
+        self.tcp_keepalive = tcp_keepalive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.credential_source = credential_source
+        self.metrics = metrics
+        self.aws_creds = {}
+        self._lock = threading.RLock()
+        self._session = None
+        self._clients = {}
+
+    def set_credentials(self, aws_creds):
+        with self._lock:
+            if aws_creds == self.aws_creds and self._session is not None:
+                return
+            self.aws_creds = dict(aws_creds)
+            self._session = None
+            self._clients = {}
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import boto3
+
+                self._session = boto3.Session(**self.aws_creds)
+                if self.metrics is not None:
+                    self.metrics.install(self._session)
+            return self._session
+
+    def client_config(self, max_pool_connections=None):
+        from botocore.config import Config
+
+        return Config(
+            max_pool_connections=max_pool_connections or self.max_pool_connections,
+            tcp_keepalive=self.tcp_keepalive,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+        )
+
+    def client(self, service, region_name, max_pool_connections=None):
+        """
+        Return the shared client for `service` in `region_name`. Asking for a bigger
+        connection pool than the cached client has replaces it with a larger one.
+        """
+        pool_size = max(max_pool_connections or 0, self.max_pool_connections)
+        key = (service, region_name)
+        with self._lock:
+            cached = self._clients.get(key)
+            if cached is None or cached.pool_size < pool_size:
+                raw = self.session.client(
+                    service,
+                    region_name=region_name,
+                    config=self.client_config(pool_size),
+                )
+                cached = RefreshingClient(self, key, raw, pool_size)
+                self._clients[key] = cached
+            return cached
+
+    def refresh_credentials(self):
+        """
+        Drop the session and every client, picking up new credentials from
+        `credential_source` if there is one.
+        """
+        with self._lock:
+            if self.credential_source is not None:
+                self.aws_creds = dict(self.credential_source())
+            self._session = None
+            self._clients = {}
+
+    def raw_client(self, key):
+        with self._lock:
+            cached = self._clients.get(key)
+            if cached is None:
+                cached = self.client(*key)
+            return cached.raw
+
+
+class RefreshingClient:
+    """
+    Thin proxy over a botocore client that retries a call once with rebuilt clients
+    when it fails because the session token expired.
+    """
+
+    def __init__(self, registry, key, raw, pool_size):
+        self.registry = registry
+        self.key = key
+        self.raw = raw
+        self.pool_size = pool_size
+
+    def __getattr__(self, name):
+        attr = getattr(self.raw, name)
+        if not callable(attr) or name in ("get_paginator", "get_waiter"):
+            return attr
+
+        def call(*args, **kwargs):
+            from botocore.exceptions import ClientError
+
+            try:
+                return attr(*args, **kwargs)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in EXPIRED_TOKEN_CODES:
+                    raise
+                self.registry.refresh_credentials()
+                self.raw = self.registry.raw_client(self.key)
+                return getattr(self.raw, name)(*args, **kwargs)
+
+        return call
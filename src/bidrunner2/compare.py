@@ -0,0 +1,291 @@
+import csv
+import functools
+import gzip
+import hashlib
+import io
+import os
+import pathlib
+
+# numpy is imported on first use, it is optional (installed with the `compare` extra)
+# and slow to import, the app and the other commands never need it
+
+# rows parsed and aggregated at a time, bounds memory whatever the size of a table
+CHUNK_ROWS = 100_000
+
+
+def require_numpy():
+    """
+    The numpy module, or a RuntimeError saying how to install it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError(
+            "comparing outputs needs numpy, install it with `pip install bidrunner2[compare]`"
+        ) from None
+    return numpy
+
+
+def text_lines(body, key):
+    """
+    Lines of an S3 object body as text, decompressed if `key` ends in `.gz`.
+    """
+    if key.endswith(".gz"):
+        body = gzip.GzipFile(fileobj=body)
+    return io.TextIOWrapper(body, encoding="utf-8", newline="")
+
+
+def iter_chunks(lines, chunk_rows=CHUNK_ROWS):
+    """
+    Yield (header, columns) for every `chunk_rows` rows of a CSV table, `columns`
+    holds one tuple of strings per column of the header.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header:
+        return
+    width = len(header)
+    rows = []
+    for row in reader:
+        if not row:
+            continue
+        if len(row) != width:
+            row = (row + [""] * width)[:width]
+        rows.append(row)
+        if len(rows) == chunk_rows:
+            yield header, list(zip(*rows))
+            rows = []
+    if rows:
+        yield header, list(zip(*rows))
+
+
+def _floats(values):
+    np = require_numpy()
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        return np.array([_float(v) for v in values], dtype=np.float64)
+
+
+def _float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
+
+def _is_numeric(values):
+    np = require_numpy()
+    try:
+        np.array([v for v in values if v != ""], dtype=np.float64)
+    except ValueError:
+        return False
+    return True
+
+
+def summarize_table(lines, key_column=None, chunk_rows=CHUNK_ROWS):
+    """
+    Totals of every numeric column of a CSV table for each value of `key_column`
+    (the first column by default), aggregated `chunk_rows` rows at a time.
+
+    Returns a summary: a dict of the sorted unique `keys`, the names of the numeric
+    `columns`, their `sums` (one row per key) and the `counts` of rows per key.
+    Values that are not numbers count as 0.
+    """
+    np = require_numpy()
+    parts = []
+    columns = []
+    for header, values in iter_chunks(lines, chunk_rows):
+        key_index = header.index(key_column) if key_column else 0
+        if not parts:
+            # the columns are typed from the first chunk
+            numeric = [
+                i
+                for i, column in enumerate(values)
+                if i != key_index and _is_numeric(column)
+            ]
+            columns = [header[i] for i in numeric]
+        keys, inverse = np.unique(np.array(values[key_index]), return_inverse=True)
+        sums = np.zeros((len(keys), len(numeric)))
+        for j, i in enumerate(numeric):
+            sums[:, j] = np.bincount(
+                inverse, weights=np.nan_to_num(_floats(values[i])), minlength=len(keys)
+            )
+        parts.append(
+            {
+                "keys": keys,
+                "columns": columns,
+                "sums": sums,
+                "counts": np.bincount(inverse, minlength=len(keys)),
+            }
+        )
+    if not parts:
+        return empty_summary(columns)
+    return merge_summaries(parts)
+
+
+def empty_summary(columns=()):
+    np = require_numpy()
+    return {
+        "keys": np.array([], dtype=str),
+        "columns": list(columns),
+        "sums": np.zeros((0, len(columns))),
+        "counts": np.zeros(0, dtype=np.int64),
+    }
+
+
+def merge_summaries(summaries):
+    """
+    One summary adding up several, e.g. the chunks of a table or the tables of a bid.
+    Columns missing from a summary count as 0 for its keys.
+    """
+    np = require_numpy()
+    summaries = list(summaries)
+    columns = []
+    for summary in summaries:
+        columns.extend(c for c in summary["columns"] if c not in columns)
+    if not summaries:
+        return empty_summary(columns)
+    keys, inverse = np.unique(
+        np.concatenate([s["keys"] for s in summaries]), return_inverse=True
+    )
+    sums = np.zeros((len(keys), len(columns)))
+    counts = np.zeros(len(keys), dtype=np.int64)
+    start = 0
+    for summary in summaries:
+        rows = inverse[start : start + len(summary["keys"])]
+        start += len(summary["keys"])
+        targets = [columns.index(c) for c in summary["columns"]]
+        np.add.at(sums, (rows[:, None], np.array(targets, dtype=int)), summary["sums"])
+        np.add.at(counts, rows, summary["counts"])
+    return {"keys": keys, "columns": columns, "sums": sums, "counts": counts}
+
+
+def save_summary(path, summary):
+    """
+    Write a summary as a compressed .npz file, replacing it in one step.
+    """
+    np = require_numpy()
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            keys=summary["keys"],
+            columns=np.array(summary["columns"], dtype=str),
+            sums=summary["sums"],
+            counts=summary["counts"],
+        )
+    os.replace(tmp_path, path)
+
+
+def load_summary(path):
+    """
+    A summary saved by `save_summary`, None if there is none at `path`.
+    """
+    np = require_numpy()
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {
+                "keys": data["keys"],
+                "columns": data["columns"].tolist(),
+                "sums": data["sums"],
+                "counts": data["counts"],
+            }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def summary_cache_name(bucket, key, etag, key_column):
+    # an object's etag changes with its content, so a cached summary never goes stale
+    name = f"{bucket}/{key}/{etag}/{key_column or ''}"
+    return hashlib.sha1(name.encode()).hexdigest() + ".npz"
+
+
+def compare_bids(summaries, value_column):
+    """
+    Line up the totals of `value_column` for each key across bids. `summaries` maps
+    each bid to its summary, the first bid is the baseline of the deltas and rank
+    changes.
+
+    Returns the `bids`, the union of their `keys`, and arrays with one row per bid:
+    `values` (NaN where a bid has no rows for a key), `deltas` from the baseline (a
+    missing total counts as 0, NaN when both are missing), `ranks` (1 for the
+    largest total, keys a bid lacks last) and `rank_changes` (positive when a key
+    moved up from its baseline rank).
+    """
+    np = require_numpy()
+    bids = list(summaries)
+    keys = functools.reduce(
+        np.union1d, [s["keys"] for s in summaries.values()], np.array([], dtype=str)
+    )
+    values = np.full((len(bids), len(keys)), np.nan)
+    for i, bid in enumerate(bids):
+        summary = summaries[bid]
+        if value_column in summary["columns"]:
+            column = summary["columns"].index(value_column)
+            values[i, np.searchsorted(keys, summary["keys"])] = summary["sums"][
+                :, column
+            ]
+    order = np.argsort(-np.nan_to_num(values, nan=-np.inf), axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(
+        ranks, order, np.broadcast_to(np.arange(1, len(keys) + 1), order.shape), axis=1
+    )
+    filled = np.nan_to_num(values)
+    deltas = filled - filled[:1]
+    deltas[np.isnan(values) & np.isnan(values[:1])] = np.nan
+    return {
+        "bids": bids,
+        "keys": keys,
+        "value_column": value_column,
+        "values": values,
+        "deltas": deltas,
+        "ranks": ranks,
+        "rank_changes": ranks[:1] - ranks,
+    }
+
+
+def top_changes(comparison, limit=20):
+    """
+    Indexes of the `limit` keys whose total moved furthest from the baseline in any bid.
+    """
+    np = require_numpy()
+    if not len(comparison["keys"]):
+        return []
+    spread = np.nanmax(np.abs(np.nan_to_num(comparison["deltas"])), axis=0)
+    return np.argsort(-spread, kind="stable")[:limit].tolist()
+
+
+def write_comparison(path, comparison):
+    """
+    Write a comparison as CSV: one row per key with the value, delta, rank and rank
+    change of every bid.
+    """
+    np = require_numpy()
+    path = pathlib.Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        header = ["key"]
+        for bid in comparison["bids"]:
+            header.extend(
+                f"{bid} {name}" for name in ("value", "delta", "rank", "rank_change")
+            )
+        writer.writerow(header)
+        for k, key in enumerate(comparison["keys"].tolist()):
+            row = [key]
+            for b in range(len(comparison["bids"])):
+                value = comparison["values"][b, k]
+                delta = comparison["deltas"][b, k]
+                row.extend(
+                    [
+                        "" if np.isnan(value) else value,
+                        "" if np.isnan(delta) else delta,
+                        comparison["ranks"][b, k],
+                        comparison["rank_changes"][b, k],
+                    ]
+                )
+            writer.writerow(row)
+    return path
@@ -0,0 +1,239 @@
+import sqlite3
+import threading
+import time
+
+# statuses a task goes through, in order
+TASK_STATUSES = [
+    "SUBMITTED",
+    "PROVISIONING",
+    "PENDING",
+    "ACTIVATING",
+    "RUNNING",
+    "DEACTIVATING",
+    "STOPPING",
+    "DEPROVISIONING",
+    "STOPPED",
+]
+
+# the columns returned when listing runs, in order
+RUN_COLUMNS = [
+    "task_arn",
+    "bid_name",
+    "input_prefix",
+    "shapefile",
+    "output_prefix",
+    "cluster",
+    "status",
+    "stop_code",
+    "stopped_reason",
+    "exit_code",
+    "submitted_at",
+    "started_at",
+    "stopped_at",
+    "cpu",
+    "memory",
+    "input_bytes",
+    "feature_count",
+]
+
+# columns added after the first version of the table, with their types
+_ADDED_COLUMNS = {
+    "cpu": "INTEGER",
+    "memory": "INTEGER",
+    "input_bytes": "INTEGER",
+    "feature_count": "INTEGER",
+}
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if hasattr(value, "timestamp"):
+        return value.timestamp()
+    return float(value)
+
+
+def _prefix_pattern(prefix):
+    # GLOB is case sensitive so it can use the bid_name index, [] escapes wildcards
+    escaped = "".join(f"[{c}]" if c in "*?[" else c for c in prefix)
+    return escaped + "*"
+
+
+class RunHistory:
+    """
+    Local SQLite record of every bid submitted from this computer: its parameters,
+    task, and how the task ended. Listing is paginated newest first on
+    (submitted_at, task_arn) so any page is a single index range scan.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    task_arn TEXT PRIMARY KEY,
+                    bid_name TEXT NOT NULL,
+                    input_prefix TEXT,
+                    shapefile TEXT,
+                    output_prefix TEXT,
+                    cluster TEXT,
+                    status TEXT NOT NULL,
+                    stop_code TEXT,
+                    stopped_reason TEXT,
+                    exit_code INTEGER,
+                    submitted_at REAL NOT NULL,
+                    started_at REAL,
+                    stopped_at REAL,
+                    cpu INTEGER,
+                    memory INTEGER,
+                    input_bytes INTEGER,
+                    feature_count INTEGER
+                )
+                """
+            )
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(runs)")}
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    self.conn.execute(
+                        f"ALTER TABLE runs ADD COLUMN {column} {column_type}"
+                    )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_submitted ON runs (submitted_at, task_arn)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_bid ON runs (bid_name, submitted_at, task_arn)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_status ON runs (status, submitted_at, task_arn)"
+            )
+
+    def record_submission(
+        self,
+        task_arn,
+        cluster,
+        args,
+        submitted_at=None,
+        cpu=None,
+        memory=None,
+        input_bytes=None,
+        feature_count=None,
+    ):
+        """
+        Add a run for a task just started, `args` are the container arguments: bid
+        name, input prefix, shapefile and output prefix. `cpu` and `memory` are the
+        overrides the task was started with, None for the task definition's.
+        """
+        bid_name, input_prefix, shapefile, output_prefix = (list(args) + [None] * 4)[:4]
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO runs (task_arn, bid_name, input_prefix, shapefile, output_prefix, cluster, status, submitted_at, cpu, memory, input_bytes, feature_count) VALUES (?, ?, ?, ?, ?, ?, 'SUBMITTED', ?, ?, ?, ?, ?)",
+                (
+                    task_arn,
+                    bid_name or "",
+                    input_prefix,
+                    shapefile,
+                    output_prefix,
+                    cluster,
+                    submitted_at or time.time(),
+                    cpu,
+                    memory,
+                    input_bytes,
+                    feature_count,
+                ),
+            )
+
+    def update_profile(self, task_arn, input_bytes=None, feature_count=None):
+        """
+        Save the input profile of a run, measured after it was submitted.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE runs SET input_bytes = ?, feature_count = ? WHERE task_arn = ?",
+                (input_bytes, feature_count, task_arn),
+            )
+
+    def update_tasks(self, tasks):
+        """
+        Save the latest state of tracked tasks, as kept by `TaskTracker`.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE runs SET status = ?, stop_code = ?, stopped_reason = ?, exit_code = ?, started_at = ?, stopped_at = ? WHERE task_arn = ?",
+                [
+                    (
+                        t["last_status"],
+                        t["stop_code"],
+                        t["stopped_reason"],
+                        t["exit_code"],
+                        _timestamp(t["started_at"]),
+                        _timestamp(t["stopped_at"]),
+                        t["task_arn"],
+                    )
+                    for t in tasks
+                ],
+            )
+
+    def _filters(self, bid_prefix=None, status=None):
+        clauses, params = [], []
+        if bid_prefix:
+            clauses.append("bid_name GLOB ?")
+            params.append(_prefix_pattern(bid_prefix))
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        return clauses, params
+
+    def runs(self, bid_prefix=None, status=None, before=None, limit=100):
+        """
+        One page of runs, newest first. `before` is the (submitted_at, task_arn) of the
+        last run of the previous page.
+        """
+        clauses, params = self._filters(bid_prefix, status)
+        if before is not None:
+            clauses.append("(submitted_at, task_arn) < (?, ?)")
+            params.extend(before)
+        query = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY submitted_at DESC, task_arn DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(query, params)]
+
+    def count(self, bid_prefix=None, status=None):
+        clauses, params = self._filters(bid_prefix, status)
+        query = "SELECT COUNT(*) FROM runs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self.lock:
+            return self.conn.execute(query, params).fetchone()[0]
+
+    def active_runs(self):
+        """
+        Runs whose task was not seen stopping, e.g. because the app was closed.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(RUN_COLUMNS)} FROM runs WHERE status != 'STOPPED' ORDER BY submitted_at"
+            )
+            return [dict(row) for row in rows]
+
+    def finished_runs(self, limit=1000):
+        """
+        The latest runs that stopped and whose inputs were measured, to size new ones.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(RUN_COLUMNS)} FROM runs WHERE status = 'STOPPED' AND (input_bytes IS NOT NULL OR feature_count IS NOT NULL) ORDER BY submitted_at DESC LIMIT ?",
+                (limit,),
+            )
+            return [dict(row) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
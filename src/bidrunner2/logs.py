@@ -0,0 +1,257 @@
+import gzip
+import itertools
+import logging
+import logging.handlers
+import os
+import shutil
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.text import Text
+
+from bidrunner2.placement import DEFAULT_PLACEMENT, parse_task_arn
+
+
+class LogBuffer:
+    """
+    Bounded, thread-safe log of markup lines.
+
+    Keeps the last `maxlen` lines, each with an increasing sequence number, so a view
+    can ask only for what was added since its cursor. Lines appended with a `key` (e.g.
+    a queue message id) are dropped when that key was already seen among the last
+    `dedup_size` keys. With `spill_path` every line is also written, without markup, to
+    a log file rotated at `spill_bytes` and gzipped.
+    """
+
+    def __init__(
+        self,
+        maxlen=10000,
+        dedup_size=50000,
+        spill_path=None,
+        spill_bytes=5 * 1024 * 1024,
+        spill_backups=5,
+    ):
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=maxlen)
+        self.seq = 0
+        self.dedup_size = dedup_size
+        self.seen = OrderedDict()
+        self.spill = None
+        if spill_path is not None:
+            self.spill = _spill_logger(spill_path, spill_bytes, spill_backups)
+
+    def append(self, line, key=None):
+        """
+        Add a line, returns False if it was a duplicate and dropped.
+        """
+        with self.lock:
+            if key is not None:
+                if key in self.seen:
+                    return False
+                self.seen[key] = None
+                if len(self.seen) > self.dedup_size:
+                    self.seen.popitem(last=False)
+            self.seq += 1
+            self.entries.append((self.seq, line))
+        if self.spill is not None:
+            self.spill.info(Text.from_markup(line).plain)
+        return True
+
+    # lets the buffer stand in for a RichLog as BidRunner's logger
+    def write(self, content):
+        self.append(str(content))
+
+    def read(self, cursor=0):
+        """
+        Lines added after `cursor` (a sequence number from a previous read) and the new
+        cursor. Lines that already fell out of the buffer are skipped.
+        """
+        with self.lock:
+            if not self.entries or self.seq <= cursor:
+                return [], self.seq
+            first_seq = self.entries[0][0]
+            start = max(0, cursor + 1 - first_seq)
+            lines = [line for _, line in itertools.islice(self.entries, start, None)]
+            return lines, self.seq
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        with self.lock:
+            return iter([line for _, line in self.entries])
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _spill_logger(path, max_bytes, backups):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    logger = logging.getLogger(f"bidrunner2.spill.{os.path.abspath(path)}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        )
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = _gzip_rotator
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+class LogView:
+    """
+    Renders new lines of a LogBuffer into a RichLog in batches. Call `flush` on a timer
+    (the app does so a few times a second), each call writes everything added since the
+    previous one with a single `write`.
+    """
+
+    def __init__(self, buffer, rich_log):
+        self.buffer = buffer
+        self.rich_log = rich_log
+        self.cursor = 0
+
+    def flush(self):
+        lines, self.cursor = self.buffer.read(self.cursor)
+        if lines:
+            self.rich_log.write("\n".join(lines))
+
+    def clear(self):
+        """
+        Clear the RichLog and skip everything added to the buffer so far.
+        """
+        _, self.cursor = self.buffer.read(self.buffer.seq)
+        self.rich_log.clear()
+
+
+class LogTailer:
+    """
+    Follows the CloudWatch log streams of bid tasks.
+
+    The awslogs driver writes each task to `<stream prefix>/<container>/<task id>`, so
+    the stream is derived from the task arn. Streams are read in the region each task
+    runs in, unless `region_name` sends every lookup to one region. Every poll
+    continues from the `nextForwardToken` of the previous one and only transfers
+    events not seen yet.
+    """
+
+    def __init__(
+        self,
+        runner,
+        log_group="/ecs/water-tracker-model-runs",
+        stream_prefix="ecs",
+        container_name="bidrunner",
+        region_name=None,
+        max_workers=8,
+    ):
+        self.runner = runner
+        self.log_group = log_group
+        self.stream_prefix = stream_prefix
+        self.container_name = container_name
+        self.region_name = region_name
+        self.max_workers = max_workers
+        self.tokens = {}
+        self.finished = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def stream_name(self, task_arn):
+        task_id = task_arn.split("/")[-1]
+        return f"{self.stream_prefix}/{self.container_name}/{task_id}"
+
+    def region_for(self, task_arn):
+        region, _ = parse_task_arn(task_arn)
+        return self.region_name or region or DEFAULT_PLACEMENT["region"]
+
+    def poll(self, task_arn):
+        """
+        New log events of a task since the last poll, oldest first.
+        """
+        logs_client = self.runner.clients.client(
+            "logs", self.region_for(task_arn), max_pool_connections=self.max_workers
+        )
+        token = self.tokens.get(task_arn)
+        events = []
+        while True:
+            params = {
+                "logGroupName": self.log_group,
+                "logStreamName": self.stream_name(task_arn),
+                "startFromHead": True,
+            }
+            if token:
+                params["nextToken"] = token
+            try:
+                resp = logs_client.get_log_events(**params)
+            except logs_client.exceptions.ResourceNotFoundException:
+                # the stream is only created once the container starts
+                break
+            events.extend(resp.get("events", []))
+            next_token = resp.get("nextForwardToken")
+            # the same token comes back once there is nothing newer
+            if next_token == token or not resp.get("events"):
+                token = next_token
+                break
+            token = next_token
+        if token:
+            self.tokens[task_arn] = token
+        return events
+
+    def tasks_to_follow(self, tasks):
+        """
+        Arns of the tracked `tasks` worth polling: those whose container may have
+        started, and stopped tasks one last time to pick up their final lines.
+        """
+        arns = []
+        for task in tasks:
+            if task["last_status"] in ("SUBMITTED", "PROVISIONING"):
+                continue
+            if task["last_status"] == "STOPPED":
+                if task["task_arn"] in self.finished:
+                    continue
+                self.finished.add(task["task_arn"])
+            arns.append(task["task_arn"])
+        return arns
+
+    def poll_many(self, task_arns):
+        """
+        {task arn: new events} for several tasks, polled concurrently.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(task_arns, pool.map(self.poll, task_arns)))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, get_task_arns, on_events, on_error=None, interval=5):
+        """
+        Poll the tasks returned by `get_task_arns` every `interval` seconds on a
+        background thread, handing {task arn: new events} to `on_events`.
+        """
+        if self.running:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    events = self.poll_many(get_task_arns())
+                    events = {arn: e for arn, e in events.items() if e}
+                    if events:
+                        on_events(events)
+                except Exception as e:
+                    if on_error:
+                        on_error(e)
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="bidrunner2-logs", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -1,27 +1,40 @@
-from collections import defaultdict
+import argparse
 import pathlib
-import boto3
 from dotenv import load_dotenv
 import os
-import json
 import importlib.resources as pkg_resources
-from bidrunner2 import resources
+from bidrunner2 import resources, startup
+from bidrunner2.history import TASK_STATUSES
+from bidrunner2.logs import LogView
+from bidrunner2.runner import BidRunner, log_with_timestamp
+from bidrunner2.scheduler import URGENT_PRIORITY
+from bidrunner2.sizing import task_size
+from bidrunner2.sqs import SqsConsumer
+from bidrunner2.transfer import MB, TransferProgress
 from datetime import datetime
-import toml
 import platform
 import sys
+from rich.markup import escape
+import threading
 
-from textual import message, on
+from textual import message, on, work
 from textual.app import App, ComposeResult
+from textual.suggester import Suggester
+from textual.worker import get_current_worker
 from textual.widgets import (
+    Checkbox,
+    DataTable,
     DirectoryTree,
     Input,
     Button,
     Header,
     Markdown,
     Pretty,
+    ProgressBar,
     RichLog,
     Select,
+    SelectionList,
+    Static,
     TabbedContent,
     TabPane,
 )
@@ -62,259 +75,40 @@ def get_resource_content(filename):
         return None
 
 
-def log_with_timestamp():
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    return f"[bold green][{ts}][/bold green]"
+class ThreadSafeLog:
+    """
+    Wraps a RichLog so `BidRunner` can write to it from a worker thread.
+    """
 
+    def __init__(self, app, log):
+        self.app = app
+        self.log = log
 
-def create_config_file(config_dir: pathlib.Path, config_file: str):
-    # create bidrunner folder if not exists
-    print("isnide the config file creation function")
-    config_dir.mkdir(parents=True, exist_ok=True)
-    default_config = {
-        "app": {"s3_input_root": "", "s3_output_root": ""},
-        "aws": {"aws_access_key_id": "", "aws_secret_access_key": "", "queue_url": ""},
-    }
+    def write(self, content):
+        self.app.call_from_thread(self.log.write, content)
 
-    config_file_path = config_dir / config_file
 
-    print(f"creating the file: {config_file_path}")
+class ShapefileSuggester(Suggester):
+    """
+    Completes the shapefile field from the object index of the selected input folder,
+    preferring `.shp` files.
+    """
 
-    with open(config_file_path, "w") as f:
-        toml.dump(default_config, f)
+    def __init__(self, app):
+        super().__init__(use_cache=False, case_sensitive=True)
+        self.app = app
 
-
-# Bidrunner AWS ----------------------------------------
-
-
-class BidRunner:
-    def __init__(self):
-        self.aws_credentials_set = False
-        self.aws_creds = {}
-        self.runner_details = {}
-        self.sqs_status = []
-        self.task_status = []
-        self.config = None
-        self.config_path = None
-
-    def load_config(self):
-        """
-        Load users config file. If one does not exist, then create a blank version with instructions
-        to user on how access and update it.
-
-        On linux this config file should be under $USER/.config/bidrunner2/config.toml and on windows this
-        should be %LOCALAPPDATA%/bidrunner2/config.toml
-        """
-        if platform.system() == "Windows":
-            appdata_env = os.environ.get("LOCALAPPDATA")
-        elif platform.system() == "Linux":
-            appdata_env = f'{os.environ.get("HOME")}/.config'
-        local_appdata_path = pathlib.Path(appdata_env, "")
-        config_path = local_appdata_path / "bidrunner2"
-        config_file = config_path / "config.toml"
-        try:
-            with open(config_file, "r") as f:
-                self.config_path = config_file
-                self.config = toml.load(f)
-        except FileNotFoundError as e:
-            create_config_file(config_path, "config.toml")
-            with open(config_file, "r") as f:
-                self.config_path = config_file
-                self.config = toml.load(f)
-            raise Exception(
-                f"""found incomplete config file, insert appropriate values to continue, use the following:\n 
-                Windows: notepad {self.config_path}\n
-                Linux: vim {self.config_path}
-                """
-            )
-        except Exception as e:
-            raise Exception(f"ERROR {e}")
-
-    def set_logger(self, log: RichLog):
-        """
-        Create a RichLog logger for the app
-        """
-        self.logger = log
-
-    def aws_set_credentials(self, access_key, secret_key, session_token=None):
-        self.aws_creds = {}
-        self.aws_creds["aws_access_key_id"] = access_key
-        self.aws_creds["aws_secret_access_key"] = secret_key
-        if session_token:
-            self.aws_creds["aws_session_token"] = session_token
-
-    def run(self, args):
-        try:
-            # NOTE: Change to reflect cluster name set by AWS Admin, consider adding to config file
-            cluster_name = "water-tracker-cluster"
-            # NOTE: Change to reflect task definition family set by AWS Admin, consider adding to config file
-            task_definition_family = "water-tracker-bid-runs"  # water-tracker-bid-runs
-            # NOTE: Change to reflect revision set by AWS Admin, consider adding to config file
-            task_definition_revision = "1"
-            task_definition = f"{task_definition_family}:{task_definition_revision}"
-            self.logger.write(
-                f"{log_with_timestamp()} running bid on cluster: {cluster_name}"
-            )
-
-            # overwrite container commands with those from the app
-            overwrite_command = ["bash", "execute.sh"]
-            overwrite_command.extend(args)
-
-            ecs_client = boto3.client("ecs", region_name="us-east-2", **self.aws_creds)
-            resp = ecs_client.run_task(
-                cluster=cluster_name,
-                taskDefinition=task_definition,
-                count=1,
-                launchType="FARGATE",
-                # TODO: needs to changed when transfering ownership
-                networkConfiguration={
-                    "awsvpcConfiguration": {
-                        "subnets": [
-                            "subnet-f58504b8",
-                            "subnet-876f54ee",
-                            "subnet-71b3c80a",
-                        ],
-                        "assignPublicIp": "ENABLED",
-                    }
-                },
-                overrides={
-                    "containerOverrides": [
-                        {
-                            "name": "bidrunner",
-                            "command": overwrite_command,
-                            "environment": [
-                                {"name": k.upper(), "value": v}
-                                for k, v in self.aws_creds.items()
-                            ],
-                        }
-                    ]
-                },
-            )
-
-            task_arn = resp["tasks"][0]["taskArn"]
-            self.logger.write(
-                f"{log_with_timestamp()} created new task at: [bold green]{task_arn}[/bold green]"
-            )
-            self.logger.write(
-                f"{log_with_timestamp()} you can continue to check status by clicking [bold green]`Check Task Status`[/bold green]"
-            )
-
-            self.runner_details["cluster"] = cluster_name
-            self.runner_details["tasks"] = [task_arn]
-
-        except Exception as e:
-            self.logger.write(
-                f"{log_with_timestamp()} An error occured trying to run the task"
-            )
-            self.logger.write(f"{e}")
-
-    def check_task_status(self):
-        if len(self.runner_details) == 0:
-            self.logger.write(
-                f"runner details is empty, did you run the a bid first? Value of runner_details: {self.runner_details}"
-            )
-        if not self.runner_details.get("tasks") or not self.runner_details.get(
-            "cluster"
-        ):
-            self.logger.write(
-                f"invalid values for tasks and cluster, these are tasks={self.runner_details.get('tasks')} and cluster={self.runner_details.get('cluster')}"
-            )
-        else:
-            cl = boto3.client("ecs", region_name="us-east-2", **self.aws_creds)
-            res = cl.describe_tasks(**self.runner_details)
-            task = res["tasks"][0]
-            last_status = task["lastStatus"]
-            self.task_status.append(last_status)
-
-    def sqs_process_message(self, message):
-        msg_id = message.get("MessageId")
-        msg_receipt = message.get("ReceiptHandle")
-        msg_body = message.get("Body")
-        msg_sent_timestamp = message.get("Attributes").get("SentTimestamp")
-        msg_bid_name = (
-            message.get("MessageAttributes").get("bid_name").get("StringValue")
-        )
-
-        return {
-            "id": msg_id,
-            "receipt": msg_receipt,
-            "body": msg_body,
-            "timestamp": datetime.fromtimestamp(int(msg_sent_timestamp) / 1000),
-            "bid_name": msg_bid_name,
-        }
-
-    def get_latest_sqs_message(self, queue_url, bid_name):
-        sqs_client = boto3.client("sqs", region_name="us-east-2", **self.aws_creds)
-        try:
-            resp = sqs_client.receive_message(
-                QueueUrl=queue_url,
-                AttributeNames=["All"],
-                MessageAttributeNames=["All"],
-                MaxNumberOfMessages=10,
-                WaitTimeSeconds=20,
-            )
-
-            messages = resp.get("Messages", [])
-            messages_processed = [self.sqs_process_message(m) for m in messages]
-            messages_filtered_to_task = [
-                m for m in messages_processed if m.get("bid_name") == bid_name
-            ]
-
-            if messages_filtered_to_task:
-                sorted_messages = sorted(
-                    messages_filtered_to_task, key=lambda x: x["timestamp"]
-                )
-                for message in sorted_messages:
-                    content = str(message.get("body"))
-                    self.sqs_status.append(
-                        f"[bold magenta]{log_with_timestamp()}[/bold magenta][bold cyan]{bid_name}[/bold cyan] - {content}"
-                    )
-
-                    sqs_client.delete_message(
-                        QueueUrl=queue_url,
-                        ReceiptHandle=message.get("receipt"),
-                    )
-        except Exception as e:
-            self.logger.write(f"[bold red] Error procesing messages {e}[/bold red]")
-
-    def check_bid_status(self, q_url, bid_name):
-        self.logger.write(
-            "[bold orange]Retrieving latest messages from Queue...[/bold orange]"
+    async def get_suggestion(self, value):
+        input_select = self.app.query_one("#bid-input-bucket", Select)
+        if input_select.is_blank():
+            return None
+        matches = self.app.runner.object_index.complete(
+            self.app.s3_roots["input"], input_select.value, value, limit=1000
         )
-        self.check_task_status()
-        self.get_latest_sqs_message(q_url, bid_name)
-
-        if len(self.task_status) > 0:
-            self.logger.write(
-                f"[bold magenta]Task - status:[/bold magenta] {self.task_status.pop()}"
-            )
-        else:
-            self.logger.write("[bold magenta]Task - no new messages[/bold magenta]")
-
-    def s3_get_all_buckets(self, s3_root):
-        s3_cl = boto3.client("s3", **self.aws_creds, region_name="us-west-2")
-        paginator = s3_cl.get_paginator("list_objects_v2")
-        folders = []
-
-        for page in paginator.paginate(Bucket=s3_root, Delimiter="/"):
-            for prefix in page.get("CommonPrefixes", []):
-                folders.append(prefix["Prefix"])
-
-        return [(f, f) for f in folders]
-
-    # TODO: maybe remove this? I think we should just instruct users to use the aws cli
-    def s3_sync_to_bucket(self, source, destination):
-        s3_cl = boto3.client("s3", **self.aws_creds, region_name="us-west-2")
-        for root, dirs, files in os.walk(source):
-            for file in files:
-                local_path = os.path.join(root, file)
-                relative_path = os.path.relpath(local_path, source)
-                s3_path = os.path.join(destination, relative_path)
-
-                self.logger.write(f"Uploading {local_path} to {destination}/{s3_path}")
-
-    def __repr__(self):
-        return "<BidRunner Input>"
+        for key in matches:
+            if key.lower().endswith(".shp"):
+                return key
+        return matches[0] if matches else None
 
 
 # App ---------------------------------------------------
@@ -350,25 +144,463 @@ class BidRunnerApp(App):
                 """
             )
         try:
+            self.runner.configure_clients()
             self.runner.aws_set_credentials(
                 self.runner.config["aws"]["aws_access_key_id"],  # type: ignore
                 self.runner.config["aws"]["aws_secret_access_key"],  # type: ignore
-                None,
-            )
-            self.account_input_bucket_list = self.runner.s3_get_all_buckets(
-                s3_input_root
-            )
-            self.account_output_bucket_list = self.runner.s3_get_all_buckets(
-                s3_output_root
+                self.runner.config["aws"].get("aws_session_token"),  # type: ignore
             )
         except Exception as e:
             raise Exception(
                 f"Unable to connect to aws using provided credentials, received the following error: {e}"
             )
+        # show the last known listings straight away, they are refreshed once mounted
+        self.s3_roots = {"input": s3_input_root, "output": s3_output_root}
+        self.account_input_bucket_list, _ = self.runner.s3_get_cached_buckets(
+            s3_input_root
+        )
+        self.account_output_bucket_list, _ = self.runner.s3_get_cached_buckets(
+            s3_output_root
+        )
+        startup.mark("load_config")
 
     def on_mount(self) -> None:
         self.title = "Bidrunner2"
         self.notify("Welcome to bidrunner2!")
+        self.current_bid_name = ""
+        self.bid_cursors = {}
+        self.sqs_consumer = None
+        # the queue consumer and task tracker loops when they run on the async backend
+        self.queue_worker = None
+        # kept open while the app runs, see `aws_backend`
+        self.async_backend = None
+        self.transfer_progress = {"upload": None, "download": None}
+        self.output_objects = {}
+        self.log_tailer = self.runner.log_tailer()
+        self.run_log = self.runner.run_log()
+        self.run_log_view = LogView(
+            self.run_log, self.query_one("#bid-run-logs", RichLog)
+        )
+        self.runner.set_logger(self.run_log)
+        task_table = self.query_one("#task-table", DataTable)
+        task_table.add_columns(
+            "Bid", "Task", "Cluster", "Status", "Stop Code", "Exit", "Elapsed"
+        )
+        history_table = self.query_one("#history-table", DataTable)
+        history_table.add_columns(
+            "Bid",
+            "Submitted",
+            "Status",
+            "Exit",
+            "Input",
+            "Shapefile",
+            "Output",
+            "Size",
+            "Task",
+        )
+        calls_table = self.query_one("#metrics-calls", DataTable)
+        calls_table.border_title = "AWS Calls"
+        calls_table.add_columns(
+            "Service",
+            "Operation",
+            "Calls",
+            "Errors",
+            "Retries",
+            "Throttled",
+            "p50",
+            "p95",
+            "Max",
+            "Sent",
+            "Received",
+        )
+        spans_table = self.query_one("#metrics-spans", DataTable)
+        spans_table.border_title = "Spans"
+        spans_table.add_columns("Span", "Count", "p50", "p95", "Max")
+        # start of every history page seen so far, None for the first
+        self.history_cursors = [None]
+        self.history_page = 0
+        self.show_history_page()
+        startup.mark("compose_and_mount")
+        # AWS work starts once the first frame is on screen
+        self.call_after_refresh(self.on_first_frame)
+
+    def on_first_frame(self) -> None:
+        startup.mark("first_frame")
+        if startup.profiling():
+            startup.write_marks()
+            self.exit()
+            return
+        self.start_background_services()
+
+    def start_background_services(self) -> None:
+        threading.Thread(
+            target=startup.prewarm_aws_imports, name="bidrunner2-imports", daemon=True
+        ).start()
+        queue_url = self.runner.config["aws"].get("queue_url")
+        use_async_backend = self.runner.use_async_backend
+        if queue_url and use_async_backend:
+            self.queue_worker = self.consume_queue(queue_url)
+        elif queue_url:
+            self.sqs_consumer = SqsConsumer(
+                self.runner,
+                queue_url,
+                on_message=self.on_sqs_message,
+                on_error=self.on_sqs_error,
+                demux=True,
+            )
+            self.sqs_consumer.start()
+
+        # runs still going when the app was last closed
+        for run in self.runner.run_history.active_runs():
+            self.runner.tracker.track(
+                run["cluster"], run["task_arn"], bid_name=run["bid_name"]
+            )
+        if use_async_backend:
+            self.follow_tasks()
+        else:
+            self.runner.tracker.on_update = self.on_tasks_changed
+            self.runner.tracker.on_error = self.on_tracker_error
+            self.runner.tracker.start()
+        self.set_interval(1, self.update_task_table)
+        self.set_interval(0.5, self.update_transfer_progress)
+        self.set_interval(2, self.update_metrics)
+        metrics_config = self.runner.config.get("metrics", {})
+        if metrics_config.get("export_file"):
+            self.set_interval(
+                metrics_config.get("export_interval", 15), self.export_metrics_file
+            )
+        # run log lines are buffered and drawn in one write per frame
+        log_fps = self.runner.config.get("app", {}).get("log_fps", 10)
+        self.set_interval(1 / log_fps, self.run_log_view.flush)
+        if use_async_backend:
+            self.refresh_aws()
+        else:
+            self.refresh_bucket_lists()
+
+    @work(thread=True, exclusive=True, group="listings")
+    def refresh_bucket_lists(self, force=False):
+        """
+        List both roots concurrently and update the dropdowns when the results arrive.
+        """
+        try:
+            listings = self.runner.s3_refresh_buckets(
+                list(self.s3_roots.values()), force=force
+            )
+        except Exception as e:
+            self.call_from_thread(
+                self.notify,
+                f"Unable to connect to aws using provided credentials, received the following error: {e}",
+                severity="error",
+            )
+            return
+        self.call_from_thread(self.update_bucket_lists, listings)
+
+    async def aws_backend(self):
+        if self.async_backend is None:
+            from bidrunner2.aio import AsyncBackend
+
+            self.async_backend = AsyncBackend(self.runner).open()
+        return self.async_backend
+
+    @work(exclusive=True, group="aws-refresh")
+    async def refresh_aws(self, queue_url=None, bid_name=None):
+        """
+        List both roots, refresh the tracked tasks and drain the queue (with
+        `queue_url`) at the same time on the async backend, then show the results.
+        With `bid_name` its latest task status and new messages are logged too.
+        """
+        backend = await self.aws_backend()
+        results = await backend.refresh(
+            list(self.s3_roots.values()), queue_url=queue_url
+        )
+        if isinstance(results["listings"], Exception):
+            self.notify(
+                f"Unable to connect to aws using provided credentials, received the following error: {results['listings']}",
+                severity="error",
+            )
+        else:
+            self.update_bucket_lists(results["listings"])
+        if isinstance(results["changed"], Exception):
+            self.on_tracker_error(results["changed"])
+        elif results["changed"]:
+            self.show_task_changes(results["changed"])
+        if isinstance(results["messages"], Exception):
+            self.on_sqs_error(results["messages"])
+        if bid_name:
+            latest = self.runner.tracker.latest()
+            if latest:
+                self.run_log.write(
+                    f"[bold magenta]Task - status:[/bold magenta] {latest['last_status']}"
+                )
+            else:
+                self.run_log.write(
+                    "[bold magenta]Task - no new messages[/bold magenta]"
+                )
+            self.show_stored_bid_messages(bid_name)
+
+    @work(exclusive=True, group="queue-consumer")
+    async def consume_queue(self, queue_url):
+        """
+        The queue consumer on the async backend, in place of the `SqsConsumer` thread.
+        """
+        backend = await self.aws_backend()
+        await backend.consume_queue(
+            queue_url, on_messages=self.show_new_messages, on_error=self.on_sqs_error
+        )
+
+    @work(exclusive=True, group="task-tracker")
+    async def follow_tasks(self):
+        """
+        The task tracker loop on the async backend, in place of the tracker's thread.
+        """
+        backend = await self.aws_backend()
+        await backend.follow_tasks(
+            on_update=self.show_task_changes, on_error=self.on_tracker_error
+        )
+
+    @work(thread=True, exclusive=True, group="aws-refresh")
+    def check_status_in_background(self, queue_url, bid_name):
+        self.runner.check_bid_status(
+            queue_url, bid_name, poll_queue=queue_url is not None
+        )
+        if bid_name:
+            self.call_from_thread(self.show_stored_bid_messages, bid_name)
+
+    def update_bucket_lists(self, listings):
+        selects = {
+            "#bid-input-bucket": self.s3_roots["input"],
+            "#data-destination-bucket": self.s3_roots["input"],
+            "#bid-output-bucket": self.s3_roots["output"],
+            "#outputs-bid": self.s3_roots["output"],
+        }
+        for select_id, s3_root in selects.items():
+            if s3_root not in listings:
+                continue
+            select = self.query_one(select_id, Select)
+            selected = select.value
+            select.set_options(listings[s3_root])
+            if selected in dict(listings[s3_root]):
+                select.value = selected
+
+    async def on_unmount(self) -> None:
+        if self.sqs_consumer is not None:
+            self.sqs_consumer.stop()
+        self.workers.cancel_group(self, "queue-consumer")
+        self.workers.cancel_group(self, "task-tracker")
+        self.runner.tracker.stop()
+        self.runner.scheduler.stop()
+        self.log_tailer.stop()
+        if self.async_backend is not None:
+            await self.async_backend.close()
+
+    def on_tasks_changed(self, changed):
+        self.call_from_thread(self.show_task_changes, changed)
+
+    def show_task_changes(self, changed):
+        # stopped tasks make room for queued bids
+        self.runner.scheduler.wake()
+        self.update_task_table()
+        self.show_history_page()
+
+    def show_history_page(self, page=None):
+        """
+        Draw one page of the run history matching the filters, newest first. Pages are
+        read straight from the local database, `history_cursors` holds where each starts.
+        """
+        if page is not None:
+            self.history_page = page
+        page_size = self.runner.config.get("app", {}).get("history_page_size", 100)
+        bid_prefix = self.query_one("#history-search", Input).value.strip() or None
+        status_select = self.query_one("#history-status", Select)
+        status = None if status_select.is_blank() else status_select.value
+
+        runs = self.runner.run_history.runs(
+            bid_prefix,
+            status,
+            before=self.history_cursors[self.history_page],
+            limit=page_size,
+        )
+        del self.history_cursors[self.history_page + 1 :]
+        if len(runs) == page_size:
+            last = runs[-1]
+            self.history_cursors.append((last["submitted_at"], last["task_arn"]))
+
+        history_table = self.query_one("#history-table", DataTable)
+        history_table.clear()
+        for run in runs:
+            submitted = datetime.fromtimestamp(run["submitted_at"])
+            history_table.add_row(
+                run["bid_name"],
+                submitted.strftime("%Y-%m-%d %H:%M"),
+                run["status"],
+                "" if run["exit_code"] is None else str(run["exit_code"]),
+                run["input_prefix"] or "",
+                run["shapefile"] or "",
+                run["output_prefix"] or "",
+                (
+                    f"{run['cpu'] or 'default'} / {run['memory'] or 'default'}"
+                    if run["cpu"] or run["memory"]
+                    else ""
+                ),
+                run["task_arn"].split("/")[-1],
+                key=run["task_arn"],
+            )
+        total = self.runner.run_history.count(bid_prefix, status)
+        pages = max(1, -(-total // page_size))
+        self.query_one("#history-page", Static).update(
+            f"page {self.history_page + 1} of {pages}, {total} runs"
+        )
+
+    @on(Input.Changed, "#history-search")
+    @on(Select.Changed, "#history-status")
+    def filter_history(self):
+        self.history_cursors = [None]
+        self.show_history_page(0)
+
+    def update_metrics(self):
+        def seconds(value):
+            return f"{value * 1000:.0f} ms" if value < 1 else f"{value:.1f} s"
+
+        calls_table = self.query_one("#metrics-calls", DataTable)
+        for service, operation, stats in self.runner.metrics.operation_rows():
+            row = (
+                service,
+                operation,
+                str(stats["calls"]),
+                str(stats["errors"]),
+                str(stats["retries"]),
+                str(stats["throttles"]),
+                seconds(stats["latency"]["p50"]),
+                seconds(stats["latency"]["p95"]),
+                seconds(stats["latency"]["max"]),
+                f"{stats['bytes_sent'] / MB:.1f} MB",
+                f"{stats['bytes_received'] / MB:.1f} MB",
+            )
+            self.update_table_row(calls_table, f"{service}.{operation}", row)
+
+        spans_table = self.query_one("#metrics-spans", DataTable)
+        for name, stats in self.runner.metrics.span_rows():
+            row = (
+                name,
+                str(stats["count"]),
+                seconds(stats["p50"]),
+                seconds(stats["p95"]),
+                seconds(stats["max"]),
+            )
+            self.update_table_row(spans_table, name, row)
+
+    def update_table_row(self, table, key, row):
+        if key in table.rows:
+            for column, value in zip(table.columns, row):
+                table.update_cell(key, column, value)
+        else:
+            table.add_row(*row, key=key)
+
+    @work(thread=True, exclusive=True, group="metrics")
+    def export_metrics_file(self):
+        path = self.runner.config.get("metrics", {}).get("export_file")
+        try:
+            self.runner.metrics.export(path)
+        except Exception as e:
+            self.call_from_thread(
+                self.notify, f"unable to write metrics to {path}: {e}", severity="error"
+            )
+
+    def export_metrics(self, extension):
+        export_dir = pathlib.Path(
+            self.runner.config.get("metrics", {}).get(
+                "export_dir", self.runner.app_dir / "metrics"
+            )
+        ).expanduser()
+        name = datetime.now().strftime("metrics-%Y%m%d-%H%M%S")
+        try:
+            path = self.runner.metrics.export(export_dir / f"{name}.{extension}")
+        except Exception as e:
+            self.notify(f"unable to export metrics: {e}", severity="error")
+            return
+        self.notify(f"metrics saved to {path}")
+
+    def update_task_table(self):
+        task_table = self.query_one("#task-table", DataTable)
+        for key, row in self.runner.tracker.rows():
+            self.update_table_row(task_table, key, row)
+
+    def toggle_log_tail(self):
+        button = self.query_one("#follow-logs", Button)
+        if self.log_tailer.running:
+            self.log_tailer.stop()
+            button.label = "Follow Logs"
+            return
+        self.log_tailer.start(
+            lambda: self.log_tailer.tasks_to_follow(self.runner.tracker.snapshot()),
+            on_events=lambda events: self.call_from_thread(self.show_task_logs, events),
+            on_error=lambda e: self.call_from_thread(
+                self.query_one("#task-logs", RichLog).write,
+                f"[bold red] Error reading task logs {e}[/bold red]",
+            ),
+        )
+        button.label = "Stop Following Logs"
+
+    def show_task_logs(self, events):
+        """
+        Render every new log line from one poll in a single write.
+        """
+        bid_names = {
+            t["task_arn"]: t["bid_name"] for t in self.runner.tracker.snapshot()
+        }
+        lines = []
+        for task_arn, task_events in events.items():
+            name = bid_names.get(task_arn) or task_arn.split("/")[-1]
+            for event in task_events:
+                ts = datetime.fromtimestamp(event["timestamp"] / 1000).strftime(
+                    "%H:%M:%S"
+                )
+                lines.append(
+                    f"[bold cyan]{escape(name)}[/bold cyan] [green]{ts}[/green] {escape(event['message'])}"
+                )
+        self.query_one("#task-logs", RichLog).write("\n".join(lines))
+
+    def on_tracker_error(self, error):
+        self.run_log.write(f"[bold red] Error checking task status {error}[/bold red]")
+
+    def on_sqs_message(self, message):
+        """
+        Called from the queue consumer thread for every new message, of any bid.
+        """
+        if message.get("bid_name") == self.current_bid_name:
+            self.call_from_thread(self.show_bid_messages, [message])
+
+    def show_new_messages(self, messages):
+        """
+        Called on the app's loop by the async queue consumer with the new messages.
+        """
+        self.show_bid_messages(
+            [m for m in messages if m.get("bid_name") == self.current_bid_name]
+        )
+
+    def show_bid_messages(self, messages):
+        for message in messages:
+            line = self.runner.sqs_format_message(message)
+            # the same message can come from the consumer and the message store
+            if self.runner.sqs_status.append(line, key=message["id"]):
+                self.run_log.write(f"[bold green]{line}[/bold green]")
+            self.bid_cursors[message["bid_name"]] = (
+                message["sent_timestamp"],
+                message["id"],
+            )
+
+    def show_stored_bid_messages(self, bid_name):
+        """
+        Write any stored messages for `bid_name` that have not been shown yet, e.g. those
+        received while another bid was selected.
+        """
+        stored = self.runner.message_store.messages_for(
+            bid_name, after=self.bid_cursors.get(bid_name)
+        )
+        self.show_bid_messages(stored)
+
+    def on_sqs_error(self, error):
+        self.run_log.write(f"[bold red] Error procesing messages {error}[/bold red]")
 
     def compose(self) -> ComposeResult:
         rl = RichLog(
@@ -403,6 +635,7 @@ class BidRunnerApp(App):
                         Input(
                             placeholder="Auction shapefile",
                             id="bid-auction-shapefile",
+                            suggester=ShapefileSuggester(self),
                             classes="input-focus input-element",
                         ),
                         Select(
@@ -411,6 +644,30 @@ class BidRunnerApp(App):
                             id="bid-output-bucket",
                             classes="input-focus input-element",
                         ),
+                        Horizontal(
+                            Input(
+                                placeholder="CPU units (default 1024)",
+                                id="bid-cpu",
+                                classes="input-focus",
+                                type="integer",
+                            ),
+                            Input(
+                                placeholder="Memory MiB (default 3072)",
+                                id="bid-memory",
+                                classes="input-focus",
+                                type="integer",
+                            ),
+                            Button(
+                                "Suggest Size", id="suggest-size", variant="default"
+                            ),
+                            id="bid-size",
+                            classes="input-element",
+                        ),
+                        Checkbox(
+                            "Urgent (submitted ahead of queued bids)",
+                            id="bid-urgent",
+                            classes="input-element",
+                        ),
                         Horizontal(
                             Button(
                                 "Submit",
@@ -425,6 +682,16 @@ class BidRunnerApp(App):
                             Button("Clear Form", id="clear-form", variant="default"),
                             id="buttons-row",
                         ),
+                        Input(
+                            placeholder="Batch manifest (.csv or .toml)",
+                            id="batch-manifest",
+                            classes="input-focus input-element",
+                        ),
+                        Button(
+                            "Submit Batch",
+                            id="submit-batch",
+                            variant="default",
+                        ),
                         id="main-ui",
                     ),
                     Container(
@@ -433,6 +700,19 @@ class BidRunnerApp(App):
                         id="log_ui",
                     ),
                 )
+            with TabPane("Tasks"):
+                yield Container(
+                    DataTable(id="task-table", cursor_type="row"),
+                    Button("Follow Logs", id="follow-logs", variant="default"),
+                    RichLog(
+                        id="task-logs",
+                        markup=True,
+                        highlight=True,
+                        wrap=True,
+                        max_lines=10000,
+                    ),
+                    id="tasks-ui",
+                )
             with TabPane("Data"):
                 yield Container(
                     Horizontal(
@@ -442,28 +722,101 @@ class BidRunnerApp(App):
                         ),
                         Container(
                             Pretty(
-                                "Select folder for upload"
-                                if self.selected_folder_to_upload is None
-                                else self.selected_folder_to_upload,
+                                (
+                                    "Select folder for upload"
+                                    if self.selected_folder_to_upload is None
+                                    else self.selected_folder_to_upload
+                                ),
                                 id="selected-folder-to-upload",
                             ),
+                            Static("", id="upload-preflight"),
                             Select(
                                 self.account_input_bucket_list,
                                 prompt="Select Destination Bucket",
+                                id="data-destination-bucket",
                             ),
                             Button("Upload", id="data-upload"),
-                            RichLog(id="aws-cli-command", markup=True, max_lines=3),
+                            ProgressBar(id="upload-progress", show_eta=False),
+                            Static("", id="upload-stats"),
+                            RichLog(id="upload-log", markup=True, wrap=True),
                             id="data-right",
                         ),
                     ),
                     id="data-ui",
                 )
+            with TabPane("Outputs"):
+                yield Container(
+                    Horizontal(
+                        Container(
+                            Select(
+                                self.account_output_bucket_list,
+                                prompt="Select Bid Outputs",
+                                id="outputs-bid",
+                            ),
+                            Horizontal(
+                                Button("List Outputs", id="outputs-list"),
+                                Button("Download Selected", id="outputs-download"),
+                                id="outputs-buttons",
+                            ),
+                            SelectionList(id="outputs-files"),
+                            id="outputs-left",
+                        ),
+                        Container(
+                            ProgressBar(id="download-progress", show_eta=False),
+                            Static("", id="download-stats"),
+                            RichLog(id="download-log", markup=True, wrap=True),
+                            id="outputs-right",
+                        ),
+                    ),
+                    id="outputs-ui",
+                )
+            with TabPane("Existing Bid"):
+                yield Container(
+                    Horizontal(
+                        Input(
+                            placeholder="Filter by bid name",
+                            id="history-search",
+                        ),
+                        Select(
+                            [(status, status) for status in TASK_STATUSES],
+                            prompt="Any status",
+                            id="history-status",
+                        ),
+                        id="history-filters",
+                    ),
+                    DataTable(id="history-table", cursor_type="row"),
+                    Horizontal(
+                        Button("Previous", id="history-prev"),
+                        Button("Next", id="history-next"),
+                        Static("", id="history-page"),
+                        id="history-buttons",
+                    ),
+                    id="history-ui",
+                )
+            with TabPane("Metrics"):
+                yield Container(
+                    DataTable(id="metrics-calls"),
+                    DataTable(id="metrics-spans"),
+                    Horizontal(
+                        Button("Export Prometheus", id="metrics-export-prom"),
+                        Button("Export JSON", id="metrics-export-json"),
+                        id="metrics-buttons",
+                    ),
+                    id="metrics-ui",
+                )
             with TabPane("Manual"):
                 manual_path = get_resource_path("manual.md")
                 if manual_path:
                     with open(manual_path, "r") as f:
                         yield Markdown(f.read(), id="manual-ui")
 
+    def selected_output_prefix(self):
+        outputs_select = self.query_one("#outputs-bid", Select)
+        if outputs_select.is_blank():
+            self.notify("select the outputs of a bid", severity="error")
+            return None
+        return outputs_select.value
+
     def validate_inputs_and_notify(self) -> bool:
         all_pass = True
         input_ids = [
@@ -489,9 +842,106 @@ class BidRunnerApp(App):
             self.notify(
                 "invalid form, please submit all required fields", severity="error"
             )
+        elif not self.validate_size_and_notify():
+            all_pass = False
 
         return all_pass
 
+    def validate_size_and_notify(self) -> bool:
+        cpu_input = self.query_one("#bid-cpu", Input)
+        memory_input = self.query_one("#bid-memory", Input)
+        try:
+            cpu, memory = task_size(cpu_input.value, memory_input.value)
+        except ValueError as e:
+            cpu_input.add_class("error")
+            memory_input.add_class("error")
+            self.notify(str(e), severity="error")
+            return False
+        if cpu is not None and not (cpu_input.value and memory_input.value):
+            # only one was set, show the size the bid will run at
+            cpu_input.value, memory_input.value = str(cpu), str(memory)
+            self.notify(f"the bid will run at {cpu} cpu / {memory} MiB")
+        cpu_input.remove_class("error")
+        memory_input.remove_class("error")
+        return True
+
+    @work(thread=True, group="submit-bid")
+    def validate_shapefile_and_submit(self, args, priority=0, cpu=None, memory=None):
+        """
+        Check the shapefile and its sidecar files exist in the selected input folder,
+        so a typo is caught before a task is started for it, then submit the bid.
+        """
+        _, input_prefix, shapefile, _ = args
+        try:
+            missing = self.runner.s3_missing_shapefile_files(input_prefix, shapefile)
+        except Exception as e:
+            # the bid is not held back when S3 cannot be asked
+            self.call_from_thread(
+                self.notify,
+                f"unable to check the shapefile exists: {e}",
+                severity="warning",
+            )
+            missing = []
+        if missing:
+            self.call_from_thread(
+                self.show_missing_shapefile_files, input_prefix, missing
+            )
+            return
+        self.call_from_thread(
+            self.runner.run, args, priority=priority, cpu=cpu, memory=memory
+        )
+
+    def show_missing_shapefile_files(self, input_prefix, missing):
+        self.query_one("#bid-auction-shapefile", Input).add_class("error")
+        self.notify(
+            f"not found in {input_prefix}: {', '.join(missing)}", severity="error"
+        )
+
+    @on(Select.Changed, "#bid-input-bucket")
+    def index_selected_input(self, event: Select.Changed):
+        if not event.select.is_blank():
+            self.index_input_in_background(event.value)
+
+    @work(thread=True, exclusive=True, group="sizing")
+    def suggest_size_in_background(self, input_prefix, shapefile):
+        try:
+            recommendation = self.runner.recommend_size(input_prefix, shapefile)
+        except Exception as e:
+            self.call_from_thread(
+                self.notify, f"unable to size the bid: {e}", severity="error"
+            )
+            return
+        self.call_from_thread(self.show_size_recommendation, recommendation)
+
+    def show_size_recommendation(self, recommendation):
+        self.query_one("#bid-cpu", Input).value = str(recommendation["cpu"])
+        self.query_one("#bid-memory", Input).value = str(recommendation["memory"])
+        inputs = f"{recommendation['input_bytes'] / MB:.1f} MB of inputs"
+        if recommendation["feature_count"] is not None:
+            inputs += f" and {recommendation['feature_count']} features"
+        self.run_log.write(
+            f"{log_with_timestamp()} suggested size {recommendation['cpu']} cpu / {recommendation['memory']} MiB "
+            f"for {inputs}: {recommendation['reason']}"
+        )
+
+    @work(thread=True, exclusive=True, group="object-index")
+    def index_input_in_background(self, input_prefix):
+        """
+        Index the objects of the selected input folder for the shapefile suggestions.
+        """
+        try:
+            self.runner.s3_index_objects(input_prefix)
+        except Exception as e:
+            self.call_from_thread(
+                self.notify,
+                f"unable to list the files of {input_prefix}: {e}",
+                severity="warning",
+            )
+
+    @on(Input.Changed, "#bid-name")
+    def update_current_bid_name(self, event: Input.Changed):
+        self.current_bid_name = event.value
+
     @on(Input.Changed)
     def remove_error_class(self):
         input_ids = [
@@ -510,8 +960,6 @@ class BidRunnerApp(App):
                 elem.remove_class("error")
 
     async def on_button_pressed(self, event: Button.Pressed) -> None:
-        log = self.query_one("#bid-run-logs", RichLog)
-        self.runner.set_logger(log)
         queue_url = self.runner.config["aws"]["queue_url"]
 
         if event.button.id == "submit_run":
@@ -531,17 +979,65 @@ class BidRunnerApp(App):
             ]
 
             if self.validate_inputs_and_notify():
-                self.runner.run(all_inputs)
+                urgent = self.query_one("#bid-urgent", Checkbox).value
+                cpu = self.query_one("#bid-cpu", Input).value
+                memory = self.query_one("#bid-memory", Input).value
+                self.validate_shapefile_and_submit(
+                    all_inputs,
+                    priority=URGENT_PRIORITY if urgent else 0,
+                    cpu=int(cpu) if cpu else None,
+                    memory=int(memory) if memory else None,
+                )
+
+        if event.button.id == "suggest-size":
+            input_select = self.query_one("#bid-input-bucket", Select)
+            shapefile = self.query_one("#bid-auction-shapefile", Input).value
+            if input_select.is_blank() or not shapefile:
+                self.notify(
+                    "select an input bucket and shapefile to size the bid",
+                    severity="error",
+                )
+            else:
+                self.suggest_size_in_background(input_select.value, shapefile)
+
+        if event.button.id == "submit-batch":
+            manifest_path = self.query_one("#batch-manifest", Input).value
+            if not manifest_path:
+                self.notify("enter the path to a batch manifest", severity="error")
+            else:
+                # bids of the manifest without a priority of their own take Urgent's
+                urgent = self.query_one("#bid-urgent", Checkbox).value
+                self.submit_batch_in_background(
+                    manifest_path, priority=URGENT_PRIORITY if urgent else 0
+                )
 
         if event.button.id == "check-task-status":
             bid_name = self.query_one("#bid-name", Input).value
-            log.write("[bold orange]Retrieving message from SQS Queue[/bold orange]")
-            self.runner.check_bid_status(queue_url, bid_name)
-            for msg in self.runner.sqs_status:
-                log.write(f"[bold green]{msg}[/bold green]")
+            # queue messages are streamed into the log by the consumer as they arrive
+            consuming = self.sqs_consumer is not None or self.queue_worker is not None
+            poll_queue_url = None if consuming else queue_url
+            if self.runner.use_async_backend:
+                self.refresh_aws(queue_url=poll_queue_url, bid_name=bid_name)
+            else:
+                self.check_status_in_background(poll_queue_url, bid_name)
+        if event.button.id == "history-prev" and self.history_page > 0:
+            self.show_history_page(self.history_page - 1)
+        if event.button.id == "history-next" and self.history_page + 1 < len(
+            self.history_cursors
+        ):
+            self.show_history_page(self.history_page + 1)
+        if event.button.id == "metrics-export-prom":
+            self.export_metrics("prom")
+        if event.button.id == "metrics-export-json":
+            self.export_metrics("json")
+        if event.button.id == "follow-logs":
+            self.toggle_log_tail()
         if event.button.id == "clear-logs":
-            log.clear()
+            self.run_log_view.clear()
         if event.button.id == "clear-form":
+            self.query_one("#bid-urgent", Checkbox).value = False
+            self.query_one("#bid-cpu", Input).clear()
+            self.query_one("#bid-memory", Input).clear()
             input_ids = [
                 "#bid-name",
                 "#bid-input-bucket",
@@ -553,21 +1049,202 @@ class BidRunnerApp(App):
                 elem = self.query_one(id, Input)
                 elem.clear()
                 elem.remove_class("error")
+        if event.button.id == "outputs-list":
+            output_prefix = self.selected_output_prefix()
+            if output_prefix:
+                self.list_outputs_in_background(
+                    output_prefix, self.query_one("#download-log", RichLog)
+                )
+
+        if event.button.id == "outputs-download":
+            output_prefix = self.selected_output_prefix()
+            selected = self.query_one("#outputs-files", SelectionList).selected
+            objects = [
+                self.output_objects[key]
+                for key in selected
+                if key in self.output_objects and key.startswith(output_prefix or "")
+            ]
+            if output_prefix and not objects:
+                self.notify("select the files to download", severity="error")
+            elif output_prefix:
+                download_dir = self.runner.config["app"].get(
+                    "download_dir", "~/Downloads/bidrunner2"
+                )
+                destination = pathlib.Path(download_dir).expanduser() / output_prefix
+                self.download_in_background(
+                    output_prefix,
+                    objects,
+                    destination,
+                    self.query_one("#download-log", RichLog),
+                )
+
         if event.button.id == "data-upload":
             dir_tree_elem = self.query_one("#dir-tree", DirectoryTree)
-            aws_cli_ui = self.query_one("#aws-cli-command", RichLog)
+            upload_log = self.query_one("#upload-log", RichLog)
             selected_folder_ui = self.query_one(Pretty)
-            selected_folder_ui.update(
-                f"Selected folder for Upload: {dir_tree_elem.cursor_node.data.path}"
+            selected_dir = dir_tree_elem.cursor_node.data.path
+            selected_folder_ui.update(f"Selected folder for Upload: {selected_dir}")
+
+            if not selected_dir.is_dir():
+                self.notify("select a folder to upload", severity="error")
+                return
+
+            self.upload_in_background(
+                str(selected_dir), self.upload_destination(selected_dir), upload_log
             )
 
-            selected_dir = dir_tree_elem.cursor_node.data.path
-            selected_dir = str(selected_dir)
-            selected_dir = selected_dir.replace("\\", "/")
+    def upload_destination(self, folder):
+        # upload into the selected auction folder, or a new one named after the local folder
+        destination_select = self.query_one("#data-destination-bucket", Select)
+        if destination_select.is_blank():
+            destination_prefix = f"{pathlib.Path(folder).name}/"
+        else:
+            destination_prefix = destination_select.value
+        s3_input_root = self.runner.config["app"]["s3_input_root"]
+        return f"s3://{s3_input_root}/{destination_prefix}"
+
+    @work(thread=True, exclusive=True, group="upload")
+    def upload_in_background(self, source, destination, log: RichLog):
+        progress = TransferProgress()
+        self.transfer_progress["upload"] = progress
+        try:
+            self.runner.s3_sync_to_bucket(
+                source, destination, progress=progress, logger=ThreadSafeLog(self, log)
+            )
+        except Exception as e:
+            self.call_from_thread(log.write, f"[bold red]upload failed: {e}[/bold red]")
+        finally:
+            self.call_from_thread(self.update_transfer_progress)
+            self.transfer_progress["upload"] = None
+        # a new auction folder may have been created
+        self.call_from_thread(self.refresh_bucket_lists, True)
+
+    def update_transfer_progress(self):
+        for name, progress in self.transfer_progress.items():
+            if progress is None:
+                continue
+            stats = progress.snapshot()
+            self.query_one(f"#{name}-progress", ProgressBar).update(
+                total=max(stats["total_bytes"], 1), progress=stats["done_bytes"]
+            )
+            self.query_one(f"#{name}-stats", Static).update(
+                f"{stats['done_files']}/{stats['total_files']} files, "
+                f"{stats['done_bytes'] / MB:.1f}/{stats['total_bytes'] / MB:.1f} MB, "
+                f"{stats['throughput'] / MB:.1f} MB/s"
+            )
+
+    @work(thread=True, exclusive=True, group="outputs")
+    def list_outputs_in_background(self, output_prefix, log: RichLog):
+        try:
+            objects = self.runner.s3_list_outputs(output_prefix)
+        except Exception as e:
+            self.call_from_thread(
+                log.write, f"[bold red]unable to list {output_prefix}: {e}[/bold red]"
+            )
+            return
+        self.call_from_thread(self.show_outputs, output_prefix, objects)
+
+    def show_outputs(self, output_prefix, objects):
+        self.output_objects = {obj["Key"]: obj for obj in objects}
+        files = self.query_one("#outputs-files", SelectionList)
+        files.clear_options()
+        files.add_options(
+            [
+                (
+                    f"{obj['Key'][len(output_prefix):]} ({obj['Size'] / MB:.1f} MB)",
+                    obj["Key"],
+                )
+                for obj in objects
+            ]
+        )
+
+    @work(thread=True, exclusive=True, group="download")
+    def download_in_background(self, output_prefix, objects, destination, log: RichLog):
+        progress = TransferProgress()
+        self.transfer_progress["download"] = progress
+        try:
+            self.runner.s3_download_outputs(
+                output_prefix,
+                objects,
+                destination,
+                progress=progress,
+                logger=ThreadSafeLog(self, log),
+            )
+        except Exception as e:
+            self.call_from_thread(
+                log.write, f"[bold red]download failed: {e}[/bold red]"
+            )
+        finally:
+            self.call_from_thread(self.update_transfer_progress)
+            self.transfer_progress["download"] = None
+
+    @work(thread=True, exclusive=True, group="batch")
+    def submit_batch_in_background(self, manifest_path, priority=0):
+        workers = self.runner.config.get("app", {}).get("batch_workers", 16)
+        self.runner.run_batch(
+            manifest_path, workers=workers, logger=self.run_log, priority=priority
+        )
+
+    @on(DirectoryTree.DirectorySelected)
+    def scan_selected_folder(self, event: DirectoryTree.DirectorySelected):
+        self.selected_folder_to_upload = event.path
+        self.scan_folder_in_background(event.path)
+
+    @on(Select.Changed, "#data-destination-bucket")
+    def update_preflight(self):
+        if self.selected_folder_to_upload is not None:
+            self.scan_folder_in_background(self.selected_folder_to_upload)
+
+    @work(thread=True, exclusive=True, group="scan")
+    def scan_folder_in_background(self, folder):
+        """
+        Count the files and bytes of the folder selected for upload and estimate what
+        uploading it would send, without holding up the interface on large trees.
+        """
+        worker = get_current_worker()
+        totals = self.runner.folder_scanner.scan(
+            folder,
+            on_progress=lambda totals: self.call_from_thread(
+                self.show_scan_progress, totals
+            ),
+            cancelled=lambda: worker.is_cancelled,
+        )
+        if totals is None:
+            return
+        destination = self.call_from_thread(self.upload_destination, folder)
+        try:
+            preflight = self.runner.upload_preflight(str(folder), destination, totals)
+        except Exception as e:
+            self.call_from_thread(
+                self.query_one("#upload-preflight", Static).update,
+                f"unable to estimate the upload: {e}",
+            )
+            return
+        if not worker.is_cancelled:
+            self.call_from_thread(self.show_preflight, destination, totals, preflight)
+
+    def show_scan_progress(self, totals):
+        self.query_one("#upload-preflight", Static).update(
+            f"scanning... {totals['files']:,} files, {totals['bytes'] / MB:,.1f} MB "
+            f"in {totals['directories']:,} folders so far"
+        )
 
-            aws_cli_ui.write(
-                f"Run the following on a terminal to copy data to S3, wait for it finish and return to new bid to select it:\n\n[bold #AAAAAA on #162138]aws s3 sync {selected_dir} s3://destination[/bold #AAAAAA on #162138]"
+    def show_preflight(self, destination, totals, preflight):
+        if preflight["eta"] is None:
+            eta = "upload time is estimated once an upload has been timed"
+        else:
+            minutes, seconds = divmod(int(preflight["eta"]), 60)
+            eta = (
+                f"about {minutes} min {seconds} s at {preflight['throughput'] / MB:.1f} MB/s"
+                " (recent uploads)"
             )
+        self.query_one("#upload-preflight", Static).update(
+            f"{totals['files']:,} files, {totals['bytes'] / MB:,.1f} MB in {totals['directories']:,} folders "
+            f"(scanned in {totals['elapsed']:.1f}s)\n"
+            f"to send to {destination}: {preflight['send_files']:,} files, {preflight['send_bytes'] / MB:,.1f} MB, "
+            f"{preflight['unchanged_files']:,} files ({preflight['unchanged_bytes'] / MB:,.1f} MB) likely unchanged\n"
+            f"{eta}"
+        )
 
     @on(DirectoryTree.DirectorySelected)
     def update_pretty_output(self):
@@ -582,9 +1259,23 @@ class BidRunnerApp(App):
         selected_folder_ui.update(selected_folder_to_show)
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bidrunner2")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="start the app, exit after the first frame and report import and startup times",
+    )
+    args = parser.parse_args(argv)
+
+    if args.profile_startup:
+        startup.profile_startup()
+        return
+
+    startup.mark("start_and_imports")
     app = BidRunnerApp()
-    app.run()
+    # without a terminal (e.g. in CI) the profiled app still has to draw a frame
+    app.run(headless=startup.profiling() and not sys.stdout.isatty())
 
 
 if __name__ == "__main__":
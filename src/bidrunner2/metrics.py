@@ -0,0 +1,327 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from bidrunner2.scheduler import THROTTLING_CODES
+
+# upper bounds (seconds) of the latency histogram buckets, the last one is +Inf
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    300,
+    900,
+    3600,
+)
+
+# key kept in botocore's per-call context to time the call
+_START_KEY = "bidrunner2_start"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, the shape Prometheus expects, with the max kept too.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimate of the `q` quantile, interpolated within its bucket.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+class OperationStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "throttles": self.throttles,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency": self.latency.snapshot(),
+        }
+
+
+def _operation(event_name):
+    # botocore event names are "<event>.<service>.<operation>"
+    _, service, operation = event_name.split(".", 2)
+    return service, operation
+
+
+def _content_length(headers):
+    # chunked S3 uploads only carry the payload size in the decoded length header
+    for name in ("X-Amz-Decoded-Content-Length", "Content-Length"):
+        value = headers.get(name) or headers.get(name.lower())
+        if value:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                pass
+    return 0
+
+
+class Metrics:
+    """
+    Collects latency, retries, throttles and bytes of every AWS call by hooking
+    botocore's event system (see `install`), and app level spans: named durations
+    that start in one place and end in another, e.g. from submitting a bid to its
+    task running.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.spans = {}
+        self._open_spans = {}
+        self.started = time.time()
+
+    def install(self, session):
+        """
+        Register the hooks on a boto3 Session (or a botocore or aiobotocore one),
+        clients created from it afterwards report to this collector.
+        """
+        # boto3 Sessions expose their event emitter, botocore Sessions register directly
+        events = getattr(session, "events", session)
+        events.register("before-call", self._before_call, unique_id="bidrunner2-bc")
+        events.register("after-call", self._after_call, unique_id="bidrunner2-ac")
+        events.register(
+            "after-call-error", self._after_call_error, unique_id="bidrunner2-ace"
+        )
+        events.register("before-send", self._before_send, unique_id="bidrunner2-bs")
+        events.register("needs-retry", self._needs_retry, unique_id="bidrunner2-nr")
+
+    def _stats(self, event_name):
+        key = _operation(event_name)
+        stats = self.operations.get(key)
+        if stats is None:
+            stats = self.operations[key] = OperationStats()
+        return stats
+
+    def _before_call(self, event_name, context=None, **kwargs):
+        if context is not None:
+            context[_START_KEY] = time.perf_counter()
+
+    def _after_call(
+        self, event_name, http_response=None, parsed=None, context=None, **kwargs
+    ):
+        elapsed = None
+        if context is not None and _START_KEY in context:
+            elapsed = time.perf_counter() - context.pop(_START_KEY)
+        parsed = parsed or {}
+        metadata = parsed.get("ResponseMetadata", {})
+        with self.lock:
+            stats = self._stats(event_name)
+            stats.calls += 1
+            if elapsed is not None:
+                stats.latency.observe(elapsed)
+            if parsed.get("Error") or metadata.get("HTTPStatusCode", 200) >= 400:
+                stats.errors += 1
+            stats.retries += metadata.get("RetryAttempts", 0)
+            if http_response is not None:
+                stats.bytes_received += _content_length(http_response.headers)
+
+    def _after_call_error(self, event_name, context=None, **kwargs):
+        elapsed = None
+        if context is not None and _START_KEY in context:
+            elapsed = time.perf_counter() - context.pop(_START_KEY)
+        with self.lock:
+            stats = self._stats(event_name)
+            stats.calls += 1
+            stats.errors += 1
+            if elapsed is not None:
+                stats.latency.observe(elapsed)
+
+    def _before_send(self, event_name, request=None, **kwargs):
+        if request is None:
+            return
+        sent = _content_length(request.headers)
+        if not sent and isinstance(request.body, (bytes, str)):
+            sent = len(request.body)
+        with self.lock:
+            self._stats(event_name).bytes_sent += sent
+
+    def _needs_retry(self, event_name, response=None, **kwargs):
+        # only observes, returning a value here would change botocore's retry decision
+        if not response:
+            return None
+        code = response[1].get("Error", {}).get("Code")
+        if code in THROTTLING_CODES:
+            with self.lock:
+                self._stats(event_name).throttles += 1
+        return None
+
+    def start_span(self, name, key):
+        """
+        Start timing `name` for `key` (e.g. a task arn), unless it already started.
+        """
+        with self.lock:
+            self._open_spans.setdefault((name, key), time.perf_counter())
+
+    def end_span(self, name, key):
+        """
+        Record how long ago `start_span(name, key)` was called, if it was.
+        """
+        with self.lock:
+            start = self._open_spans.pop((name, key), None)
+            if start is not None:
+                self._observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self._observe(name, seconds)
+
+    def _observe(self, name, seconds):
+        histogram = self.spans.get(name)
+        if histogram is None:
+            histogram = self.spans[name] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, name):
+        """
+        Time the body of a `with` block as the span `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def operation_rows(self):
+        """
+        (service, operation, stats snapshot) for every operation called, sorted.
+        """
+        with self.lock:
+            return [
+                (service, operation, stats.snapshot())
+                for (service, operation), stats in sorted(self.operations.items())
+            ]
+
+    def span_rows(self):
+        with self.lock:
+            return [(name, h.snapshot()) for name, h in sorted(self.spans.items())]
+
+    def snapshot(self):
+        return {
+            "started": self.started,
+            "time": time.time(),
+            "operations": [
+                {"service": service, "operation": operation, **stats}
+                for service, operation, stats in self.operation_rows()
+            ],
+            "spans": [{"name": name, **stats} for name, stats in self.span_rows()],
+        }
+
+    def prometheus(self):
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def histogram(metric, labels, snapshot):
+            cumulative = 0
+            for bound, count in snapshot["buckets"].items():
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {snapshot['sum']}")
+            lines.append(f"{metric}_count{{{labels}}} {snapshot['count']}")
+
+        operations = self.operation_rows()
+        lines.append("# HELP bidrunner2_aws_call_seconds Latency of AWS API calls.")
+        lines.append("# TYPE bidrunner2_aws_call_seconds histogram")
+        for service, operation, stats in operations:
+            labels = f'service="{service}",operation="{operation}"'
+            histogram("bidrunner2_aws_call_seconds", labels, stats["latency"])
+        for counter, help_text in (
+            ("calls", "AWS API calls made."),
+            ("errors", "AWS API calls that failed."),
+            ("retries", "Retries made by botocore."),
+            ("throttles", "Attempts throttled by AWS."),
+            ("bytes_sent", "Bytes sent in request bodies."),
+            ("bytes_received", "Bytes received in response bodies."),
+        ):
+            metric = f"bidrunner2_aws_{counter}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for service, operation, stats in operations:
+                labels = f'service="{service}",operation="{operation}"'
+                lines.append(f"{metric}{{{labels}}} {stats[counter]}")
+
+        lines.append("# HELP bidrunner2_span_seconds Duration of app level spans.")
+        lines.append("# TYPE bidrunner2_span_seconds histogram")
+        for name, stats in self.span_rows():
+            histogram("bidrunner2_span_seconds", f'span="{name}"', stats)
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """
+        Write a JSON snapshot (for `.json` paths) or Prometheus text file to `path`,
+        replacing it in one step so a collector never reads half a file.
+        """
+        path = os.path.expanduser(str(path))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith(".json"):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.prometheus()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return path
@@ -0,0 +1,62 @@
+# where tasks are started when the config has no `[[placement]]` tables
+DEFAULT_PLACEMENT = {
+    "region": "us-east-2",
+    "cluster": "water-tracker-cluster",
+    "task_definition": "water-tracker-bid-runs:1",
+    "subnets": ["subnet-f58504b8", "subnet-876f54ee", "subnet-71b3c80a"],
+    "security_groups": [],
+    "assign_public_ip": True,
+}
+
+
+def load_placements(config):
+    """
+    The `[[placement]]` tables of the config, with defaults for the keys they leave
+    out, or the default placement if there are none.
+    """
+    tables = (config or {}).get("placement") or []
+    if isinstance(tables, dict):
+        tables = [tables]
+    placements = []
+    for table in tables:
+        if not table.get("region"):
+            raise ValueError(f"every [[placement]] needs a region, got {table}")
+        if table["region"] != DEFAULT_PLACEMENT["region"] and not table.get("subnets"):
+            raise ValueError(
+                f"the placement in {table['region']} needs the subnets tasks run in there"
+            )
+        placements.append(dict(DEFAULT_PLACEMENT, **table))
+    return placements or [dict(DEFAULT_PLACEMENT)]
+
+
+def order_placements(placements, region):
+    """
+    `placements` in the order to try them for data in `region`: the ones in that
+    region first, then the others as they are configured.
+    """
+    return sorted(placements, key=lambda placement: placement["region"] != region)
+
+
+def bucket_region(location_constraint):
+    """
+    Region of a bucket from the LocationConstraint `get_bucket_location` returns.
+    """
+    # buckets in us-east-1 have no location constraint, and old eu-west-1 ones say EU
+    if not location_constraint:
+        return "us-east-1"
+    if location_constraint == "EU":
+        return "eu-west-1"
+    return location_constraint
+
+
+def parse_task_arn(task_arn):
+    """
+    (region, cluster) of a task arn, None for parts it does not have: arns from
+    before ECS put the cluster name in them only have the region.
+    """
+    # arn:aws:ecs:<region>:<account>:task/<cluster>/<task id>
+    parts = task_arn.split(":", 5)
+    if len(parts) != 6 or parts[2] != "ecs":
+        return None, None
+    resource = parts[5].split("/")
+    return parts[3] or None, resource[1] if len(resource) == 3 else None
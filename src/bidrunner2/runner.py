@@ -0,0 +1,1061 @@
+import fnmatch
+import os
+import pathlib
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import toml
+
+from bidrunner2 import compare
+from bidrunner2.batch import (
+    queue_batch,
+    read_manifest,
+    submit_batch,
+    summarize_batch,
+)
+from bidrunner2.cache import ListingCache, ObjectIndex
+from bidrunner2.clients import ClientRegistry
+from bidrunner2.history import RunHistory
+from bidrunner2.logs import LogBuffer, LogTailer
+from bidrunner2.metrics import Metrics
+from bidrunner2.placement import bucket_region, load_placements, order_placements
+from bidrunner2.scheduler import (
+    SubmissionScheduler,
+    TaskNotStartedError,
+    TokenBucket,
+    is_capacity_error,
+)
+from bidrunner2.shapefile import missing_sidecars
+from bidrunner2.sizing import input_profile, recommend_size, task_size
+from bidrunner2.store import MessageStore
+from bidrunner2.sync import (
+    FolderScanner,
+    SyncIndex,
+    compute_sync_delta,
+    likely_unchanged,
+    list_remote_files,
+)
+from bidrunner2.tracker import TaskTracker
+from bidrunner2.transfer import (
+    MB,
+    DownloadManager,
+    TransferProgress,
+    UploadEngine,
+    parse_s3_destination,
+)
+
+# Textual is not imported here, so the headless commands in `bidrunner2.cli` can use
+# BidRunner without loading the app
+
+
+# Helper Functions --------------------------------------------
+
+
+def log_with_timestamp():
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[bold green][{ts}][/bold green]"
+
+
+def create_config_file(config_dir: pathlib.Path, config_file: str):
+    # create bidrunner folder if not exists
+    print("isnide the config file creation function")
+    config_dir.mkdir(parents=True, exist_ok=True)
+    default_config = {
+        "app": {"s3_input_root": "", "s3_output_root": ""},
+        "aws": {"aws_access_key_id": "", "aws_secret_access_key": "", "queue_url": ""},
+    }
+
+    config_file_path = config_dir / config_file
+
+    print(f"creating the file: {config_file_path}")
+
+    with open(config_file_path, "w") as f:
+        toml.dump(default_config, f)
+
+
+# Bidrunner AWS ----------------------------------------
+
+
+class BidRunner:
+    def __init__(self):
+        self.aws_credentials_set = False
+        self.aws_creds = {}
+        self.metrics = Metrics()
+        self.clients = ClientRegistry(
+            credential_source=self.config_credentials, metrics=self.metrics
+        )
+        self.runner_details = {}
+        self.details_lock = threading.Lock()
+        self.tracker = TaskTracker(self, metrics=self.metrics)
+        # formatted queue messages already shown, keyed by message id
+        self.sqs_status = LogBuffer(maxlen=1000)
+        self.task_status = []
+        self.config = None
+        self.config_path = None
+        self._message_store = None
+        self._sync_index = None
+        self._folder_scanner = None
+        self._listing_cache = None
+        self._object_index = None
+        # input folder sizes and shapefile feature counts, see `s3_input_profile`
+        self._input_profiles = {}
+        # measures the profiles of submitted runs one at a time, see `record_task`
+        self._profile_pool = None
+        self._placements = None
+        # region of each bucket, see `s3_bucket_region`
+        self._bucket_regions = {}
+        self._scheduler = None
+        self._run_history = None
+        self._run_task_limiter = None
+
+    def load_config(self):
+        """
+        Load users config file. If one does not exist, then create a blank version with instructions
+        to user on how access and update it.
+
+        On linux this config file should be under $USER/.config/bidrunner2/config.toml and on windows this
+        should be %LOCALAPPDATA%/bidrunner2/config.toml
+        """
+        if platform.system() == "Windows":
+            appdata_env = os.environ.get("LOCALAPPDATA")
+        elif platform.system() == "Linux":
+            appdata_env = f'{os.environ.get("HOME")}/.config'
+        local_appdata_path = pathlib.Path(appdata_env, "")
+        config_path = local_appdata_path / "bidrunner2"
+        config_file = config_path / "config.toml"
+        self.app_dir = config_path
+        try:
+            with open(config_file, "r") as f:
+                self.config_path = config_file
+                self.config = toml.load(f)
+        except FileNotFoundError as e:
+            create_config_file(config_path, "config.toml")
+            with open(config_file, "r") as f:
+                self.config_path = config_file
+                self.config = toml.load(f)
+            raise Exception(
+                f"""found incomplete config file, insert appropriate values to continue, use the following:\n 
+                Windows: notepad {self.config_path}\n
+                Linux: vim {self.config_path}
+                """
+            )
+        except Exception as e:
+            raise Exception(f"ERROR {e}")
+        # every status change the tracker sees is kept in the run history
+        self.tracker.history = self.run_history
+
+    @property
+    def message_store(self):
+        """
+        Local store of every queue message, created next to the config file on first use.
+        """
+        if self._message_store is None:
+            self._message_store = MessageStore(self.app_dir / "messages.db")
+        return self._message_store
+
+    @property
+    def run_history(self):
+        """
+        Every bid submitted from this computer, kept in `history.db` next to the config file.
+        """
+        if self._run_history is None:
+            self._run_history = RunHistory(self.app_dir / "history.db")
+        return self._run_history
+
+    def configure_clients(self):
+        """
+        Apply connection settings from the `[aws]` section of the config to the shared
+        client registry.
+        """
+        aws_config = (self.config or {}).get("aws", {})
+        self.clients.max_pool_connections = aws_config.get("max_pool_connections", 10)
+        self.clients.tcp_keepalive = aws_config.get("tcp_keepalive", True)
+        self.clients.connect_timeout = aws_config.get("connect_timeout", 10)
+        self.clients.read_timeout = aws_config.get("read_timeout", 60)
+
+    def config_credentials(self):
+        """
+        Re-read the config file and return the aws credentials in it, used to pick up
+        a new session token once the old one expires.
+        """
+        with open(self.config_path, "r") as f:
+            self.config = toml.load(f)
+        aws_config = self.config.get("aws", {})
+        self.aws_set_credentials(
+            aws_config.get("aws_access_key_id"),
+            aws_config.get("aws_secret_access_key"),
+            aws_config.get("aws_session_token"),
+            rebuild_clients=False,
+        )
+        return self.aws_creds
+
+    def set_logger(self, log):
+        """
+        Set where run messages are written, a RichLog or a LogBuffer
+        """
+        self.logger = log
+
+    def aws_set_credentials(
+        self, access_key, secret_key, session_token=None, rebuild_clients=True
+    ):
+        self.aws_creds = {}
+        self.aws_creds["aws_access_key_id"] = access_key
+        self.aws_creds["aws_secret_access_key"] = secret_key
+        if session_token:
+            self.aws_creds["aws_session_token"] = session_token
+        if rebuild_clients:
+            self.clients.set_credentials(self.aws_creds)
+
+    @property
+    def use_async_backend(self):
+        """
+        Whether to make AWS calls through `bidrunner2.aio`: when aiobotocore is
+        installed, unless `async_backend = false` under `[app]`.
+        """
+        from bidrunner2 import aio
+
+        app_config = (self.config or {}).get("app", {})
+        return aio.available() and app_config.get("async_backend", True)
+
+    def ecs_client(self, region_name=None, max_pool_connections=None):
+        """
+        The shared ECS client for `region_name`, the region of the first placement
+        target by default.
+        """
+        if region_name is None:
+            region_name = self.placements[0]["region"]
+        return self.clients.client(
+            "ecs", region_name, max_pool_connections=max_pool_connections
+        )
+
+    @property
+    def placements(self):
+        """
+        Where bid tasks can run: the region, cluster, task definition and network of
+        each `[[placement]]` in the config, see `bidrunner2.placement`.
+        """
+        if self._placements is None:
+            self._placements = load_placements(self.config)
+        return self._placements
+
+    def s3_bucket_region(self, bucket):
+        """
+        Region of `bucket`, looked up once per run of the app. None when it cannot be
+        found, e.g. without `s3:GetBucketLocation` permission.
+        """
+        if bucket not in self._bucket_regions:
+            try:
+                resp = self.clients.client("s3", "us-west-2").get_bucket_location(
+                    Bucket=bucket
+                )
+                region = bucket_region(resp.get("LocationConstraint"))
+            except Exception as e:
+                self.logger.write(
+                    f"{log_with_timestamp()} could not find the region of {bucket}: {e}"
+                )
+                region = None
+            self._bucket_regions[bucket] = region
+        return self._bucket_regions[bucket]
+
+    def placements_for_input(self):
+        """
+        Placement targets to try for a bid, the ones in its input bucket's region first
+        so tasks read their inputs without leaving the region.
+        """
+        if len(self.placements) == 1:
+            return list(self.placements)
+        s3_input_root = (self.config or {}).get("app", {}).get("s3_input_root")
+        region = self.s3_bucket_region(s3_input_root) if s3_input_root else None
+        return order_placements(self.placements, region)
+
+    def submit_task(self, args, cpu=None, memory=None):
+        """
+        Start a single Fargate task for a bid and return its task arn. `args` are the
+        container arguments: bid name, input prefix, shapefile and output prefix.
+        `cpu` (units, 1024 = 1 vCPU) and `memory` (MiB) override the size set in the
+        task definition.
+
+        The task goes to the placement target in the input bucket's region, the next
+        targets are tried when a target has no capacity for it.
+
+        Safe to call from several threads at once, every arn is kept in `runner_details`.
+        """
+        cpu, memory = task_size(cpu, memory)
+        overrides = self.task_overrides(args, cpu, memory)
+        targets = self.placements_for_input()
+        for attempt, placement in enumerate(targets, start=1):
+            self.run_task_limiter.acquire()
+            resp = self.ecs_client(placement["region"]).run_task(
+                **self.run_task_params(placement, overrides)
+            )
+            task_arn = self.started_task_arn(
+                resp, args, placement, last=attempt == len(targets)
+            )
+            if task_arn:
+                break
+        self.record_task(args, placement["cluster"], task_arn, cpu, memory)
+        return task_arn
+
+    def task_overrides(self, args, cpu=None, memory=None):
+        """
+        RunTask overrides that run the container on `args`, at the given size (see
+        `sizing.task_size` when only one of `cpu` and `memory` is given).
+        """
+        cpu, memory = task_size(cpu, memory)
+
+        # overwrite container commands with those from the app
+        overwrite_command = ["bash", "execute.sh"]
+        overwrite_command.extend(args)
+
+        overrides = {
+            "containerOverrides": [
+                {
+                    "name": "bidrunner",
+                    "command": overwrite_command,
+                    "environment": [
+                        {"name": k.upper(), "value": v}
+                        for k, v in self.aws_creds.items()
+                    ],
+                }
+            ]
+        }
+        if cpu:
+            overrides["cpu"] = str(cpu)
+        if memory:
+            overrides["memory"] = str(memory)
+        return overrides
+
+    def run_task_params(self, placement, overrides):
+        network = {
+            "subnets": placement["subnets"],
+            "assignPublicIp": "ENABLED"
+            if placement["assign_public_ip"]
+            else "DISABLED",
+        }
+        if placement["security_groups"]:
+            network["securityGroups"] = placement["security_groups"]
+        return {
+            "cluster": placement["cluster"],
+            "taskDefinition": placement["task_definition"],
+            "count": 1,
+            "launchType": "FARGATE",
+            "networkConfiguration": {"awsvpcConfiguration": network},
+            "overrides": overrides,
+        }
+
+    def started_task_arn(self, resp, args, placement, last=True):
+        """
+        Arn of the task a RunTask response started. None when `placement` had no
+        capacity and there is another one to try, raises TaskNotStartedError otherwise.
+        """
+        if resp.get("tasks"):
+            return resp["tasks"][0]["taskArn"]
+        error = TaskNotStartedError([f.get("reason") for f in resp.get("failures", [])])
+        if last or not is_capacity_error(error):
+            raise error
+        self.logger.write(
+            f"{log_with_timestamp()} no capacity for {args[0]} on {placement['cluster']} "
+            f"({placement['region']}), trying the next placement"
+        )
+        return None
+
+    def record_task(self, args, cluster_name, task_arn, cpu=None, memory=None):
+        """
+        Track a task that was just started and keep it in the run history.
+        """
+        with self.details_lock:
+            self.runner_details["cluster"] = cluster_name
+            self.runner_details.setdefault("tasks", []).append(task_arn)
+        self.tracker.track(cluster_name, task_arn, bid_name=args[0])
+        profile = self._input_profiles.get((args[1], args[2]))
+        self.run_history.record_submission(
+            task_arn,
+            cluster_name,
+            args,
+            cpu=int(cpu) if cpu else None,
+            memory=int(memory) if memory else None,
+            **(profile or {}),
+        )
+        if profile is None:
+            # listing the input folder can take a while, it is not waited on here
+            if self._profile_pool is None:
+                self._profile_pool = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="bidrunner2-profile"
+                )
+            self._profile_pool.submit(self.record_input_profile, task_arn, args)
+        self.metrics.start_span("submit_to_running", task_arn)
+        self.metrics.start_span("submit_to_stopped", task_arn)
+        self.metrics.start_span("submit_to_first_message", args[0])
+
+    def record_input_profile(self, task_arn, args):
+        """
+        Measure the inputs of a submitted run and save them to the run history, for
+        sizing later bids.
+        """
+        try:
+            profile = self.s3_input_profile(args[1], args[2])
+        except Exception:
+            # the task is running, it just will not help size later ones. Not asked
+            # again for this folder so a failing listing is not repeated for every bid
+            profile = self._input_profiles.setdefault((args[1], args[2]), {})
+        if profile:
+            self.run_history.update_profile(task_arn, **profile)
+
+    @property
+    def run_task_limiter(self):
+        """
+        Token bucket every RunTask call goes through, `run_task_rate` calls per second
+        with bursts of `run_task_burst` from the optional `[scheduler]` section.
+        """
+        if self._run_task_limiter is None:
+            scheduler_config = (self.config or {}).get("scheduler", {})
+            self._run_task_limiter = TokenBucket(
+                rate=scheduler_config.get("run_task_rate", 5),
+                burst=scheduler_config.get("run_task_burst", 10),
+            )
+        return self._run_task_limiter
+
+    @property
+    def scheduler(self):
+        """
+        Queue that `run` submits bids through, configured from `[scheduler]`.
+        """
+        if self._scheduler is None:
+            scheduler_config = (self.config or {}).get("scheduler", {})
+            self._scheduler = SubmissionScheduler(
+                self,
+                max_running=scheduler_config.get("max_running", 50),
+                max_retries=scheduler_config.get("max_retries", 8),
+                max_delay=scheduler_config.get("max_retry_delay", 60),
+                workers=scheduler_config.get("submit_workers", 8),
+                on_event=self.log_submission,
+            )
+        return self._scheduler
+
+    def log_submission(self, event, job):
+        bid_name = job["bid_name"]
+        if event == "queued":
+            waiting = len(self.scheduler.pending()) - 1
+            self.logger.write(
+                f"{log_with_timestamp()} queued bid {bid_name} (priority {job['priority']}, {waiting} ahead)"
+            )
+        elif event == "submitted":
+            self.logger.write(
+                f"{log_with_timestamp()} created new task for {bid_name} at: [bold green]{job['task_arn']}[/bold green]"
+            )
+            self.logger.write(
+                f"{log_with_timestamp()} you can continue to check status by clicking [bold green]`Check Task Status`[/bold green]"
+            )
+        elif event == "retry":
+            delay = max(0, job["retry_at"] - time.time())
+            self.logger.write(
+                f"{log_with_timestamp()} [bold yellow]submitting {bid_name} failed, retrying in {delay:.1f}s[/bold yellow] (attempt {job['attempts']}): {job['error']}"
+            )
+        elif event == "failed":
+            self.logger.write(
+                f"{log_with_timestamp()} An error occured trying to run the task for {bid_name}"
+            )
+            self.logger.write(f"{job['error']}")
+
+    def run(self, args, priority=0, cpu=None, memory=None):
+        """
+        Queue a bid for submission, it starts once the scheduler has room for it.
+        """
+        return self.scheduler.submit(args, priority=priority, cpu=cpu, memory=memory)
+
+    def s3_input_profile(self, input_prefix, shapefile):
+        """
+        Total bytes under `input_prefix` of the input bucket and the features in its
+        `shapefile`, measured once per run of the app. Listing the folder also
+        refreshes its object index.
+        """
+        key = (input_prefix, shapefile)
+        if key not in self._input_profiles:
+            s3_input_root = self.config["app"]["s3_input_root"]
+            _, objects = self.s3_list(s3_input_root, prefix=input_prefix)
+            sizes = {o["Key"][len(input_prefix) :]: o["Size"] for o in objects}
+            self.object_index.put(s3_input_root, input_prefix, list(sizes))
+            self._input_profiles[key] = input_profile(sizes, shapefile)
+        return self._input_profiles[key]
+
+    def recommend_size(self, input_prefix, shapefile):
+        """
+        Suggested cpu and memory for a bid, from the past runs with the most similar
+        inputs, see `bidrunner2.sizing.recommend_size`. Configured from `[sizing]`.
+        """
+        sizing_config = (self.config or {}).get("sizing", {})
+        if not self._input_profiles.get((input_prefix, shapefile)):
+            # measured again when a submission could not measure it
+            self._input_profiles.pop((input_prefix, shapefile), None)
+        profile = self.s3_input_profile(input_prefix, shapefile)
+        recommendation = recommend_size(
+            self.run_history.finished_runs(),
+            neighbours=sizing_config.get("neighbours", 10),
+            target_seconds=sizing_config.get("target_run_minutes", 60) * 60,
+            **profile,
+        )
+        recommendation.update(profile)
+        return recommendation
+
+    def run_batch(
+        self, manifest_path, workers=16, logger=None, priority=0, queued=True
+    ):
+        """
+        Submit every bid listed in a manifest file, see `bidrunner2.batch` for the format.
+        Pass `logger` when calling from a thread other than the app's.
+
+        Bids go through the submission queue, with `priority` unless their row has
+        one, and the queued jobs are returned. With `queued=False` they are all
+        submitted at once by `workers` threads instead, and their results returned.
+        """
+        logger = logger or self.logger
+        try:
+            rows = read_manifest(manifest_path)
+        except Exception as e:
+            logger.write(
+                f"{log_with_timestamp()} [bold red]unable to read manifest {manifest_path}: {e}[/bold red]"
+            )
+            return []
+
+        if queued:
+            jobs, invalid = queue_batch(self, rows, priority=priority)
+            for row, bid_name, error in invalid:
+                logger.write(
+                    f"{log_with_timestamp()} [bold red]row {row} ({bid_name}) skipped[/bold red]: {error}"
+                )
+            logger.write(
+                f"{log_with_timestamp()} queued {len(jobs)} bids from {manifest_path}"
+            )
+            return jobs
+
+        logger.write(
+            f"{log_with_timestamp()} submitting {len(rows)} bids from {manifest_path} using {workers} workers"
+        )
+
+        def log_result(result):
+            if result["error"]:
+                logger.write(
+                    f"{log_with_timestamp()} [bold red]row {result['row']} ({result['bid_name']}) failed[/bold red] after {result['latency']:.2f}s: {result['error']}"
+                )
+            else:
+                logger.write(
+                    f"{log_with_timestamp()} row {result['row']} ({result['bid_name']}) submitted in {result['latency']:.2f}s: [bold green]{result['task_arn']}[/bold green]"
+                )
+
+        start = time.perf_counter()
+        if self.use_async_backend:
+            from bidrunner2 import aio
+
+            results = aio.submit_batch(
+                self, rows, workers=workers, on_result=log_result
+            )
+        else:
+            results = submit_batch(self, rows, workers=workers, on_result=log_result)
+        summary = summarize_batch(results, time.perf_counter() - start)
+        self.metrics.observe("batch_submit", summary["elapsed"])
+        logger.write(
+            f"{log_with_timestamp()} batch done: {summary['submitted']}/{summary['total']} submitted, "
+            f"{summary['failed']} failed in {summary['elapsed']:.2f}s "
+            f"(p50 {summary['latency_p50']:.2f}s, max {summary['latency_max']:.2f}s)"
+        )
+        return results
+
+    def check_task_status(self):
+        if len(self.runner_details) == 0:
+            self.logger.write(
+                f"runner details is empty, did you run the a bid first? Value of runner_details: {self.runner_details}"
+            )
+        if not self.runner_details.get("tasks") or not self.runner_details.get(
+            "cluster"
+        ):
+            self.logger.write(
+                f"invalid values for tasks and cluster, these are tasks={self.runner_details.get('tasks')} and cluster={self.runner_details.get('cluster')}"
+            )
+        else:
+            self.tracker.refresh()
+            latest = self.tracker.latest()
+            self.task_status.append(latest["last_status"])
+
+    def sqs_process_message(self, message):
+        msg_id = message.get("MessageId")
+        msg_receipt = message.get("ReceiptHandle")
+        msg_body = message.get("Body")
+        msg_sent_timestamp = message.get("Attributes", {}).get("SentTimestamp", 0)
+        msg_bid_name = (
+            message.get("MessageAttributes", {}).get("bid_name", {}).get("StringValue")
+        )
+
+        return {
+            "id": msg_id,
+            "receipt": msg_receipt,
+            "body": msg_body,
+            "sent_timestamp": int(msg_sent_timestamp),
+            "timestamp": datetime.fromtimestamp(int(msg_sent_timestamp) / 1000),
+            "bid_name": msg_bid_name,
+        }
+
+    def sqs_format_message(self, message):
+        return f"[bold magenta]{log_with_timestamp()}[/bold magenta][bold cyan]{message.get('bid_name')}[/bold cyan] - {message.get('body')}"
+
+    def sqs_receive_messages(self, queue_url, wait_time=20):
+        """
+        Receive up to 10 messages from the queue, waiting at most `wait_time` seconds for
+        one to arrive. Messages are returned processed and sorted by the time they were sent.
+        """
+        sqs_client = self.clients.client("sqs", "us-east-2")
+        resp = sqs_client.receive_message(
+            QueueUrl=queue_url,
+            AttributeNames=["All"],
+            MessageAttributeNames=["All"],
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=wait_time,
+        )
+        messages = [self.sqs_process_message(m) for m in resp.get("Messages", [])]
+        return sorted(messages, key=lambda x: x["timestamp"])
+
+    def sqs_delete_messages(self, queue_url, messages):
+        """
+        Acknowledge messages with `delete_message_batch`, 10 at a time. Returns the ids of
+        any messages that could not be deleted.
+        """
+        sqs_client = self.clients.client("sqs", "us-east-2")
+        failed = []
+        for i in range(0, len(messages), 10):
+            resp = sqs_client.delete_message_batch(
+                QueueUrl=queue_url,
+                Entries=[
+                    {"Id": str(n), "ReceiptHandle": m.get("receipt")}
+                    for n, m in enumerate(messages[i : i + 10])
+                ],
+            )
+            failed.extend(
+                messages[i + int(f["Id"])].get("id") for f in resp.get("Failed", [])
+            )
+        return failed
+
+    def sqs_store_messages(self, queue_url, messages):
+        """
+        Route received messages of every bid into the local message store and remove
+        them from the queue. Returns the messages that had not been stored before.
+        """
+        added = self.message_store.add_messages(messages)
+        if messages:
+            self.sqs_delete_messages(queue_url, messages)
+        for message in added:
+            self.metrics.end_span("submit_to_first_message", message.get("bid_name"))
+        return added
+
+    def get_latest_sqs_message(self, queue_url, bid_name):
+        try:
+            messages = self.sqs_receive_messages(queue_url)
+            added = self.sqs_store_messages(queue_url, messages)
+
+            for message in added:
+                if message.get("bid_name") == bid_name:
+                    self.sqs_status.append(
+                        self.sqs_format_message(message), key=message.get("id")
+                    )
+        except Exception as e:
+            self.logger.write(f"[bold red] Error procesing messages {e}[/bold red]")
+
+    def check_bid_status(self, q_url, bid_name, poll_queue=True):
+        self.check_task_status()
+        if poll_queue:
+            self.logger.write(
+                "[bold orange]Retrieving latest messages from Queue...[/bold orange]"
+            )
+            self.get_latest_sqs_message(q_url, bid_name)
+
+        if len(self.task_status) > 0:
+            self.logger.write(
+                f"[bold magenta]Task - status:[/bold magenta] {self.task_status.pop()}"
+            )
+        else:
+            self.logger.write("[bold magenta]Task - no new messages[/bold magenta]")
+
+    def s3_list(self, bucket, prefix="", delimiter=None):
+        """
+        List everything under `prefix`, returns the folder prefixes (only when a
+        `delimiter` is given) and the objects as returned by `list_objects_v2`.
+        """
+        s3_cl = self.clients.client("s3", "us-west-2")
+        paginator = s3_cl.get_paginator("list_objects_v2")
+        params = {"Bucket": bucket, "Prefix": prefix}
+        if delimiter:
+            params["Delimiter"] = delimiter
+        folders = []
+        objects = []
+
+        for page in paginator.paginate(**params):
+            for prefix in page.get("CommonPrefixes", []):
+                folders.append(prefix["Prefix"])
+            objects.extend(page.get("Contents", []))
+
+        return folders, objects
+
+    def s3_get_all_buckets(self, s3_root):
+        folders, _ = self.s3_list(s3_root, delimiter="/")
+        return [(f, f) for f in folders]
+
+    def s3_list_outputs(self, output_prefix):
+        """
+        Every object a bid wrote under `output_prefix` of the output bucket.
+        """
+        s3_output_root = self.config["app"]["s3_output_root"]
+        _, objects = self.s3_list(s3_output_root, prefix=output_prefix)
+        return objects
+
+    def s3_output_summary(self, output_prefix, key_column=None, pattern="*.csv"):
+        """
+        Totals per key of the output tables a bid wrote under `output_prefix`, those
+        whose name relative to it matches `pattern`. See `compare.summarize_table`.
+
+        Tables are streamed from S3 and parsed a chunk at a time, and the summary of
+        each object version is kept under `compare/` next to the config file so it is
+        only parsed once.
+        """
+        compare.require_numpy()
+        s3_output_root = self.config["app"]["s3_output_root"]
+        s3_cl = self.clients.client("s3", "us-west-2")
+        cache_dir = self.app_dir / "compare"
+        summaries = []
+        for obj in self.s3_list_outputs(output_prefix):
+            if not fnmatch.fnmatch(obj["Key"][len(output_prefix) :], pattern):
+                continue
+            cache_path = cache_dir / compare.summary_cache_name(
+                s3_output_root, obj["Key"], obj.get("ETag"), key_column
+            )
+            summary = compare.load_summary(cache_path)
+            if summary is None:
+                body = s3_cl.get_object(Bucket=s3_output_root, Key=obj["Key"])["Body"]
+                with compare.text_lines(body, obj["Key"]) as lines:
+                    summary = compare.summarize_table(lines, key_column=key_column)
+                compare.save_summary(cache_path, summary)
+            summaries.append(summary)
+        return compare.merge_summaries(summaries)
+
+    def compare_outputs(
+        self, output_prefixes, value_column, key_column=None, pattern="*.csv", workers=4
+    ):
+        """
+        Compare the totals of `value_column` per key across the outputs of several
+        bids, the first being the baseline. See `compare.compare_bids`. Bids are
+        summarized concurrently by `workers` threads.
+        """
+        with self.metrics.span("compare_outputs"), ThreadPoolExecutor(
+            max_workers=max(1, min(workers, len(output_prefixes)))
+        ) as pool:
+            summaries = dict(
+                zip(
+                    output_prefixes,
+                    pool.map(
+                        lambda prefix: self.s3_output_summary(
+                            prefix, key_column=key_column, pattern=pattern
+                        ),
+                        output_prefixes,
+                    ),
+                )
+            )
+        return summaries, compare.compare_bids(summaries, value_column)
+
+    def log_tailer(self):
+        """
+        Tailer for the task log streams, configured from the optional `[logs]` section.
+        """
+        logs_config = (self.config or {}).get("logs", {})
+        return LogTailer(
+            self,
+            log_group=logs_config.get("log_group", "/ecs/water-tracker-model-runs"),
+            stream_prefix=logs_config.get("stream_prefix", "ecs"),
+            container_name=logs_config.get("container_name", "bidrunner"),
+            region_name=logs_config.get("region"),
+        )
+
+    def run_log(self):
+        """
+        Buffer behind the Run Logs panel. `log_buffer_lines` under `[app]` bounds it
+        and `log_file` also keeps every line in a rotating, gzipped file.
+        """
+        app_config = (self.config or {}).get("app", {})
+        log_file = app_config.get("log_file")
+        return LogBuffer(
+            maxlen=app_config.get("log_buffer_lines", 10000),
+            spill_path=pathlib.Path(log_file).expanduser() if log_file else None,
+        )
+
+    def download_manager(self):
+        download_config = (self.config or {}).get("download", {})
+        max_concurrency = download_config.get("max_concurrency", 8)
+        return DownloadManager(
+            self.clients.client(
+                "s3", "us-west-2", max_pool_connections=max_concurrency
+            ),
+            self.app_dir / "downloads",
+            part_size=int(download_config.get("part_size_mb", 8) * MB),
+            max_concurrency=max_concurrency,
+        )
+
+    def s3_download_outputs(
+        self, output_prefix, objects, destination, progress=None, logger=None
+    ):
+        """
+        Download the listed output `objects` of a bid into the local folder `destination`.
+        Pass `logger` when calling from a thread other than the app's.
+        """
+        logger = logger or self.logger
+        if progress is None:
+            progress = TransferProgress()
+        s3_output_root = self.config["app"]["s3_output_root"]
+        logger.write(
+            f"{log_with_timestamp()} downloading {len(objects)} files from s3://{s3_output_root}/{output_prefix} to {destination}"
+        )
+        results = self.download_manager().download_objects(
+            s3_output_root,
+            objects,
+            destination,
+            prefix=output_prefix,
+            progress=progress,
+        )
+        for key, _, error in results:
+            if error:
+                logger.write(f"[bold red]failed to download {key}: {error}[/bold red]")
+
+        stats = progress.snapshot()
+        logger.write(
+            f"{log_with_timestamp()} downloaded {stats['done_files']}/{stats['total_files']} files "
+            f"({stats['done_bytes'] / MB:.1f} MB) in {stats['elapsed']:.1f}s at {stats['throughput'] / MB:.1f} MB/s"
+        )
+        self.metrics.observe("download_outputs", stats["elapsed"])
+        return results
+
+    @property
+    def listing_cache(self):
+        if self._listing_cache is None:
+            ttl = (self.config or {}).get("app", {}).get("listing_cache_ttl", 300)
+            self._listing_cache = ListingCache(self.app_dir / "listings.json", ttl=ttl)
+        return self._listing_cache
+
+    def s3_get_cached_buckets(self, s3_root):
+        """
+        Last listing of `s3_root` saved on disk, in the same format as `s3_get_all_buckets`,
+        and whether it is still within the cache ttl.
+        """
+        folders, fresh = self.listing_cache.get(s3_root)
+        return [(f, f) for f in folders], fresh
+
+    def s3_refresh_buckets(self, s3_roots, force=False):
+        """
+        List every root whose cached listing is stale (or all of them with `force`),
+        concurrently, and save the results. Returns {root: listing} for roots listed.
+        """
+        if force:
+            stale = list(s3_roots)
+        else:
+            stale = [r for r in s3_roots if not self.s3_get_cached_buckets(r)[1]]
+        listings = {}
+        with self.metrics.span("refresh_listings"), ThreadPoolExecutor(
+            max_workers=max(1, len(stale))
+        ) as pool:
+            for s3_root, listing in zip(
+                stale, pool.map(self.s3_get_all_buckets, stale)
+            ):
+                self.listing_cache.put(s3_root, [f for f, _ in listing])
+                listings[s3_root] = listing
+        return listings
+
+    @property
+    def object_index(self):
+        if self._object_index is None:
+            ttl = (self.config or {}).get("app", {}).get("listing_cache_ttl", 300)
+            self._object_index = ObjectIndex(self.app_dir / "objects.json", ttl=ttl)
+        return self._object_index
+
+    def s3_index_objects(self, input_prefix, force=False):
+        """
+        Keys under `input_prefix` of the input bucket, relative to it and sorted. The
+        folder is listed again only when its index is stale, or with `force`.
+        """
+        s3_input_root = self.config["app"]["s3_input_root"]
+        keys, fresh = self.object_index.get(s3_input_root, input_prefix)
+        if fresh and not force:
+            return keys
+        with self.metrics.span("index_objects"):
+            _, objects = self.s3_list(s3_input_root, prefix=input_prefix)
+        self.object_index.put(
+            s3_input_root,
+            input_prefix,
+            [o["Key"][len(input_prefix) :] for o in objects],
+        )
+        return self.object_index.get(s3_input_root, input_prefix)[0]
+
+    def s3_missing_shapefile_files(self, input_prefix, shapefile):
+        """
+        Files of `shapefile` (the .shp and its .shx, .dbf and .prj) missing from
+        `input_prefix`. Checked against the object index, files it does not know of
+        are looked up on S3 in case they were uploaded since it was built.
+        """
+        from botocore.exceptions import ClientError
+
+        s3_input_root = self.config["app"]["s3_input_root"]
+        keys, _ = self.object_index.get(s3_input_root, input_prefix)
+        missing = missing_sidecars(keys, shapefile)
+        if not missing:
+            return []
+        s3_cl = self.clients.client("s3", "us-west-2")
+        found = []
+        for name in missing:
+            try:
+                s3_cl.head_object(Bucket=s3_input_root, Key=input_prefix + name)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                    continue
+                raise
+            found.append(input_prefix + name)
+        self.object_index.add(s3_input_root, found)
+        return [name for name in missing if input_prefix + name not in found]
+
+    def upload_engine(self):
+        """
+        Upload engine configured from the optional `[upload]` section of the config.
+        """
+        upload_config = (self.config or {}).get("upload", {})
+        max_concurrency = upload_config.get("max_concurrency", 8)
+        return UploadEngine(
+            # parts and small files are sent by two separate pools
+            self.clients.client(
+                "s3", "us-west-2", max_pool_connections=max_concurrency * 2
+            ),
+            part_size=int(upload_config.get("part_size_mb", 16) * MB),
+            max_concurrency=max_concurrency,
+            state_dir=self.app_dir / "uploads",
+        )
+
+    @property
+    def sync_index(self):
+        if self._sync_index is None:
+            self._sync_index = SyncIndex(self.app_dir / "sync.db")
+        return self._sync_index
+
+    @property
+    def folder_scanner(self):
+        if self._folder_scanner is None:
+            self._folder_scanner = FolderScanner()
+        return self._folder_scanner
+
+    def upload_preflight(self, source, destination, totals):
+        """
+        What syncing the local folder `source` to `destination` ("s3://bucket/prefix")
+        is expected to send, from its scanned `totals` (see `FolderScanner.scan`), the
+        sync index and the throughput of recent uploads. S3 is not asked, so files
+        changed there since the last sync are not accounted for.
+        """
+        bucket, prefix = parse_s3_destination(destination)
+        unchanged_files, unchanged_bytes = likely_unchanged(
+            self.sync_index, source, f"{bucket}/{prefix}"
+        )
+        send_bytes = max(0, totals["bytes"] - unchanged_bytes)
+        throughput = self.sync_index.upload_throughput()
+        return {
+            "files": totals["files"],
+            "bytes": totals["bytes"],
+            "unchanged_files": unchanged_files,
+            "unchanged_bytes": unchanged_bytes,
+            "send_files": max(0, totals["files"] - unchanged_files),
+            "send_bytes": send_bytes,
+            "throughput": throughput,
+            "eta": send_bytes / throughput if throughput else None,
+        }
+
+    def s3_sync_to_bucket(
+        self, source, destination, progress=None, logger=None, delete=False
+    ):
+        """
+        Sync the local folder `source` to `destination`, given as "s3://bucket/prefix".
+        Only new and changed files are uploaded, objects that no longer exist locally are
+        removed when `delete` is set. Pass `logger` when calling from a thread other than
+        the app's.
+        """
+        logger = logger or self.logger
+        bucket, prefix = parse_s3_destination(destination)
+        if progress is None:
+            progress = TransferProgress()
+        engine = self.upload_engine()
+        hash_workers = (self.config or {}).get("upload", {}).get("hash_workers", 8)
+
+        delta = compute_sync_delta(
+            self.sync_index,
+            engine.s3_client,
+            source,
+            bucket,
+            prefix,
+            engine.part_size,
+            engine.multipart_threshold,
+            hash_workers=hash_workers,
+        )
+        logger.write(
+            f"{log_with_timestamp()} syncing {source} to [bold green]s3://{bucket}/{prefix}[/bold green]: "
+            f"{len(delta['new'])} new, {len(delta['changed'])} changed, "
+            f"{len(delta['unchanged'])} unchanged, {len(delta['deleted'])} only on S3"
+        )
+
+        to_upload = [
+            (delta["local"][relative_path][0], relative_path)
+            for relative_path in delta["new"] + delta["changed"]
+        ]
+        results = []
+        if to_upload:
+            results = engine.upload_directory(
+                source, bucket, prefix, files=to_upload, progress=progress
+            )
+        for relative_path, error in results:
+            if error:
+                logger.write(
+                    f"[bold red]failed to upload {relative_path}: {error}[/bold red]"
+                )
+
+        if delete and delta["deleted"]:
+            for i in range(0, len(delta["deleted"]), 1000):
+                engine.s3_client.delete_objects(
+                    Bucket=bucket,
+                    Delete={
+                        "Objects": [
+                            {"Key": prefix + relative_path}
+                            for relative_path in delta["deleted"][i : i + 1000]
+                        ]
+                    },
+                )
+            logger.write(
+                f"{log_with_timestamp()} removed {len(delta['deleted'])} objects no longer in {source}"
+            )
+
+        # record the etags S3 gave the uploaded files so the next sync can skip them
+        entries = delta["entries"]
+        uploaded = [relative_path for relative_path, error in results if not error]
+        if uploaded:
+            self.object_index.add(bucket, [prefix + p for p in uploaded])
+            remote = list_remote_files(engine.s3_client, bucket, prefix)
+            for relative_path in uploaded:
+                entries[relative_path]["remote_etag"] = remote.get(
+                    relative_path, (None,)
+                )[0]
+        for relative_path, error in results:
+            if error:
+                entries.pop(relative_path, None)
+        self.sync_index.update(delta["destination"], entries)
+        self.sync_index.remove(delta["destination"], delta["stale"])
+
+        stats = progress.snapshot()
+        if stats["done_bytes"] and stats["elapsed"]:
+            self.sync_index.record_upload(stats["done_bytes"], stats["elapsed"])
+        logger.write(
+            f"{log_with_timestamp()} uploaded {stats['done_files']}/{stats['total_files']} files "
+            f"({stats['done_bytes'] / MB:.1f} MB) in {stats['elapsed']:.1f}s at {stats['throughput'] / MB:.1f} MB/s"
+        )
+        self.metrics.observe("sync_upload", stats["elapsed"])
+        return results
+
+    def __repr__(self):
+        return "<BidRunner Input>"
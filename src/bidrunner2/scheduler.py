@@ -0,0 +1,300 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# error codes AWS uses when RunTask calls come in faster than the account allows
+THROTTLING_CODES = {
+    "ThrottlingException",
+    "Throttling",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "LimitExceededException",
+}
+
+# failure reasons returned by RunTask when Fargate has no room for the task right now
+CAPACITY_REASONS = (
+    "Capacity is unavailable",
+    "RESOURCE:",
+    "reached the limit on the number of tasks",
+)
+
+# priority of bids marked urgent, queued bids run highest priority first
+URGENT_PRIORITY = 10
+
+
+class TaskNotStartedError(Exception):
+    """
+    RunTask answered without starting a task, `reasons` are the failure reasons.
+    """
+
+    def __init__(self, reasons):
+        super().__init__(f"no task was started, failures: {reasons}")
+        self.reasons = reasons
+
+
+def is_capacity_error(error):
+    """
+    Whether RunTask refused a task because there was no room for it right now.
+    """
+    return isinstance(error, TaskNotStartedError) and any(
+        capacity in (reason or "")
+        for reason in error.reasons
+        for capacity in CAPACITY_REASONS
+    )
+
+
+def is_retryable(error):
+    """
+    Whether a failed submission is worth retrying: throttling, or no capacity.
+    """
+    if isinstance(error, TaskNotStartedError):
+        return is_capacity_error(error)
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code") in THROTTLING_CODES
+    return False
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average with bursts of up to `burst` calls. A
+    rate of 0 does not limit calls at all.
+    """
+
+    def __init__(self, rate, burst):
+        if rate < 0 or burst < 1:
+            raise ValueError(
+                f"expected a rate of 0 or more and a burst of at least 1, got {rate} and {burst}"
+            )
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available.
+        """
+        time.sleep(self.reserve())
+
+    def reserve(self):
+        """
+        Take a token without waiting for it, returns how many seconds to wait before
+        making the call it allows. Lets async callers wait without blocking the loop.
+        """
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            # tokens go negative while calls are waiting, so they are served in order
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+
+class SubmissionScheduler:
+    """
+    Local queue of bids waiting to be submitted.
+
+    A background thread hands queued bids to `workers` submitting threads, highest
+    `priority` first and in order of arrival otherwise, while fewer than
+    `max_running` tracked tasks (and submissions in flight) have not stopped.
+    Throttled submissions and those refused for lack of capacity are retried
+    up to `max_retries` times with exponential backoff and full jitter, other errors
+    fail the bid straight away. Call `wake` when tasks stop so waiting bids are
+    admitted without waiting for the next check.
+
+    `on_event(event, job)` is called with "queued", "submitted", "retry" and "failed".
+    """
+
+    def __init__(
+        self,
+        runner,
+        max_running=50,
+        on_event=None,
+        max_retries=8,
+        base_delay=1,
+        max_delay=60,
+        check_interval=5,
+        workers=1,
+    ):
+        self.runner = runner
+        self.max_running = max_running
+        self.workers = max(1, workers)
+        self.on_event = on_event
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.check_interval = check_interval
+        self.queue = []
+        self.delayed = []
+        self.lock = threading.Lock()
+        self._seq = itertools.count()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+        # submissions handed to the pool that have not returned yet
+        self._in_flight = 0
+
+    def submit(self, args, priority=0, cpu=None, memory=None):
+        """
+        Queue a bid (container args and size as for `BidRunner.submit_task`), returns
+        its job.
+        """
+        job = {
+            "id": next(self._seq),
+            "args": list(args),
+            "cpu": cpu,
+            "memory": memory,
+            "bid_name": args[0],
+            "priority": priority,
+            "state": "queued",
+            "attempts": 0,
+            "task_arn": None,
+            "error": None,
+            "retry_at": None,
+            "done": threading.Event(),
+        }
+        with self.lock:
+            heapq.heappush(self.queue, (-priority, job["id"], job))
+        self._emit("queued", job)
+        self.start()
+        self._wake.set()
+        return job
+
+    def pending(self):
+        """
+        Jobs not submitted yet, in the order they will be tried.
+        """
+        with self.lock:
+            return [job for _, _, job in sorted(self.queue)] + [
+                job for _, _, job in sorted(self.delayed)
+            ]
+
+    def running_count(self):
+        return len(self.runner.tracker.active_tasks())
+
+    def backoff(self, attempts):
+        cap = min(self.max_delay, self.base_delay * 2**attempts)
+        return random.uniform(0, cap)
+
+    def wake(self):
+        self._wake.set()
+
+    def wait(self, jobs, timeout=None):
+        """
+        Block until every job was submitted or failed, returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        for job in jobs:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if not job["done"].wait(remaining):
+                return False
+        return True
+
+    def _emit(self, event, job):
+        if self.on_event:
+            self.on_event(event, job)
+
+    def _next_job(self):
+        """
+        Pop the next job to submit if there is room, and the seconds to wait otherwise.
+        """
+        now = time.monotonic()
+        with self.lock:
+            while self.delayed and self.delayed[0][0] <= now:
+                _, _, job = heapq.heappop(self.delayed)
+                heapq.heappush(self.queue, (-job["priority"], job["id"], job))
+            wait = self.check_interval
+            if self.delayed:
+                wait = min(wait, self.delayed[0][0] - now)
+            if not self.queue:
+                return None, (wait if self.delayed else None)
+        with self.lock:
+            in_flight = self._in_flight
+        # `_submit_in_pool` wakes the loop as soon as a worker is free again
+        if in_flight >= self.workers:
+            return None, wait
+        if self.running_count() + in_flight >= self.max_running:
+            return None, wait
+        with self.lock:
+            _, _, job = heapq.heappop(self.queue)
+            self._in_flight += 1
+        return job, 0
+
+    def _submit_in_pool(self, job):
+        try:
+            self._submit(job)
+        finally:
+            with self.lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    def _submit(self, job):
+        job["attempts"] += 1
+        try:
+            job["task_arn"] = self.runner.submit_task(
+                job["args"], cpu=job["cpu"], memory=job["memory"]
+            )
+        except Exception as e:
+            job["error"] = str(e)
+            if is_retryable(e) and job["attempts"] <= self.max_retries:
+                delay = self.backoff(job["attempts"])
+                job["state"] = "retrying"
+                job["retry_at"] = time.time() + delay
+                with self.lock:
+                    heapq.heappush(
+                        self.delayed, (time.monotonic() + delay, job["id"], job)
+                    )
+                self._emit("retry", job)
+                return
+            job["state"] = "failed"
+            self._emit("failed", job)
+            job["done"].set()
+            return
+        job["state"] = "submitted"
+        job["error"] = None
+        self._emit("submitted", job)
+        job["done"].set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bidrunner2-submit"
+            )
+        self._thread = threading.Thread(
+            target=self._run, name="bidrunner2-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                job, wait = self._next_job()
+            except Exception:
+                job, wait = None, self.check_interval
+            if job is not None:
+                self._pool.submit(self._submit_in_pool, job)
+                continue
+            # None: nothing queued, sleep until a bid is added
+            self._wake.wait(wait)
@@ -0,0 +1,40 @@
+import os
+
+# files that make up a shapefile, every one of them is needed to run a bid
+SIDECAR_EXTENSIONS = (".shp", ".shx", ".dbf", ".prj")
+
+
+def shapefile_stem(shapefile):
+    """
+    The shapefile name without its `.shp` extension, which may be left out.
+    """
+    stem, extension = os.path.splitext(shapefile)
+    if extension.lower() == ".shp":
+        return stem
+    return shapefile
+
+
+def sidecar_names(shapefile):
+    """
+    Names of the files a shapefile needs, with extensions in the case the `.shp`
+    was typed in.
+    """
+    stem = shapefile_stem(shapefile)
+    upper = shapefile.endswith(".SHP")
+    return [
+        stem + (extension.upper() if upper else extension)
+        for extension in SIDECAR_EXTENSIONS
+    ]
+
+
+def missing_sidecars(keys, shapefile):
+    """
+    The sidecar files of `shapefile` not among `keys`, either extension case counts.
+    """
+    keys = set(keys)
+    stem = shapefile_stem(shapefile)
+    return [
+        name
+        for name, extension in zip(sidecar_names(shapefile), SIDECAR_EXTENSIONS)
+        if stem + extension not in keys and stem + extension.upper() not in keys
+    ]
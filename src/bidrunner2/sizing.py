@@ -0,0 +1,181 @@
+import math
+
+from bidrunner2.shapefile import SIDECAR_EXTENSIONS, shapefile_stem
+
+# size of a task when no cpu/memory override is given, as in `resources/ecs-def.json`
+DEFAULT_CPU = 1024
+DEFAULT_MEMORY = 3072
+
+# memory (MiB) Fargate allows with each cpu size (cpu units, 1024 = 1 vCPU)
+FARGATE_SIZES = {
+    256: (512, 1024, 2048),
+    512: tuple(range(1024, 4096 + 1, 1024)),
+    1024: tuple(range(2048, 8192 + 1, 1024)),
+    2048: tuple(range(4096, 16384 + 1, 1024)),
+    4096: tuple(range(8192, 30720 + 1, 1024)),
+    8192: tuple(range(16384, 61440 + 1, 4096)),
+    16384: tuple(range(32768, 122880 + 1, 8192)),
+}
+
+# exit code of a container killed for using more memory than the task has
+OOM_EXIT_CODE = 137
+
+
+def valid_size(cpu, memory):
+    return memory in FARGATE_SIZES.get(cpu, ())
+
+
+def fit_size(cpu, memory):
+    """
+    Smallest Fargate size with at least `cpu` units and `memory` MiB, the largest
+    size if none is big enough.
+    """
+    for size_cpu, memories in FARGATE_SIZES.items():
+        if size_cpu < cpu:
+            continue
+        for size_memory in memories:
+            if size_memory >= memory:
+                return size_cpu, size_memory
+    return max(FARGATE_SIZES), FARGATE_SIZES[max(FARGATE_SIZES)][-1]
+
+
+def task_size(cpu=None, memory=None):
+    """
+    The (cpu, memory) a task runs at when either is overridden, (None, None) to keep
+    the task definition's. A missing half is taken from the task definition and the
+    pair fitted to the smallest Fargate size that holds both, a full pair must be
+    one of Fargate's sizes.
+    """
+    if not cpu and not memory:
+        return None, None
+    if cpu and memory:
+        cpu, memory = int(cpu), int(memory)
+        if not valid_size(cpu, memory):
+            raise ValueError(f"Fargate has no task size of {cpu} cpu / {memory} MiB")
+        return cpu, memory
+    return fit_size(int(cpu or DEFAULT_CPU), int(memory or DEFAULT_MEMORY))
+
+
+def shx_feature_count(shx_size):
+    """
+    Features in a shapefile from the size of its .shx: a 100 byte header then 8 bytes
+    per feature.
+    """
+    return max(0, (shx_size - 100) // 8)
+
+
+def input_profile(sizes, shapefile):
+    """
+    What a bid's task is sized from: the total bytes of its input folder and the
+    features in its shapefile. `sizes` maps the folder's keys, relative to it, to
+    their size.
+    """
+    shx_size = None
+    stem = shapefile_stem(shapefile)
+    for extension in (SIDECAR_EXTENSIONS[1], SIDECAR_EXTENSIONS[1].upper()):
+        if stem + extension in sizes:
+            shx_size = sizes[stem + extension]
+            break
+    return {
+        "input_bytes": sum(sizes.values()),
+        "feature_count": None if shx_size is None else shx_feature_count(shx_size),
+    }
+
+
+def ran_out_of_memory(run):
+    return run["exit_code"] == OOM_EXIT_CODE or "OutOfMemory" in (
+        run["stopped_reason"] or ""
+    )
+
+
+def run_seconds(run):
+    if run["started_at"] is None or run["stopped_at"] is None:
+        return None
+    return run["stopped_at"] - run["started_at"]
+
+
+def _distance(run, profile):
+    # compared on a log scale, an input twice as big is as far whatever its size
+    terms = [
+        (math.log1p(run[k]) - math.log1p(profile[k])) ** 2
+        for k in ("input_bytes", "feature_count")
+        if run.get(k) is not None and profile.get(k) is not None
+    ]
+    return math.sqrt(sum(terms) / len(terms)) if terms else None
+
+
+def _at_least_as_large(run, profile):
+    return all(
+        run[k] >= profile[k]
+        for k in ("input_bytes", "feature_count")
+        if run.get(k) is not None and profile.get(k) is not None
+    )
+
+
+def recommend_size(
+    runs, input_bytes=None, feature_count=None, neighbours=10, target_seconds=3600
+):
+    """
+    Suggest the cpu and memory of a task for inputs of `input_bytes` with
+    `feature_count` features, from the finished `runs` (as listed by
+    `RunHistory.finished_runs`) with the most similar inputs.
+
+    Memory is the smallest that worked for a similar input at least as large, and
+    twice what ran out of memory for a similar input no larger. Cpu is doubled when
+    similar runs took longer than `target_seconds` at the size they had.
+    """
+    profile = {"input_bytes": input_bytes, "feature_count": feature_count}
+    scored = []
+    for run in runs:
+        distance = _distance(run, profile)
+        if distance is not None:
+            scored.append((distance, run))
+    scored.sort(key=lambda pair: pair[0])
+    similar = [run for _, run in scored[:neighbours]]
+    if not similar:
+        return {
+            "cpu": DEFAULT_CPU,
+            "memory": DEFAULT_MEMORY,
+            "runs": 0,
+            "reason": "no finished runs with similar inputs yet, using the task definition size",
+        }
+
+    def size_of(run):
+        return run["cpu"] or DEFAULT_CPU, run["memory"] or DEFAULT_MEMORY
+
+    succeeded = [run for run in similar if run["exit_code"] == 0]
+    out_of_memory = [run for run in similar if ran_out_of_memory(run)]
+    reasons = []
+
+    larger = [size_of(run) for run in succeeded if _at_least_as_large(run, profile)]
+    if larger:
+        cpu, memory = min(larger, key=lambda size: size[1])
+        reasons.append(f"{len(larger)} similar or larger inputs succeeded")
+    elif succeeded:
+        cpu, memory = max((size_of(run) for run in succeeded), key=lambda s: s[1])
+        reasons.append(f"{len(succeeded)} smaller inputs succeeded")
+    else:
+        cpu, memory = DEFAULT_CPU, DEFAULT_MEMORY
+
+    for run in out_of_memory:
+        if _at_least_as_large(profile, run):
+            memory = max(memory, size_of(run)[1] * 2)
+    if out_of_memory:
+        reasons.append(f"{len(out_of_memory)} similar runs ran out of memory")
+
+    durations = sorted(
+        seconds for seconds in map(run_seconds, succeeded) if seconds is not None
+    )
+    if durations and durations[len(durations) // 2] > target_seconds:
+        cpu *= 2
+        reasons.append(
+            f"similar runs took {durations[len(durations) // 2] / 60:.0f} min"
+        )
+
+    cpu, memory = fit_size(cpu, memory)
+    return {
+        "cpu": cpu,
+        "memory": memory,
+        "runs": len(similar),
+        "reason": ", ".join(reasons) or "similar runs did not finish successfully",
+    }
@@ -0,0 +1,86 @@
+import threading
+
+
+class SqsConsumer:
+    """
+    Long-polls the bid queue from a background thread so the app never waits on SQS.
+
+    Each cycle waits up to `wait_time` seconds for the first batch, then keeps draining
+    without waiting (up to `max_batches` batches) while the queue still has messages.
+    Messages for which `accept` returns True are handed to `on_message` in the order
+    they were sent and then acknowledged in batches.
+
+    With `demux=True` every message is kept in the runner's message store and removed
+    from the queue, and `on_message` only sees messages that were not stored before.
+    """
+
+    def __init__(
+        self,
+        runner,
+        queue_url,
+        on_message,
+        accept=None,
+        on_error=None,
+        demux=False,
+        max_batches=5,
+        wait_time=20,
+        error_backoff=5,
+    ):
+        self.runner = runner
+        self.queue_url = queue_url
+        self.on_message = on_message
+        self.accept = accept or (lambda message: True)
+        self.on_error = on_error
+        self.demux = demux
+        self.max_batches = max_batches
+        self.wait_time = wait_time
+        self.error_backoff = error_backoff
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        # daemon so that a long poll in flight does not hold up closing the app
+        self._thread = threading.Thread(
+            target=self._run, name="bidrunner2-sqs", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll_once(self):
+        """
+        Run a single receive cycle, returns the number of messages handled.
+        """
+        handled = 0
+        for batch_number in range(self.max_batches):
+            wait_time = self.wait_time if batch_number == 0 else 0
+            messages = self.runner.sqs_receive_messages(self.queue_url, wait_time)
+            if self.demux:
+                accepted = self.runner.sqs_store_messages(self.queue_url, messages)
+            else:
+                accepted = [m for m in messages if self.accept(m)]
+                if accepted:
+                    self.runner.sqs_delete_messages(self.queue_url, accepted)
+            for message in accepted:
+                self.on_message(message)
+            handled += len(accepted)
+            if len(messages) < 10 or self._stop.is_set():
+                break
+        return handled
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+                self._stop.wait(self.error_backoff)
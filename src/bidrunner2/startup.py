@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# set in the profiled process, see `profile_startup`
+PROFILE_ENV = "BIDRUNNER2_STARTUP_PROFILE"
+
+# packages reported on their own in the import breakdown
+TRACKED_PACKAGES = [
+    "textual",
+    "rich",
+    "boto3",
+    "botocore",
+    "s3transfer",
+    "toml",
+    "dotenv",
+]
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+_marks = []
+
+
+def mark(name):
+    """
+    Record a startup phase when the app runs under `--profile-startup`, otherwise a no-op.
+    """
+    if os.environ.get(PROFILE_ENV):
+        _marks.append((name, time.time()))
+
+
+def profiling():
+    return bool(os.environ.get(PROFILE_ENV))
+
+
+def write_marks():
+    path = os.environ.get(PROFILE_ENV)
+    if path:
+        with open(path, "w") as f:
+            json.dump(_marks, f)
+
+
+def prewarm_aws_imports():
+    """
+    Import the AWS SDK ahead of its first use, meant to run on a background thread once
+    the first frame is on screen.
+    """
+    import boto3  # noqa: F401
+    import s3transfer.manager  # noqa: F401
+
+
+def parse_importtime(stderr):
+    """
+    Import time in ms per package from `python -X importtime` output. Each tracked
+    package gets the cumulative time of the imports that first pulled it in, bidrunner2
+    gets the time spent in its own modules.
+    """
+    # importtime prints children before their parent, rebuild the tree from the indents
+    pending = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        children = []
+        while pending and pending[-1][0] > depth:
+            children.insert(0, pending.pop())
+        self_us, cumulative_us = int(match.group(1)), int(match.group(2))
+        pending.append((depth, match.group(4), self_us, cumulative_us, children))
+
+    totals = {}
+
+    def visit(node, owner):
+        _, name, self_us, cumulative_us, children = node
+        package = name.split(".")[0]
+        if package == "bidrunner2":
+            totals[package] = totals.get(package, 0) + self_us / 1000
+        elif package in TRACKED_PACKAGES and package != owner:
+            totals[package] = totals.get(package, 0) + cumulative_us / 1000
+            owner = package
+        for child in children:
+            visit(child, owner)
+
+    for node in pending:
+        visit(node, None)
+    return totals
+
+
+def profile_startup():
+    """
+    Start the app in a child process under `-X importtime`, let it exit after its first
+    frame and report where the time went. The report is printed to stderr and the
+    numbers to stdout as one JSON object.
+    """
+    fd, marks_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    env = dict(os.environ, **{PROFILE_ENV: marks_path})
+    code = "import sys; from bidrunner2.main import main; sys.exit(main())"
+
+    started = time.time()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        with open(marks_path, "r") as f:
+            marks = json.load(f)
+    except (OSError, ValueError):
+        marks = []
+    finally:
+        os.remove(marks_path)
+
+    if proc.returncode != 0 or not marks:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise Exception("the app did not start, unable to profile startup")
+
+    imports = parse_importtime(proc.stderr)
+    phases = {}
+    previous = started
+    for name, at in marks:
+        phases[name] = (at - previous) * 1000
+        previous = at
+    result = {
+        "time_to_first_frame_ms": round(
+            (dict(marks)["first_frame"] - started) * 1000, 1
+        ),
+        "imports_ms": {
+            k: round(v, 1) for k, v in sorted(imports.items(), key=lambda kv: -kv[1])
+        },
+        "phases_ms": {k: round(v, 1) for k, v in phases.items()},
+    }
+
+    sys.stderr.write("bidrunner2 startup profile\n\nimports (cumulative)\n")
+    for name, ms in result["imports_ms"].items():
+        sys.stderr.write(f"  {name:<24}{ms:>9.1f} ms\n")
+    sys.stderr.write("\nphases\n")
+    for name, ms in result["phases_ms"].items():
+        sys.stderr.write(f"  {name:<24}{ms:>9.1f} ms\n")
+    sys.stderr.write(
+        f"\ntime to first frame      {result['time_to_first_frame_ms']:>9.1f} ms\n"
+    )
+    sys.stdout.write(json.dumps(result) + "\n")
+    return result
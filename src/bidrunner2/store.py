@@ -0,0 +1,83 @@
+import sqlite3
+import threading
+import time
+
+
+class MessageStore:
+    """
+    Local SQLite copy of every queue message, indexed by bid name and the time the
+    message was sent so each bid's progress can be read back without touching SQS.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    id TEXT PRIMARY KEY,
+                    bid_name TEXT NOT NULL,
+                    sent_timestamp INTEGER NOT NULL,
+                    body TEXT,
+                    received_at REAL NOT NULL
+                )
+                """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS messages_bid_sent ON messages (bid_name, sent_timestamp, id)"
+            )
+
+    def add_messages(self, messages):
+        """
+        Store processed queue messages, returns only the ones that were not already
+        stored (SQS may deliver the same message more than once).
+        """
+        added = []
+        received_at = time.time()
+        with self.lock, self.conn:
+            for m in messages:
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?)",
+                    (
+                        m.get("id"),
+                        m.get("bid_name") or "",
+                        m.get("sent_timestamp", 0),
+                        m.get("body"),
+                        received_at,
+                    ),
+                )
+                if cur.rowcount:
+                    added.append(m)
+        return added
+
+    def messages_for(self, bid_name, after=None, limit=None):
+        """
+        Messages for a bid ordered by the time they were sent. `after` is the
+        (sent_timestamp, id) of the last message already seen.
+        """
+        query = "SELECT * FROM messages WHERE bid_name = ?"
+        params = [bid_name]
+        if after is not None:
+            query += " AND (sent_timestamp, id) > (?, ?)"
+            params.extend(after)
+        query += " ORDER BY sent_timestamp, id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(query, params)]
+
+    def bid_names(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT bid_name, COUNT(*) AS messages, MAX(sent_timestamp) AS last_sent FROM messages GROUP BY bid_name ORDER BY last_sent DESC"
+            )
+            return [dict(row) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,345 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bidrunner2.transfer import MB
+
+HASH_READ_SIZE = 1 * MB
+
+
+def s3_etag(local_path, part_size, multipart_threshold):
+    """
+    The ETag S3 reports for a file uploaded by `UploadEngine` with the same settings:
+    the md5 of the file, or for multipart uploads the md5 of the part md5s and the
+    number of parts.
+    """
+    size = os.path.getsize(local_path)
+    with open(local_path, "rb") as f:
+        if size < multipart_threshold:
+            digest = hashlib.md5()
+            for chunk in iter(lambda: f.read(HASH_READ_SIZE), b""):
+                digest.update(chunk)
+            return digest.hexdigest()
+
+        part_digests = []
+        while True:
+            part = hashlib.md5()
+            read = 0
+            while read < part_size:
+                chunk = f.read(min(HASH_READ_SIZE, part_size - read))
+                if not chunk:
+                    break
+                part.update(chunk)
+                read += len(chunk)
+            if read == 0:
+                break
+            part_digests.append(part.digest())
+            if read < part_size:
+                break
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+def scan_local_files(source):
+    """
+    {relative path: (absolute path, size, mtime_ns)} for every file under `source`.
+    """
+    files = {}
+    stack = [source]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    relative_path = os.path.relpath(entry.path, source).replace(
+                        "\\", "/"
+                    )
+                    files[relative_path] = (entry.path, stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+class FolderScanner:
+    """
+    Counts the files and bytes under a folder, keeping a summary of the files directly
+    in every directory it lists. Scanning again (the same folder, or one above or
+    below it) only lists the directories whose mtime changed since, so a large tree
+    that was scanned once is summed again from a stat per directory.
+
+    A directory's mtime changes when files are added, removed or renamed in it, not
+    when a file is rewritten in place, pass `force` to list everything again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # path: {"mtime_ns", "files", "bytes", "subdirs"}
+        self.directories = {}
+
+    def _list(self, directory, mtime_ns):
+        summary = {"mtime_ns": mtime_ns, "files": 0, "bytes": 0, "subdirs": []}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            summary["subdirs"].append(entry.path)
+                        elif entry.is_file():
+                            summary["files"] += 1
+                            summary["bytes"] += entry.stat().st_size
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        with self.lock:
+            self.directories[directory] = summary
+        return summary
+
+    def scan(
+        self,
+        root,
+        on_progress=None,
+        cancelled=None,
+        force=False,
+        progress_interval=0.25,
+    ):
+        """
+        Totals of the folder `root`: `files`, `bytes`, `directories`, how many of them
+        had to be `listed` and the `elapsed` seconds. `on_progress` is called with the
+        totals so far every `progress_interval` seconds, and the scan gives up,
+        returning None, once `cancelled()` is true.
+        """
+        start = last_progress = time.monotonic()
+        totals = {"files": 0, "bytes": 0, "directories": 0, "listed": 0}
+        stack = [str(root)]
+        while stack:
+            if cancelled is not None and cancelled():
+                return None
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            with self.lock:
+                summary = self.directories.get(directory)
+            if force or summary is None or summary["mtime_ns"] != mtime_ns:
+                summary = self._list(directory, mtime_ns)
+                totals["listed"] += 1
+            totals["files"] += summary["files"]
+            totals["bytes"] += summary["bytes"]
+            totals["directories"] += 1
+            stack.extend(summary["subdirs"])
+            now = time.monotonic()
+            if on_progress is not None and now - last_progress >= progress_interval:
+                last_progress = now
+                on_progress(dict(totals, elapsed=now - start))
+        totals["elapsed"] = time.monotonic() - start
+        return totals
+
+
+class SyncIndex:
+    """
+    Persistent record of what was last seen for each file synced to a destination: local
+    size, mtime and content hash, and the ETag S3 reported for it.
+
+    Files whose size and mtime have not changed since the last sync reuse the stored
+    hash, so an unchanged folder is compared against S3 without reading any file.
+    """
+
+    def __init__(self, db_path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_files (
+                    destination TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    local_etag TEXT,
+                    remote_etag TEXT,
+                    PRIMARY KEY (destination, path)
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS uploads (
+                    finished_at REAL NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    seconds REAL NOT NULL
+                )
+                """
+            )
+
+    def entries(self, destination):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, size, mtime_ns, local_etag, remote_etag FROM sync_files WHERE destination = ?",
+                (destination,),
+            )
+            return {
+                row[0]: {
+                    "size": row[1],
+                    "mtime_ns": row[2],
+                    "local_etag": row[3],
+                    "remote_etag": row[4],
+                }
+                for row in rows
+            }
+
+    def update(self, destination, entries):
+        """
+        Store {relative path: entry} for a destination, entries as returned by `entries`.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO sync_files VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        destination,
+                        path,
+                        e["size"],
+                        e["mtime_ns"],
+                        e["local_etag"],
+                        e["remote_etag"],
+                    )
+                    for path, e in entries.items()
+                ],
+            )
+
+    def remove(self, destination, paths):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM sync_files WHERE destination = ? AND path = ?",
+                [(destination, path) for path in paths],
+            )
+
+    def record_upload(self, sent_bytes, seconds):
+        """
+        Keep how long an upload took, to estimate how long the next ones will.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO uploads VALUES (?, ?, ?)",
+                (time.time(), sent_bytes, seconds),
+            )
+
+    def upload_throughput(self, recent=10):
+        """
+        Bytes per second over the `recent` latest uploads, None before the first one.
+        """
+        with self.lock:
+            sent_bytes, seconds = self.conn.execute(
+                "SELECT SUM(bytes), SUM(seconds) FROM (SELECT bytes, seconds FROM uploads ORDER BY finished_at DESC LIMIT ?)",
+                (recent,),
+            ).fetchone()
+        if not sent_bytes or not seconds:
+            return None
+        return sent_bytes / seconds
+
+
+def likely_unchanged(index, source, destination):
+    """
+    (files, bytes) of the local folder `source` that were synced to `destination`
+    and have the same size and mtime as then, without asking S3.
+    """
+    files = 0
+    unchanged_bytes = 0
+    for relative_path, entry in index.entries(destination).items():
+        if entry["remote_etag"] is None:
+            continue
+        try:
+            stat = os.stat(os.path.join(source, relative_path))
+        except OSError:
+            continue
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            files += 1
+            unchanged_bytes += stat.st_size
+    return files, unchanged_bytes
+
+
+def list_remote_files(s3_client, bucket, prefix):
+    """
+    {relative path: (etag, size)} for every object under `prefix`, one listing.
+    """
+    remote = {}
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            remote[obj["Key"][len(prefix) :]] = (obj["ETag"].strip('"'), obj["Size"])
+    return remote
+
+
+def compute_sync_delta(
+    index,
+    s3_client,
+    source,
+    bucket,
+    prefix,
+    part_size,
+    multipart_threshold,
+    hash_workers=8,
+):
+    """
+    Compare a local folder with what is under s3://bucket/prefix. Returns a dict with
+    the relative paths that are `new`, `changed`, `unchanged` and `deleted` (only on
+    S3), plus the local files and index entries needed to record the result.
+    """
+    destination = f"{bucket}/{prefix}"
+    local = scan_local_files(source)
+    cached = index.entries(destination)
+    remote = list_remote_files(s3_client, bucket, prefix)
+
+    entries = {}
+    to_hash = []
+    for relative_path, (local_path, size, mtime_ns) in local.items():
+        entry = cached.get(relative_path)
+        if entry is None or entry["size"] != size or entry["mtime_ns"] != mtime_ns:
+            entry = {
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "local_etag": None,
+                "remote_etag": None,
+            }
+        entries[relative_path] = entry
+        # new files are not hashed, their etag is recorded from S3 once uploaded
+        remote_etag = remote.get(relative_path, (None,))[0]
+        if (
+            remote_etag
+            and entry["local_etag"] is None
+            and entry["remote_etag"] != remote_etag
+        ):
+            to_hash.append(relative_path)
+
+    def hash_file(relative_path):
+        entries[relative_path]["local_etag"] = s3_etag(
+            local[relative_path][0], part_size, multipart_threshold
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, hash_workers)) as pool:
+        list(pool.map(hash_file, to_hash))
+
+    delta = {"new": [], "changed": [], "unchanged": [], "deleted": []}
+    for relative_path, entry in entries.items():
+        if relative_path not in remote:
+            delta["new"].append(relative_path)
+            continue
+        remote_etag = remote[relative_path][0]
+        if remote_etag in (entry["remote_etag"], entry["local_etag"]):
+            entry["remote_etag"] = remote_etag
+            delta["unchanged"].append(relative_path)
+        else:
+            delta["changed"].append(relative_path)
+    delta["deleted"] = sorted(set(remote) - set(local))
+
+    delta["stale"] = [path for path in cached if path not in local]
+    delta["destination"] = destination
+    delta["local"] = local
+    delta["entries"] = entries
+    return delta
@@ -0,0 +1,246 @@
+import threading
+from datetime import datetime, timezone
+
+from bidrunner2.placement import parse_task_arn
+
+# describe_tasks accepts at most this many arns per call
+DESCRIBE_TASKS_LIMIT = 100
+
+STARTING_STATUSES = {"PROVISIONING", "PENDING", "ACTIVATING"}
+
+
+class TaskTracker:
+    """
+    Follows every task launched by the app, across clusters and regions.
+
+    Each refresh describes all tasks that have not stopped with one `describe_tasks`
+    call per cluster for every 100 arns. The background loop polls every
+    `fast_interval` seconds while a task is starting, backs off from `slow_interval`
+    up to `max_interval` while tasks are running and unchanged, and sleeps until a new
+    task is tracked once everything has stopped.
+
+    Changes are saved to `history` (a `RunHistory`) when one is set, and the time from
+    submitting to running and to stopping is recorded by `metrics` (a `Metrics`).
+    """
+
+    def __init__(
+        self,
+        runner,
+        on_update=None,
+        on_error=None,
+        fast_interval=2,
+        slow_interval=15,
+        max_interval=60,
+        history=None,
+        metrics=None,
+    ):
+        self.runner = runner
+        self.on_update = on_update
+        self.on_error = on_error
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.max_interval = max_interval
+        self.history = history
+        self.metrics = metrics
+        self.tasks = {}
+        self.lock = threading.Lock()
+        self._interval = slow_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, cluster, task_arn, bid_name=None):
+        with self.lock:
+            self.tasks.setdefault(
+                task_arn,
+                {
+                    "task_arn": task_arn,
+                    "cluster": cluster,
+                    "bid_name": bid_name,
+                    "last_status": "SUBMITTED",
+                    "stop_code": None,
+                    "stopped_reason": None,
+                    "exit_code": None,
+                    "created_at": datetime.now(timezone.utc),
+                    "started_at": None,
+                    "stopped_at": None,
+                },
+            )
+        self._wake.set()
+
+    def active_tasks(self):
+        with self.lock:
+            return [t for t in self.tasks.values() if t["last_status"] != "STOPPED"]
+
+    def snapshot(self):
+        with self.lock:
+            return [dict(t) for t in self.tasks.values()]
+
+    def latest(self):
+        with self.lock:
+            if not self.tasks:
+                return None
+            return dict(list(self.tasks.values())[-1])
+
+    def refresh(self):
+        """
+        Describe every task that has not stopped yet, returns the arns whose status changed.
+        """
+        responses = [
+            self.runner.ecs_client(region).describe_tasks(cluster=cluster, tasks=arns)
+            for region, cluster, arns in self.describe_batches()
+        ]
+        return self.apply_responses(responses)
+
+    def describe_batches(self):
+        """
+        (region, cluster, arns) of each `describe_tasks` call needed to describe every
+        task that has not stopped yet.
+        """
+        by_cluster = {}
+        for task in self.active_tasks():
+            # tasks run in the region of their placement, which their arn names
+            region, _ = parse_task_arn(task["task_arn"])
+            by_cluster.setdefault((region, task["cluster"]), []).append(
+                task["task_arn"]
+            )
+        return [
+            (region, cluster, arns[i : i + DESCRIBE_TASKS_LIMIT])
+            for (region, cluster), arns in by_cluster.items()
+            for i in range(0, len(arns), DESCRIBE_TASKS_LIMIT)
+        ]
+
+    def apply_responses(self, responses):
+        """
+        Update the tracked tasks from `describe_tasks` responses, returns the arns whose
+        status changed.
+        """
+        changed = []
+        for resp in responses:
+            with self.lock:
+                for described in resp.get("tasks", []):
+                    if self._apply(described):
+                        changed.append(described["taskArn"])
+                for failure in resp.get("failures", []):
+                    # tasks that stopped a long time ago are no longer described
+                    task = self.tasks.get(failure.get("arn"))
+                    if task and failure.get("reason") == "MISSING":
+                        task["last_status"] = "STOPPED"
+                        task["stopped_reason"] = "task no longer exists"
+                        changed.append(failure["arn"])
+        if changed:
+            with self.lock:
+                tasks = [dict(self.tasks[arn]) for arn in changed]
+            if self.history is not None:
+                self.history.update_tasks(tasks)
+            if self.metrics is not None:
+                for task in tasks:
+                    if task["last_status"] in ("RUNNING", "STOPPED"):
+                        self.metrics.end_span("submit_to_running", task["task_arn"])
+                    if task["last_status"] == "STOPPED":
+                        self.metrics.end_span("submit_to_stopped", task["task_arn"])
+        return changed
+
+    def _apply(self, described):
+        task = self.tasks.get(described["taskArn"])
+        if task is None:
+            return False
+        containers = described.get("containers", [])
+        update = {
+            "last_status": described.get("lastStatus", task["last_status"]),
+            "stop_code": described.get("stopCode"),
+            "stopped_reason": described.get("stoppedReason"),
+            "exit_code": containers[0].get("exitCode") if containers else None,
+            "created_at": described.get("createdAt", task["created_at"]),
+            "started_at": described.get("startedAt"),
+            "stopped_at": described.get("stoppedAt"),
+        }
+        changed = any(task.get(k) != v for k, v in update.items())
+        task.update(update)
+        return changed
+
+    def next_interval(self, changed=True):
+        """
+        Seconds until the next refresh, or None when there is nothing left to follow.
+        """
+        statuses = {t["last_status"] for t in self.active_tasks()}
+        if not statuses:
+            return None
+        if statuses & (STARTING_STATUSES | {"SUBMITTED"}):
+            self._interval = self.fast_interval
+        elif changed or self._interval < self.slow_interval:
+            self._interval = self.slow_interval
+        else:
+            self._interval = min(self._interval * 1.5, self.max_interval)
+        return self._interval
+
+    def rows(self):
+        """
+        One row per task for display: bid, task id, cluster, status, stop code, exit code
+        and elapsed time.
+        """
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            tasks = list(self.tasks.values())
+        rows = []
+        for t in tasks:
+            end = t["stopped_at"] or now
+            elapsed = int((end - t["created_at"]).total_seconds())
+            rows.append(
+                (
+                    t["task_arn"],
+                    (
+                        t["bid_name"] or "",
+                        t["task_arn"].split("/")[-1],
+                        t["cluster"],
+                        t["last_status"],
+                        t["stop_code"] or "",
+                        "" if t["exit_code"] is None else str(t["exit_code"]),
+                        f"{elapsed // 3600:d}:{elapsed // 60 % 60:02d}:{elapsed % 60:02d}",
+                    ),
+                )
+            )
+        return rows
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="bidrunner2-tasks", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    @property
+    def woken(self):
+        """
+        Whether a task was tracked since `clear_wake`, loops refresh early then.
+        """
+        return self._wake.is_set()
+
+    def clear_wake(self):
+        self._wake.clear()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.clear_wake()
+            interval = None
+            try:
+                changed = self.refresh() if self.active_tasks() else []
+                if changed and self.on_update:
+                    self.on_update(changed)
+                interval = self.next_interval(changed=bool(changed))
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+                interval = self.slow_interval
+            # a newly tracked task wakes the loop early
+            self._wake.wait(interval)
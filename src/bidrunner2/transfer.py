@@ -0,0 +1,425 @@
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MB = 1024 * 1024
+
+# S3 does not accept multipart parts smaller than 5MB (other than the last one)
+MIN_PART_SIZE = 5 * MB
+
+
+def parse_s3_destination(destination):
+    """
+    Split "s3://bucket/prefix" (or "bucket/prefix") into bucket and prefix.
+    """
+    destination = destination.replace("\\", "/")
+    if destination.startswith("s3://"):
+        destination = destination[len("s3://") :]
+    bucket, _, prefix = destination.partition("/")
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    return bucket, prefix
+
+
+def list_local_files(source):
+    """
+    Every file under `source` as (absolute path, path relative to source using "/").
+    """
+    files = []
+    for root, dirs, names in os.walk(source):
+        for name in names:
+            local_path = os.path.join(root, name)
+            relative_path = os.path.relpath(local_path, source).replace("\\", "/")
+            files.append((local_path, relative_path))
+    return files
+
+
+class TransferProgress:
+    """
+    Thread-safe byte and file counters for a set of transfers.
+    """
+
+    def __init__(self, total_bytes=0, total_files=0):
+        self.lock = threading.Lock()
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.done_bytes = 0
+        self.done_files = 0
+        self.failed_files = 0
+        self.started = time.perf_counter()
+
+    def add_bytes(self, n):
+        with self.lock:
+            self.done_bytes += n
+
+    def file_done(self, failed=False):
+        with self.lock:
+            if failed:
+                self.failed_files += 1
+            else:
+                self.done_files += 1
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = max(time.perf_counter() - self.started, 1e-6)
+            return {
+                "total_bytes": self.total_bytes,
+                "done_bytes": self.done_bytes,
+                "total_files": self.total_files,
+                "done_files": self.done_files,
+                "failed_files": self.failed_files,
+                "elapsed": elapsed,
+                "throughput": self.done_bytes / elapsed,
+            }
+
+
+class _ProgressSubscriber:
+    """
+    s3transfer subscriber (duck typed, so s3transfer is only imported when uploading).
+    """
+
+    def __init__(self, progress):
+        self.progress = progress
+
+    def on_progress(self, future, bytes_transferred, **kwargs):
+        self.progress.add_bytes(bytes_transferred)
+
+
+class UploadEngine:
+    """
+    Uploads folders to S3 with concurrent multipart uploads.
+
+    Files smaller than `multipart_threshold` go through s3transfer's TransferManager.
+    Larger files are uploaded in `part_size` parts, `max_concurrency` at a time, and the
+    parts already sent are recorded under `state_dir` so an interrupted upload picks up
+    where it stopped instead of starting again.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        part_size=16 * MB,
+        max_concurrency=8,
+        multipart_threshold=None,
+        state_dir=None,
+    ):
+        self.s3_client = s3_client
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_concurrency = max_concurrency
+        self.multipart_threshold = multipart_threshold or self.part_size
+        self.state_dir = pathlib.Path(state_dir) if state_dir else None
+        self.state_lock = threading.Lock()
+
+    def upload_directory(self, source, bucket, prefix="", files=None, progress=None):
+        """
+        Upload every file under `source` (or only `files`, a list from `list_local_files`)
+        to `bucket` under `prefix`. Returns a list of (relative path, error or None).
+        """
+        from s3transfer.manager import TransferConfig, TransferManager
+
+        if files is None:
+            files = list_local_files(source)
+        sizes = {local_path: os.path.getsize(local_path) for local_path, _ in files}
+        if progress is None:
+            progress = TransferProgress()
+        progress.total_bytes = sum(sizes.values())
+        progress.total_files = len(files)
+
+        small = [f for f in files if sizes[f[0]] < self.multipart_threshold]
+        large = [f for f in files if sizes[f[0]] >= self.multipart_threshold]
+        results = []
+
+        config = TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.part_size,
+            max_request_concurrency=self.max_concurrency,
+        )
+        with TransferManager(self.s3_client, config) as manager:
+            futures = {
+                manager.upload(
+                    local_path,
+                    bucket,
+                    prefix + relative_path,
+                    subscribers=[_ProgressSubscriber(progress)],
+                ): relative_path
+                for local_path, relative_path in small
+            }
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+                for local_path, relative_path in large:
+                    error = None
+                    try:
+                        self.upload_large_file(
+                            local_path, bucket, prefix + relative_path, pool, progress
+                        )
+                    except Exception as e:
+                        error = str(e)
+                    progress.file_done(failed=error is not None)
+                    results.append((relative_path, error))
+
+            for future, relative_path in futures.items():
+                error = None
+                try:
+                    future.result()
+                except Exception as e:
+                    error = str(e)
+                progress.file_done(failed=error is not None)
+                results.append((relative_path, error))
+
+        return results
+
+    def upload_large_file(self, local_path, bucket, key, pool, progress):
+        stat = os.stat(local_path)
+        state = self._load_state(bucket, key)
+        if state and (
+            state["size"] != stat.st_size
+            or state["mtime_ns"] != stat.st_mtime_ns
+            or state["part_size"] != self.part_size
+        ):
+            self._abort(bucket, key, state["upload_id"])
+            state = None
+        if state:
+            state["parts"] = self._verified_parts(bucket, key, state)
+            if state["parts"] is None:
+                state = None
+        if state is None:
+            resp = self.s3_client.create_multipart_upload(Bucket=bucket, Key=key)
+            state = {
+                "upload_id": resp["UploadId"],
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "part_size": self.part_size,
+                "parts": {},
+            }
+            self._save_state(bucket, key, state)
+
+        part_count = max(1, -(-stat.st_size // self.part_size))
+        missing = [n for n in range(1, part_count + 1) if str(n) not in state["parts"]]
+        progress.add_bytes(
+            sum(self._part_length(n, stat.st_size) for n in range(1, part_count + 1))
+            - sum(self._part_length(n, stat.st_size) for n in missing)
+        )
+
+        def upload_part(part_number):
+            with open(local_path, "rb") as f:
+                f.seek((part_number - 1) * self.part_size)
+                body = f.read(self.part_size)
+            resp = self.s3_client.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=state["upload_id"],
+                PartNumber=part_number,
+                Body=body,
+            )
+            progress.add_bytes(len(body))
+            with self.state_lock:
+                state["parts"][str(part_number)] = resp["ETag"]
+            self._save_state(bucket, key, state)
+
+        futures = [pool.submit(upload_part, n) for n in missing]
+        for future in as_completed(futures):
+            # leave the recorded parts in place so the next attempt can resume
+            future.result()
+
+        self.s3_client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=state["upload_id"],
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": int(n), "ETag": etag}
+                    for n, etag in sorted(
+                        state["parts"].items(), key=lambda p: int(p[0])
+                    )
+                ]
+            },
+        )
+        self._clear_state(bucket, key)
+
+    def _part_length(self, part_number, size):
+        return min(self.part_size, size - (part_number - 1) * self.part_size)
+
+    def _verified_parts(self, bucket, key, state):
+        """
+        Parts of an interrupted upload that S3 actually has, None if the upload is gone.
+        """
+        from botocore.exceptions import ClientError
+
+        parts = {}
+        paginator = self.s3_client.get_paginator("list_parts")
+        try:
+            for page in paginator.paginate(
+                Bucket=bucket, Key=key, UploadId=state["upload_id"]
+            ):
+                for part in page.get("Parts", []):
+                    parts[str(part["PartNumber"])] = part["ETag"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "NoSuchUpload":
+                self._clear_state(bucket, key)
+                return None
+            raise
+        return parts
+
+    def _abort(self, bucket, key, upload_id):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=upload_id
+            )
+        except ClientError:
+            pass
+        self._clear_state(bucket, key)
+
+    def _state_path(self, bucket, key):
+        if self.state_dir is None:
+            return None
+        name = hashlib.sha1(f"{bucket}/{key}".encode()).hexdigest()
+        return self.state_dir / f"{name}.json"
+
+    def _load_state(self, bucket, key):
+        path = self._state_path(bucket, key)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, bucket, key, state):
+        path = self._state_path(bucket, key)
+        if path is None:
+            return
+        with self.state_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+
+    def _clear_state(self, bucket, key):
+        path = self._state_path(bucket, key)
+        if path is not None and path.exists():
+            path.unlink()
+
+
+class DownloadManager:
+    """
+    Downloads S3 objects with concurrent ranged GETs into a local content-addressed cache.
+
+    Objects are stored in `cache_dir` under a name derived from their ETag and size, so
+    an object that was downloaded before is copied from the cache instead of fetched
+    again. Ranges already written to a partial download are recorded next to it, and an
+    interrupted download only fetches the missing ranges when retried.
+    """
+
+    def __init__(self, s3_client, cache_dir, part_size=8 * MB, max_concurrency=8):
+        self.s3_client = s3_client
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.state_lock = threading.Lock()
+
+    def cache_path(self, etag, size):
+        address = hashlib.sha256(f"{etag.strip(chr(34))}:{size}".encode()).hexdigest()
+        return self.cache_dir / "objects" / address[:2] / address
+
+    def download_objects(self, bucket, objects, destination, prefix="", progress=None):
+        """
+        Download `objects` (dicts with Key, ETag and Size, as listed by S3) into the
+        local folder `destination`, keeping their path relative to `prefix`. Returns a
+        list of (key, local path, error or None).
+        """
+        if progress is None:
+            progress = TransferProgress()
+        progress.total_bytes = sum(obj["Size"] for obj in objects)
+        progress.total_files = len(objects)
+        destination = pathlib.Path(destination)
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for obj in objects:
+                local_path = destination / obj["Key"][len(prefix) :]
+                error = None
+                try:
+                    cached = self.fetch(bucket, obj, pool, progress)
+                    local_path.parent.mkdir(parents=True, exist_ok=True)
+                    # copied rather than linked so editing the file leaves the cache intact
+                    shutil.copyfile(cached, local_path)
+                except Exception as e:
+                    error = str(e)
+                progress.file_done(failed=error is not None)
+                results.append((obj["Key"], str(local_path), error))
+        return results
+
+    def fetch(self, bucket, obj, pool, progress):
+        """
+        Make sure an object is in the cache and return its path there.
+        """
+        etag, size = obj["ETag"], obj["Size"]
+        cached = self.cache_path(etag, size)
+        if cached.exists() and cached.stat().st_size == size:
+            progress.add_bytes(size)
+            return cached
+
+        partial = cached.with_suffix(".part")
+        state_path = cached.with_suffix(".json")
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        done = None
+        if partial.exists() and state_path.exists():
+            try:
+                with open(state_path, "r") as f:
+                    state = json.load(f)
+                # ranges are only the same when split with the same part size
+                if state["part_size"] == self.part_size:
+                    done = set(state["done"])
+            except (OSError, ValueError, KeyError, TypeError):
+                done = None
+        if done is None or partial.stat().st_size != size:
+            done = set()
+            with open(partial, "wb") as f:
+                f.truncate(size)
+
+        ranges = [
+            (start, min(start + self.part_size, size) - 1)
+            for start in range(0, size, self.part_size)
+        ]
+        progress.add_bytes(
+            sum(end - start + 1 for start, end in ranges if start in done)
+        )
+
+        def fetch_range(byte_range):
+            start, end = byte_range
+            resp = self.s3_client.get_object(
+                Bucket=bucket,
+                Key=obj["Key"],
+                Range=f"bytes={start}-{end}",
+                # fail instead of mixing ranges of two versions of the object
+                IfMatch=etag,
+            )
+            with open(partial, "r+b") as f:
+                f.seek(start)
+                for chunk in resp["Body"].iter_chunks(256 * 1024):
+                    f.write(chunk)
+                    progress.add_bytes(len(chunk))
+            with self.state_lock:
+                done.add(start)
+                tmp_path = state_path.with_suffix(".tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump({"part_size": self.part_size, "done": sorted(done)}, f)
+                os.replace(tmp_path, state_path)
+
+        missing = [r for r in ranges if r[0] not in done]
+        futures = [pool.submit(fetch_range, r) for r in missing]
+        for future in as_completed(futures):
+            future.result()
+
+        os.replace(partial, cached)
+        if state_path.exists():
+            state_path.unlink()
+        return cached
@@ -0,0 +1,18 @@
+import pytest
+
+from bidrunner2.bench import StubECS, make_runner
+
+
+@pytest.fixture
+def ecs():
+    return StubECS()
+
+
+@pytest.fixture
+def runner(tmp_path, ecs):
+    """
+    A BidRunner on the benchmark stand-ins, with its files under `tmp_path`.
+    """
+    runner = make_runner(tmp_path, ecs=ecs)
+    yield runner
+    runner.scheduler.stop()
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import pathlib
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from bidrunner2 import aio
+from bidrunner2.tracker import TaskTracker
+
+needs_aiobotocore = pytest.mark.skipif(
+    not aio.available(), reason="the async backend needs aiobotocore"
+)
+
+
+def test_commands_start_without_aws_libraries():
+    code = (
+        "import sys, bidrunner2.cli, bidrunner2.main; "
+        "print(sorted(m for m in ('aiobotocore', 'botocore', 'numpy') if m in sys.modules))"
+    )
+    src = pathlib.Path(aio.__file__).parents[1]
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH=str(src)),
+    )
+    assert out.stdout.strip() == "[]"
+
+
+class Client:
+    def __init__(self, creds):
+        self.creds = creds
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def close(self):
+        self.closed = True
+
+    async def describe_tasks(self, **params):
+        from botocore.exceptions import ClientError
+
+        if self.creds["aws_session_token"] == "expired":
+            raise ClientError({"Error": {"Code": "ExpiredToken"}}, "DescribeTasks")
+        return {"token": self.creds["aws_session_token"]}
+
+
+class Session:
+    def __init__(self):
+        self.clients = []
+
+    def create_client(self, service, region_name, config, **creds):
+        client = Client(creds)
+        self.clients.append(client)
+        return client
+
+
+class Registry:
+    max_pool_connections = 10
+    connect_timeout = read_timeout = 1
+
+    def __init__(self):
+        self.aws_creds = {"aws_session_token": "expired"}
+        self.refreshes = 0
+
+    def refresh_credentials(self):
+        self.refreshes += 1
+        self.aws_creds = {"aws_session_token": "new"}
+
+
+def backend_for(**runner):
+    backend = aio.AsyncBackend(SimpleNamespace(metrics=None, **runner)).open()
+    backend._session = Session()
+    return backend
+
+
+@needs_aiobotocore
+def test_expired_token_refreshed_once():
+    registry = Registry()
+    backend = backend_for(clients=registry)
+
+    async def describe():
+        calls = [backend.call("ecs", "us-east-2", "describe_tasks") for _ in range(5)]
+        results = await asyncio.gather(*calls)
+        await backend.close()
+        return results
+
+    assert [r["token"] for r in asyncio.run(describe())] == ["new"] * 5
+    assert registry.refreshes == 1
+    assert all(client.closed for client in backend._session.clients)
+
+
+@needs_aiobotocore
+def test_follow_tasks_wakes_for_new_tasks():
+    tracker = TaskTracker(None, fast_interval=0.05)
+    backend = backend_for(tracker=tracker)
+    refreshes = []
+
+    async def refresh_tasks():
+        refreshes.append(len(tracker.active_tasks()))
+        return []
+
+    backend.refresh_tasks = refresh_tasks
+
+    async def follow():
+        task = asyncio.create_task(backend.follow_tasks(print, wake_check=0.01))
+        await asyncio.sleep(0.1)
+        # nothing tracked, the loop sleeps until a task is
+        assert refreshes == []
+        tracker.track("c", "arn:aws:ecs:us-east-2:1:task/c/1")
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(follow())
+    assert refreshes[:2] == [1, 1]
+
+
+@needs_aiobotocore
+def test_consume_queue_reports_new_messages_and_errors():
+    backend = backend_for()
+    polls = [RuntimeError("unreachable"), [], [{"id": "m1"}]]
+
+    async def sqs_poll(queue_url, wait_time):
+        result = polls.pop(0) if polls else []
+        if isinstance(result, Exception):
+            raise result
+        await asyncio.sleep(0)
+        return result
+
+    backend.sqs_poll = sqs_poll
+    received, errors = [], []
+
+    async def consume():
+        task = asyncio.create_task(
+            backend.consume_queue(
+                "queue", received.extend, errors.append, error_backoff=0
+            )
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(consume())
+    assert [str(e) for e in errors] == ["unreachable"]
+    assert received == [{"id": "m1"}]
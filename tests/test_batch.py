@@ -0,0 +1,99 @@
+import pytest
+
+from bidrunner2.batch import (
+    queue_batch,
+    read_manifest,
+    row_priority,
+    row_size,
+    submit_batch,
+    validate_manifest_row,
+)
+
+ROW = {
+    "bid_name": "bid-a",
+    "input_prefix": "auction-1/",
+    "shapefile": "auction_1.shp",
+    "output_prefix": "bid-a/",
+}
+
+
+def test_read_csv_manifest(tmp_path):
+    path = tmp_path / "bids.csv"
+    path.write_text(
+        "bid_name,input_prefix,shapefile,output_prefix,memory\n"
+        "bid-a,auction-1/,auction_1.shp,bid-a/,8192\n"
+        " bid-b ,auction-2/,auction_2.shp,bid-b/,\n"
+    )
+    rows = read_manifest(path)
+    assert [r["bid_name"] for r in rows] == ["bid-a", "bid-b"]
+    assert rows[0]["memory"] == "8192"
+    assert rows[1]["cpu"] == rows[1]["priority"] == ""
+
+
+def test_read_toml_manifest(tmp_path):
+    path = tmp_path / "bids.toml"
+    path.write_text(
+        "[[bids]]\n"
+        'bid_name = "bid-a"\n'
+        'input_prefix = "auction-1/"\n'
+        'shapefile = "auction_1.shp"\n'
+        'output_prefix = "bid-a/"\n'
+        "cpu = 2048\n"
+        "priority = 5\n"
+    )
+    (row,) = read_manifest(path)
+    assert row["cpu"] == "2048"
+    assert row_priority(row) == 5
+
+
+@pytest.mark.parametrize(
+    "changes, error",
+    [
+        ({}, None),
+        ({"shapefile": ""}, "missing values for: shapefile"),
+        ({"cpu": "two"}, "expected whole numbers for: cpu"),
+        ({"priority": "-3"}, None),
+        ({"cpu": "4096"}, None),
+        (
+            {"cpu": "4096", "memory": "3072"},
+            "Fargate has no task size of 4096 cpu / 3072 MiB",
+        ),
+        ({"priority": "high"}, "expected a whole number for: priority"),
+    ],
+)
+def test_validate_manifest_row(changes, error):
+    assert validate_manifest_row(dict(ROW, **changes)) == error
+
+
+def test_row_size_and_priority():
+    assert row_size(ROW) == (None, None)
+    assert row_size(dict(ROW, cpu="2048")) == (2048, 4096)
+    assert row_size(dict(ROW, memory="16384")) == (2048, 16384)
+    assert row_priority(ROW, default=10) == 10
+    assert row_priority(dict(ROW, priority="-1"), default=10) == -1
+
+
+def test_queue_batch_skips_invalid_rows(runner):
+    runner.scheduler.max_running = 0  # keep every bid queued
+    rows = [ROW, dict(ROW, bid_name="bid-b", priority="20"), dict(ROW, shapefile="")]
+    jobs, invalid = queue_batch(runner, rows, priority=10)
+    assert [(job["bid_name"], job["priority"]) for job in jobs] == [
+        ("bid-a", 10),
+        ("bid-b", 20),
+    ]
+    assert invalid == [(3, "bid-a", "missing values for: shapefile")]
+    assert [job["bid_name"] for job in runner.scheduler.pending()] == [
+        "bid-b",
+        "bid-a",
+    ]
+
+
+def test_submit_batch_results_in_manifest_order(runner, ecs):
+    rows = [dict(ROW, bid_name=f"bid-{i}") for i in range(20)] + [{}]
+    seen = []
+    results = submit_batch(runner, rows, workers=4, on_result=seen.append)
+    assert [r["row"] for r in results] == list(range(1, 22))
+    assert all(r["task_arn"] for r in results[:20])
+    assert results[20]["error"].startswith("missing values")
+    assert len(seen) == 21
+    assert ecs.count == 20
@@ -0,0 +1,37 @@
+import time
+
+from bidrunner2.cache import ListingCache, ObjectIndex
+
+
+def test_listing_cache_survives_restart(tmp_path):
+    path = tmp_path / "listings.json"
+    assert ListingCache(path).get("bucket") == ([], False)
+    ListingCache(path).put("bucket", ["auction-1/", "auction-2/"])
+    assert ListingCache(path).get("bucket") == (["auction-1/", "auction-2/"], True)
+
+
+def test_stale_listing_still_returned(tmp_path, monkeypatch):
+    cache = ListingCache(tmp_path / "listings.json", ttl=60)
+    cache.put("bucket", ["auction-1/"])
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("bucket") == (["auction-1/"], False)
+
+
+def test_object_index_completes_prefixes(tmp_path):
+    index = ObjectIndex(tmp_path / "objects.json")
+    index.put("bucket", "auction-1/", ["b.shp", "a.shp", "a.shx", "c.csv"])
+    assert index.complete("bucket", "auction-1/", "a") == ["a.shp", "a.shx"]
+    assert index.complete("bucket", "auction-1/", "", limit=2) == ["a.shp", "a.shx"]
+    assert index.complete("bucket", "auction-2/", "a") == []
+
+
+def test_object_index_adds_keys_to_indexed_folders(tmp_path):
+    path = tmp_path / "objects.json"
+    index = ObjectIndex(path)
+    index.put("bucket", "auction-1/", ["b.shp"])
+    index.add("bucket", ["auction-1/a.shp", "auction-1/b.shp", "auction-2/c.shp"])
+    keys, fresh = ObjectIndex(path).get("bucket", "auction-1/")
+    assert (keys, fresh) == (["a.shp", "b.shp"], True)
+    # folders never listed are not indexed from a few keys
+    assert ObjectIndex(path).get("bucket", "auction-2/") == ([], False)
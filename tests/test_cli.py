@@ -0,0 +1,159 @@
+import json
+
+import pytest
+
+from bidrunner2 import cli
+from bidrunner2.bench import StubECS, StubSQS, make_runner
+
+BID = ["auction-1/", "auction_1.shp"]
+
+
+class StubTasks(StubECS):
+    """
+    The benchmark ECS stand-in, failing to start the bids in `missing` and reporting
+    the tasks in `exit_codes` as stopped with that exit code.
+    """
+
+    def __init__(self, missing=()):
+        super().__init__()
+        self.missing = set(missing)
+        self.exit_codes = {}
+        self.bids = {}
+
+    def run_task(self, **params):
+        bid_name = params["overrides"]["containerOverrides"][0]["command"][2]
+        if bid_name in self.missing:
+            return {"tasks": [], "failures": [{"reason": "MISSING"}]}
+        resp = super().run_task(**params)
+        self.bids[bid_name] = resp["tasks"][0]["taskArn"]
+        return resp
+
+    def describe_tasks(self, cluster, tasks):
+        resp = super().describe_tasks(cluster, tasks)
+        for task in resp["tasks"]:
+            if task["taskArn"] in self.exit_codes:
+                task["lastStatus"] = "STOPPED"
+                task["containers"] = [{"exitCode": self.exit_codes[task["taskArn"]]}]
+        return resp
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch, capsys):
+    """
+    Runs `cli.main` on a runner of the benchmark stand-ins, returning its exit code
+    and the events it wrote.
+    """
+    runners = []
+
+    def load_runner(events):
+        runner = make_runner(tmp_path, ecs=run.ecs, sqs=StubSQS(0))
+        # the stand-ins are threaded clients, not aiobotocore ones
+        runner.config["app"]["async_backend"] = False
+        runner.tracker.fast_interval = 0.05
+        runner.set_logger(events)
+        runners.append(runner)
+        return runner
+
+    def run(argv):
+        code = cli.main(argv)
+        events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        return code, events
+
+    run.ecs = StubTasks()
+    monkeypatch.setattr(cli, "load_runner", load_runner)
+    yield run
+    for runner in runners:
+        runner.scheduler.stop()
+        runner.tracker.stop()
+
+
+def write_manifest(tmp_path, *bids):
+    path = tmp_path / "manifest.csv"
+    path.write_text(
+        "bid_name,input_prefix,shapefile,output_prefix\n"
+        + "".join(f"{bid},{','.join(BID)},{bid}/\n" for bid in bids)
+    )
+    return str(path)
+
+
+def names(events, *kinds):
+    return [e["event"] for e in events if e["event"] in kinds]
+
+
+def test_submit_queues_bids(run, tmp_path):
+    code, events = run(
+        ["submit", "--manifest", write_manifest(tmp_path, "bid-1", "bid-2")]
+    )
+    assert code == 0
+    assert sorted(names(events, "queued", "submitted", "submit_failed")) == [
+        "queued",
+        "queued",
+        "submitted",
+        "submitted",
+    ]
+    submitted = {
+        e["bid_name"]: e["task_arn"] for e in events if e["event"] == "submitted"
+    }
+    assert submitted == run.ecs.bids
+
+
+def test_failed_submission_exits_non_zero(run, tmp_path):
+    run.ecs.missing = {"bid-2"}
+    code, events = run(
+        ["submit", "--manifest", write_manifest(tmp_path, "bid-1", "bid-2")]
+    )
+    assert code == 1
+    (failed,) = [e for e in events if e["event"] == "submit_failed"]
+    assert failed["bid_name"] == "bid-2"
+    assert "MISSING" in failed["error"]
+
+
+def test_direct_submission_failure(run):
+    run.ecs.missing = {"bid-1"}
+    code, events = run(["submit", "--direct", "bid-1", *BID, "bid-1/"])
+    assert code == 1
+    assert names(events, "submitted", "submit_failed") == ["submit_failed"]
+
+
+def test_submit_without_values_is_an_error(run):
+    code, events = run(["submit", "bid-1"])
+    assert code == 2
+    assert names(events, "error") == ["error"]
+    assert run.ecs.count == 0
+
+
+def test_watch_reports_failed_task(run):
+    class StopOnDescribe(StubTasks):
+        def describe_tasks(self, cluster, tasks):
+            self.exit_codes = {arn: 1 for arn in tasks}
+            return super().describe_tasks(cluster, tasks)
+
+    run.ecs = StopOnDescribe()
+    code, events = run(
+        ["submit", "--direct", "--watch", "--timeout", "10", "bid-1", *BID, "bid-1/"]
+    )
+    assert code == 1
+    (status,) = [e for e in events if e["event"] == "status"]
+    assert status["previous_status"] == "SUBMITTED"
+    assert status["status"] == "STOPPED"
+    assert status["exit_code"] == 1
+    assert events[-1]["event"] == "watch_done"
+    assert events[-1]["failed"] == 1
+
+
+def test_status_of_tasks(run):
+    run.ecs.exit_codes = {"arn:aws:ecs:us-east-2:0:task/bench/00000002": 0}
+    code, events = run(
+        [
+            "status",
+            "--task",
+            "arn:aws:ecs:us-east-2:0:task/bench/00000001",
+            "--task",
+            "arn:aws:ecs:us-east-2:0:task/bench/00000002",
+        ]
+    )
+    assert code == 0
+    assert [(e["task_arn"][-1], e["status"], e["cluster"]) for e in events] == [
+        ("1", "RUNNING", "bench"),
+        ("2", "STOPPED", "bench"),
+    ]
@@ -0,0 +1,95 @@
+import gzip
+import io
+import math
+
+import pytest
+
+from bidrunner2.compare import (
+    compare_bids,
+    load_summary,
+    merge_summaries,
+    save_summary,
+    summarize_table,
+    text_lines,
+    top_changes,
+)
+
+np = pytest.importorskip("numpy")
+
+TABLE = """field_id,crop,acres,cost
+f1,rice,10,1.5
+f2,corn,4,
+f1,rice,2.5,1
+f3,rice,,2
+"""
+
+
+def summary_of(text, **kwargs):
+    return summarize_table(io.StringIO(text), **kwargs)
+
+
+def totals(summary, column):
+    index = summary["columns"].index(column)
+    return dict(zip(summary["keys"].tolist(), summary["sums"][:, index].tolist()))
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 100])
+def test_summarize_table(chunk_rows):
+    summary = summary_of(TABLE, chunk_rows=chunk_rows)
+    # crop is not a number, cost is (blank values count as 0)
+    assert summary["columns"] == ["acres", "cost"]
+    assert totals(summary, "acres") == {"f1": 12.5, "f2": 4, "f3": 0}
+    assert totals(summary, "cost") == {"f1": 2.5, "f2": 0, "f3": 2}
+    assert summary["counts"].tolist() == [2, 1, 1]
+
+
+def test_columns_typed_from_first_chunk():
+    summary = summary_of("id,cost\na,1\nb,x\n", chunk_rows=1)
+    assert totals(summary, "cost") == {"a": 1, "b": 0}
+    assert summary_of("id,cost\na,1\nb,x\n")["columns"] == []
+
+
+def test_summarize_by_other_column():
+    summary = summary_of(TABLE, key_column="crop")
+    assert totals(summary, "acres") == {"corn": 4, "rice": 12.5}
+
+
+def test_summarize_gzipped_body():
+    body = io.BytesIO(gzip.compress(TABLE.encode()))
+    summary = summarize_table(text_lines(body, "bid-a/fields.csv.gz"))
+    assert totals(summary, "acres")["f1"] == 12.5
+
+
+def test_merge_summaries_adds_missing_columns_as_zero():
+    merged = merge_summaries(
+        [summary_of("id,acres\na,1\nb,2\n"), summary_of("id,acres,cost\nb,3,7\n")]
+    )
+    assert merged["columns"] == ["acres", "cost"]
+    assert totals(merged, "acres") == {"a": 1, "b": 5}
+    assert totals(merged, "cost") == {"a": 0, "b": 7}
+
+
+def test_summary_round_trip(tmp_path):
+    summary = summary_of(TABLE)
+    save_summary(tmp_path / "s.npz", summary)
+    loaded = load_summary(tmp_path / "s.npz")
+    assert loaded["columns"] == summary["columns"]
+    assert np.array_equal(loaded["sums"], summary["sums"])
+    assert load_summary(tmp_path / "missing.npz") is None
+
+
+def test_compare_bids():
+    comparison = compare_bids(
+        {
+            "base": summary_of("id,acres\na,10\nb,5\nc,1\n"),
+            "sweep": summary_of("id,acres\na,2\nb,6\nd,4\n"),
+        },
+        "acres",
+    )
+    assert comparison["keys"].tolist() == ["a", "b", "c", "d"]
+    values = comparison["values"]
+    assert values[0].tolist()[:3] == [10, 5, 1] and math.isnan(values[0][3])
+    assert comparison["deltas"][1].tolist() == [-8, 1, -1, 4]
+    assert comparison["ranks"].tolist() == [[1, 2, 3, 4], [3, 1, 4, 2]]
+    assert comparison["rank_changes"][1].tolist() == [-2, 1, -1, 2]
+    assert top_changes(comparison, limit=2) == [0, 3]
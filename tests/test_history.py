@@ -0,0 +1,125 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from bidrunner2.history import RunHistory
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = RunHistory(tmp_path / "history.db")
+    yield history
+    history.close()
+
+
+def submit(history, n, bid_name=None, submitted_at=None):
+    history.record_submission(
+        f"arn:task/{n:03d}",
+        "bench",
+        [bid_name or f"bid-{n}", "auction-1/", "auction_1.shp", f"out-{n}/"],
+        submitted_at=submitted_at or 1000.0 + n,
+    )
+
+
+def test_runs_paged_newest_first(history):
+    for n in range(1, 8):
+        # two runs per second, so the pages are cut within a timestamp
+        submit(history, n, submitted_at=1000.0 + n // 2)
+    pages = []
+    before = None
+    while page := history.runs(before=before, limit=3):
+        pages.append([run["bid_name"] for run in page])
+        before = (page[-1]["submitted_at"], page[-1]["task_arn"])
+    assert pages == [
+        ["bid-7", "bid-6", "bid-5"],
+        ["bid-4", "bid-3", "bid-2"],
+        ["bid-1"],
+    ]
+
+
+def test_bid_prefix_and_status_filters(history):
+    for n, bid_name in enumerate(["north-1", "north-2", "south-1", "nor*th"]):
+        submit(history, n, bid_name)
+    history.update_tasks(
+        [
+            {
+                "task_arn": "arn:task/001",
+                "last_status": "STOPPED",
+                "stop_code": "EssentialContainerExited",
+                "stopped_reason": None,
+                "exit_code": 1,
+                "started_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+                "stopped_at": 1704067500.0,
+            }
+        ]
+    )
+    assert [run["bid_name"] for run in history.runs(bid_prefix="north")] == [
+        "north-2",
+        "north-1",
+    ]
+    # wildcards in the prefix are matched literally
+    assert [run["bid_name"] for run in history.runs(bid_prefix="nor*")] == ["nor*th"]
+    assert history.count(bid_prefix="north") == 2
+    assert history.count(status="SUBMITTED") == 3
+
+    (stopped,) = history.runs(status="STOPPED")
+    assert stopped["bid_name"] == "north-2"
+    assert stopped["exit_code"] == 1
+    assert stopped["started_at"] == 1704067200.0
+    assert [run["bid_name"] for run in history.active_runs()] == [
+        "north-1",
+        "south-1",
+        "nor*th",
+    ]
+
+
+def test_resubmitted_arn_kept_once(history):
+    submit(history, 1)
+    submit(history, 1, "other", submitted_at=2000.0)
+    assert [(run["bid_name"], run["submitted_at"]) for run in history.runs()] == [
+        ("bid-1", 1001.0)
+    ]
+
+
+def test_finished_runs_need_a_profile(history):
+    for n in range(1, 4):
+        submit(history, n)
+    history.update_tasks(
+        [
+            {
+                "task_arn": f"arn:task/{n:03d}",
+                "last_status": "STOPPED",
+                "stop_code": None,
+                "stopped_reason": None,
+                "exit_code": 0,
+                "started_at": None,
+                "stopped_at": None,
+            }
+            for n in (1, 2)
+        ]
+    )
+    history.update_profile("arn:task/002", input_bytes=2048, feature_count=12)
+    history.update_profile("arn:task/003", input_bytes=4096, feature_count=30)
+    assert [run["bid_name"] for run in history.finished_runs()] == ["bid-2"]
+
+
+def test_columns_added_to_old_table(tmp_path):
+    path = tmp_path / "history.db"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE runs (task_arn TEXT PRIMARY KEY, bid_name TEXT NOT NULL, input_prefix TEXT, shapefile TEXT, output_prefix TEXT, cluster TEXT, status TEXT NOT NULL, stop_code TEXT, stopped_reason TEXT, exit_code INTEGER, submitted_at REAL NOT NULL, started_at REAL, stopped_at REAL)"
+    )
+    conn.execute(
+        "INSERT INTO runs (task_arn, bid_name, status, submitted_at) VALUES ('arn:task/old', 'old', 'STOPPED', 1.0)"
+    )
+    conn.commit()
+    conn.close()
+
+    history = RunHistory(path)
+    submit(history, 1)
+    history.record_submission("arn:task/new", "bench", ["new"], cpu=2048, memory=4096)
+    runs = {run["bid_name"]: run for run in history.runs()}
+    assert runs["old"]["cpu"] is None
+    assert (runs["new"]["cpu"], runs["new"]["memory"]) == (2048, 4096)
+    history.close()
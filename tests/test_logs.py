@@ -0,0 +1,155 @@
+import gzip
+from types import SimpleNamespace
+
+from bidrunner2.logs import LogBuffer, LogTailer
+
+
+class NoStream(Exception):
+    pass
+
+
+class StubLogs:
+    """
+    CloudWatch log streams, {stream name: [messages]}, returned `page` events at a
+    time.
+    """
+
+    exceptions = SimpleNamespace(ResourceNotFoundException=NoStream)
+
+    def __init__(self, streams=None, page=2):
+        self.streams = streams or {}
+        self.page = page
+        self.calls = []
+
+    def get_log_events(
+        self, logGroupName, logStreamName, startFromHead, nextToken=None
+    ):
+        self.calls.append(nextToken)
+        if logStreamName not in self.streams:
+            raise NoStream(logStreamName)
+        messages = self.streams[logStreamName]
+        start = int(nextToken.split("/")[1]) if nextToken else 0
+        end = min(start + self.page, len(messages))
+        return {
+            "events": [{"message": m} for m in messages[start:end]],
+            "nextForwardToken": f"f/{end}",
+        }
+
+
+class RegionalClients:
+    def __init__(self, **logs):
+        self.logs = logs
+
+    def client(self, service, region_name, max_pool_connections=None):
+        return self.logs[region_name]
+
+
+def tailer_for(region_name=None, **logs):
+    return LogTailer(
+        SimpleNamespace(clients=RegionalClients(**logs)), region_name=region_name
+    )
+
+
+WEST_TASK = "arn:aws:ecs:us-west-2:1:task/west/aaa"
+EAST_TASK = "arn:aws:ecs:us-east-2:1:task/east/bbb"
+
+
+def test_logs_read_in_the_task_region():
+    west = StubLogs({"ecs/bidrunner/aaa": ["west line"]})
+    east = StubLogs({"ecs/bidrunner/bbb": ["east line"]})
+    tailer = tailer_for(**{"us-west-2": west, "us-east-2": east})
+    events = tailer.poll_many([WEST_TASK, EAST_TASK])
+    assert [e["message"] for e in events[WEST_TASK]] == ["west line"]
+    assert [e["message"] for e in events[EAST_TASK]] == ["east line"]
+
+
+def test_configured_region_overrides_task_region():
+    west = StubLogs({"ecs/bidrunner/bbb": ["east task, west logs"]})
+    tailer = tailer_for(region_name="us-west-2", **{"us-west-2": west})
+    assert [e["message"] for e in tailer.poll(EAST_TASK)] == ["east task, west logs"]
+
+
+def test_poll_continues_from_last_token():
+    logs = StubLogs({"ecs/bidrunner/bbb": ["one", "two", "three"]}, page=2)
+    tailer = tailer_for(**{"us-east-2": logs})
+    assert [e["message"] for e in tailer.poll(EAST_TASK)] == ["one", "two", "three"]
+    # pages are followed until a page comes back empty
+    assert logs.calls == [None, "f/2", "f/3"]
+
+    logs.calls.clear()
+    assert tailer.poll(EAST_TASK) == []
+    assert logs.calls == ["f/3"]
+
+    logs.streams["ecs/bidrunner/bbb"].append("four")
+    assert [e["message"] for e in tailer.poll(EAST_TASK)] == ["four"]
+    assert tailer.tokens[EAST_TASK] == "f/4"
+
+
+def test_stream_not_created_yet():
+    logs = StubLogs()
+    tailer = tailer_for(**{"us-east-2": logs})
+    assert tailer.poll(EAST_TASK) == []
+    assert EAST_TASK not in tailer.tokens
+
+    logs.streams["ecs/bidrunner/bbb"] = ["started"]
+    assert [e["message"] for e in tailer.poll(EAST_TASK)] == ["started"]
+
+
+def test_tasks_to_follow():
+    tailer = tailer_for()
+    tasks = [
+        {"task_arn": "provisioning", "last_status": "PROVISIONING"},
+        {"task_arn": "running", "last_status": "RUNNING"},
+        {"task_arn": "stopped", "last_status": "STOPPED"},
+    ]
+    assert tailer.tasks_to_follow(tasks) == ["running", "stopped"]
+    # stopped tasks are read one last time only
+    assert tailer.tasks_to_follow(tasks) == ["running"]
+
+
+def test_buffer_drops_duplicate_keys():
+    buffer = LogBuffer(dedup_size=2)
+    assert buffer.append("m1", key="m1")
+    assert not buffer.append("m1 again", key="m1")
+    assert buffer.append("no key")
+    assert buffer.append("no key")
+    assert buffer.append("m2", key="m2")
+    assert buffer.append("m3", key="m3")
+    # only the last `dedup_size` keys are remembered
+    assert buffer.append("m1 much later", key="m1")
+    assert list(buffer) == ["m1", "no key", "no key", "m2", "m3", "m1 much later"]
+
+
+def test_buffer_bounded_and_read_from_cursor():
+    buffer = LogBuffer(maxlen=3)
+    for n in range(1, 3):
+        buffer.append(f"line {n}")
+    lines, cursor = buffer.read()
+    assert (lines, cursor) == (["line 1", "line 2"], 2)
+    assert buffer.read(cursor) == ([], 2)
+
+    for n in range(3, 8):
+        buffer.append(f"line {n}")
+    assert len(buffer) == 3
+    # lines that fell out of the buffer before they were read are skipped
+    assert buffer.read(cursor) == (["line 5", "line 6", "line 7"], 7)
+    assert buffer.read(5) == (["line 6", "line 7"], 7)
+
+
+def test_buffer_spills_to_rotated_gzip_files(tmp_path):
+    path = tmp_path / "logs" / "run.log"
+    buffer = LogBuffer(maxlen=2, spill_path=path, spill_bytes=200, spill_backups=2)
+    for n in range(30):
+        buffer.write(f"[bold]line {n:02d}[/bold] " + "x" * 40)
+    for handler in buffer.spill.handlers:
+        handler.close()
+
+    assert sorted(p.name for p in path.parent.iterdir()) == [
+        "run.log",
+        "run.log.1.gz",
+        "run.log.2.gz",
+    ]
+    spilled = gzip.decompress((path.parent / "run.log.1.gz").read_bytes()).decode()
+    spilled += path.read_text()
+    assert spilled.splitlines()[-1] == "line 29 " + "x" * 40
+    assert "[bold]" not in spilled
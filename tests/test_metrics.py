@@ -0,0 +1,121 @@
+import json
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from botocore.hooks import HierarchicalEmitter
+from botocore.stub import Stubber
+
+from bidrunner2.metrics import Histogram, Metrics
+
+
+@pytest.fixture
+def metrics():
+    return Metrics()
+
+
+@pytest.fixture
+def sqs(metrics):
+    session = boto3.Session(
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        region_name="us-east-2",
+    )
+    metrics.install(session)
+    client = session.client("sqs")
+    with Stubber(client) as stubber:
+        client.stubber = stubber
+        yield client
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"1": 1, "2": 2, "4": 1, "+Inf": 1}
+    assert (snapshot["count"], snapshot["sum"], snapshot["max"]) == (5, 16.5, 10)
+    assert histogram.quantile(0.5) == pytest.approx(1.75)
+    assert histogram.quantile(1) == 10
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_hooks_count_calls_and_errors(metrics, sqs):
+    sqs.stubber.add_response("list_queues", {"QueueUrls": []})
+    sqs.stubber.add_response("list_queues", {"QueueUrls": []})
+    sqs.stubber.add_client_error(
+        "get_queue_url", "AWS.SimpleQueueService.NonExistentQueue"
+    )
+    sqs.list_queues()
+    sqs.list_queues()
+    with pytest.raises(ClientError):
+        sqs.get_queue_url(QueueName="missing")
+
+    rows = {operation: stats for _, operation, stats in metrics.operation_rows()}
+    assert (rows["ListQueues"]["calls"], rows["ListQueues"]["errors"]) == (2, 0)
+    assert (rows["GetQueueUrl"]["calls"], rows["GetQueueUrl"]["errors"]) == (1, 1)
+
+
+def test_call_latency_and_bytes(metrics):
+    events = HierarchicalEmitter()
+    metrics.install(events)
+    context = {}
+    events.emit("before-call.s3.GetObject", context=context)
+    events.emit(
+        "after-call.s3.GetObject",
+        http_response=SimpleNamespace(headers={"content-length": "2048"}),
+        parsed={"ResponseMetadata": {"HTTPStatusCode": 200, "RetryAttempts": 2}},
+        context=context,
+    )
+    (row,) = metrics.operation_rows()
+    assert row[:2] == ("s3", "GetObject")
+    assert row[2]["latency"]["count"] == 1
+    assert (row[2]["bytes_received"], row[2]["retries"]) == (2048, 2)
+
+
+def test_throttled_attempts_counted(metrics):
+    events = HierarchicalEmitter()
+    metrics.install(events)
+    throttled = (None, {"Error": {"Code": "ThrottlingException"}})
+    events.emit("needs-retry.ecs.RunTask", response=throttled)
+    events.emit("needs-retry.ecs.RunTask", response=(None, {}))
+    (row,) = metrics.operation_rows()
+    assert row[:2] == ("ecs", "RunTask")
+    assert row[2]["throttles"] == 1
+
+
+def test_spans(metrics):
+    metrics.start_span("submit_to_running", "arn/1")
+    # a span already started keeps its first start
+    metrics.start_span("submit_to_running", "arn/1")
+    metrics.end_span("submit_to_running", "arn/1")
+    metrics.end_span("submit_to_running", "arn/1")
+    metrics.end_span("submit_to_running", "arn/never-started")
+    with metrics.span("compare_outputs"):
+        pass
+    counts = {name: stats["count"] for name, stats in metrics.span_rows()}
+    assert counts == {"compare_outputs": 1, "submit_to_running": 1}
+
+
+def test_prometheus_text(metrics, sqs):
+    sqs.stubber.add_response("list_queues", {"QueueUrls": []})
+    sqs.list_queues()
+    metrics.observe("batch_submit", 0.3)
+    lines = metrics.prometheus().splitlines()
+    labels = 'service="sqs",operation="ListQueues"'
+    assert f"bidrunner2_aws_calls_total{{{labels}}} 1" in lines
+    # buckets are cumulative
+    assert 'bidrunner2_span_seconds_bucket{span="batch_submit",le="0.25"} 0' in lines
+    assert 'bidrunner2_span_seconds_bucket{span="batch_submit",le="0.5"} 1' in lines
+    assert 'bidrunner2_span_seconds_bucket{span="batch_submit",le="+Inf"} 1' in lines
+    assert "# TYPE bidrunner2_aws_throttles_total counter" in lines
+
+
+def test_export_format_follows_extension(metrics, tmp_path):
+    metrics.observe("batch_submit", 1.0)
+    snapshot = json.loads(open(metrics.export(tmp_path / "metrics.json")).read())
+    assert snapshot["spans"][0]["name"] == "batch_submit"
+    text = open(metrics.export(tmp_path / "out" / "metrics.prom")).read()
+    assert 'bidrunner2_span_seconds_count{span="batch_submit"} 1' in text
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["metrics.json", "out"]
@@ -0,0 +1,130 @@
+import pytest
+
+from bidrunner2.placement import (
+    DEFAULT_PLACEMENT,
+    bucket_region,
+    load_placements,
+    order_placements,
+    parse_task_arn,
+)
+from bidrunner2.scheduler import TaskNotStartedError
+
+WEST = {"region": "us-west-2", "cluster": "west", "subnets": ["subnet-w"]}
+EAST = {"region": "us-east-2", "cluster": "east"}
+
+ARGS = ["bid-a", "auction-1/", "auction_1.shp", "bid-a/"]
+
+
+def test_load_placements_defaults():
+    assert load_placements({}) == [DEFAULT_PLACEMENT]
+    west, east = load_placements({"placement": [WEST, EAST]})
+    assert west["task_definition"] == DEFAULT_PLACEMENT["task_definition"]
+    assert west["subnets"] == ["subnet-w"]
+    assert east["subnets"] == DEFAULT_PLACEMENT["subnets"]
+
+
+@pytest.mark.parametrize("table", [{"cluster": "c"}, {"region": "eu-west-1"}])
+def test_load_placements_rejects_incomplete_tables(table):
+    with pytest.raises(ValueError):
+        load_placements({"placement": [table]})
+
+
+def test_order_placements_prefers_bucket_region():
+    placements = load_placements({"placement": [EAST, WEST]})
+    assert [p["cluster"] for p in order_placements(placements, "us-west-2")] == [
+        "west",
+        "east",
+    ]
+    assert [p["cluster"] for p in order_placements(placements, None)] == [
+        "east",
+        "west",
+    ]
+
+
+@pytest.mark.parametrize(
+    "constraint, region",
+    [(None, "us-east-1"), ("", "us-east-1"), ("EU", "eu-west-1"), ("us-west-2",) * 2],
+)
+def test_bucket_region(constraint, region):
+    assert bucket_region(constraint) == region
+
+
+def test_parse_task_arn():
+    assert parse_task_arn("arn:aws:ecs:us-west-2:1:task/west/abc") == (
+        "us-west-2",
+        "west",
+    )
+    assert parse_task_arn("arn:aws:ecs:us-west-2:1:task/abc") == ("us-west-2", None)
+    assert parse_task_arn("not an arn") == (None, None)
+
+
+class RegionalECS:
+    def __init__(self, region, capacity=True):
+        self.region = region
+        self.capacity = capacity
+        self.calls = []
+
+    def run_task(self, **params):
+        self.calls.append(params)
+        if not self.capacity:
+            return {"tasks": [], "failures": [{"reason": "Capacity is unavailable"}]}
+        return {
+            "tasks": [{"taskArn": f"arn:aws:ecs:{self.region}:1:task/c/1"}],
+            "failures": [],
+        }
+
+
+class LocatedS3:
+    def __init__(self, region):
+        self.region = region
+        self.lookups = 0
+
+    def get_bucket_location(self, Bucket):
+        self.lookups += 1
+        return {"LocationConstraint": self.region}
+
+
+class RegionalClients:
+    def __init__(self, s3, ecs):
+        self.s3 = s3
+        self.ecs = ecs
+
+    def client(self, service, region_name, max_pool_connections=None):
+        return self.s3 if service == "s3" else self.ecs[region_name]
+
+
+@pytest.fixture
+def placed_runner(runner):
+    runner.config["placement"] = [EAST, WEST]
+    runner.clients = RegionalClients(
+        LocatedS3("us-west-2"),
+        {"us-east-2": RegionalECS("us-east-2"), "us-west-2": RegionalECS("us-west-2")},
+    )
+    return runner
+
+
+def test_task_runs_in_bucket_region(placed_runner):
+    task_arn = placed_runner.submit_task(ARGS)
+    placed_runner.submit_task(ARGS)
+    assert parse_task_arn(task_arn) == ("us-west-2", "c")
+    west = placed_runner.clients.ecs["us-west-2"]
+    assert west.calls[0]["cluster"] == "west"
+    assert west.calls[0]["networkConfiguration"]["awsvpcConfiguration"]["subnets"] == [
+        "subnet-w"
+    ]
+    # the bucket region is looked up once
+    assert placed_runner.clients.s3.lookups == 1
+
+
+def test_next_placement_when_no_capacity(placed_runner):
+    placed_runner.clients.ecs["us-west-2"].capacity = False
+    task_arn = placed_runner.submit_task(ARGS)
+    assert parse_task_arn(task_arn)[0] == "us-east-2"
+    assert placed_runner.run_history.runs()[0]["cluster"] == "east"
+
+
+def test_no_capacity_anywhere_raises(placed_runner):
+    for ecs in placed_runner.clients.ecs.values():
+        ecs.capacity = False
+    with pytest.raises(TaskNotStartedError):
+        placed_runner.submit_task(ARGS)
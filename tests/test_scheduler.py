@@ -0,0 +1,175 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from bidrunner2.scheduler import (
+    SubmissionScheduler,
+    TaskNotStartedError,
+    TokenBucket,
+    is_capacity_error,
+    is_retryable,
+)
+
+
+def throttled():
+    return ClientError({"Error": {"Code": "ThrottlingException"}}, "RunTask")
+
+
+class FakeRunner:
+    """
+    Submits through `submit`, a function of the bid name, and counts the tasks it
+    started as running.
+    """
+
+    def __init__(self, submit=None):
+        self.submit = submit or (lambda bid_name: f"arn/{bid_name}")
+        self.started = []
+        self.lock = threading.Lock()
+        self.tracker = self
+
+    def submit_task(self, args, cpu=None, memory=None):
+        task_arn = self.submit(args[0])
+        with self.lock:
+            self.started.append(args[0])
+        return task_arn
+
+    def active_tasks(self):
+        with self.lock:
+            return list(self.started)
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(runner, **kwargs):
+        kwargs.setdefault("base_delay", 0.01)
+        kwargs.setdefault("check_interval", 0.05)
+        scheduler = SubmissionScheduler(runner, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def test_token_bucket_bursts_then_waits():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    # waiting callers queue up behind each other
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_token_bucket_rate_zero_is_unlimited():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert [bucket.reserve() for _ in range(100)] == [0.0] * 100
+
+
+@pytest.mark.parametrize("rate, burst", [(-1, 1), (1, 0)])
+def test_token_bucket_rejects_bad_settings(rate, burst):
+    with pytest.raises(ValueError):
+        TokenBucket(rate=rate, burst=burst)
+
+
+def test_is_retryable():
+    no_capacity = TaskNotStartedError(["Capacity is unavailable at this time"])
+    assert is_capacity_error(no_capacity)
+    assert is_retryable(no_capacity)
+    assert is_retryable(throttled())
+    assert not is_retryable(TaskNotStartedError(["MISSING"]))
+    assert not is_retryable(ClientError({"Error": {"Code": "AccessDenied"}}, "RunTask"))
+    assert not is_retryable(ValueError("bad"))
+
+
+def test_higher_priority_submitted_first(make_scheduler):
+    runner = FakeRunner()
+    scheduler = make_scheduler(runner, max_running=0)
+    jobs = [
+        scheduler.submit(["low"]),
+        scheduler.submit(["urgent"], priority=10),
+        scheduler.submit(["also-low"]),
+    ]
+    assert [job["bid_name"] for job in scheduler.pending()] == [
+        "urgent",
+        "low",
+        "also-low",
+    ]
+    scheduler.max_running = 10
+    scheduler.wake()
+    assert scheduler.wait(jobs, timeout=5)
+    assert runner.started == ["urgent", "low", "also-low"]
+
+
+def test_throttled_submission_retried(make_scheduler):
+    failures = {"bid": 2}
+
+    def submit(bid_name):
+        if failures[bid_name]:
+            failures[bid_name] -= 1
+            raise throttled()
+        return "arn/bid"
+
+    events = []
+    scheduler = make_scheduler(
+        FakeRunner(submit), on_event=lambda event, job: events.append(event)
+    )
+    job = scheduler.submit(["bid"])
+    assert scheduler.wait([job], timeout=5)
+    assert job["state"] == "submitted"
+    assert job["attempts"] == 3
+    assert job["error"] is None
+    assert events == ["queued", "retry", "retry", "submitted"]
+
+
+def test_retries_give_up(make_scheduler):
+    def submit(bid_name):
+        raise throttled()
+
+    scheduler = make_scheduler(FakeRunner(submit), max_retries=2)
+    job = scheduler.submit(["bid"])
+    assert scheduler.wait([job], timeout=5)
+    assert job["state"] == "failed"
+    assert job["attempts"] == 3
+
+
+def test_other_errors_fail_at_once(make_scheduler):
+    def submit(bid_name):
+        raise TaskNotStartedError(["MISSING"])
+
+    scheduler = make_scheduler(FakeRunner(submit))
+    job = scheduler.submit(["bid"])
+    assert scheduler.wait([job], timeout=5)
+    assert job["state"] == "failed"
+    assert job["attempts"] == 1
+
+
+def test_workers_and_max_running(make_scheduler):
+    lock = threading.Lock()
+    in_flight = []
+    peak = []
+
+    def submit(bid_name):
+        with lock:
+            in_flight.append(bid_name)
+            peak.append(len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.remove(bid_name)
+        return f"arn/{bid_name}"
+
+    runner = FakeRunner(submit)
+    scheduler = make_scheduler(runner, workers=3, max_running=5)
+    jobs = [scheduler.submit([f"bid-{i}"]) for i in range(8)]
+    # the tasks started keep running, so only max_running bids are submitted
+    assert not scheduler.wait(jobs, timeout=0.5)
+    assert len(runner.started) == 5
+    assert max(peak) <= 3
+    with runner.lock:
+        runner.started.clear()
+    scheduler.wake()
+    assert scheduler.wait(jobs, timeout=5)
@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+
+from bidrunner2.bench import StubECS, StubPaginator, make_runner
+from bidrunner2.sizing import (
+    DEFAULT_CPU,
+    DEFAULT_MEMORY,
+    fit_size,
+    input_profile,
+    recommend_size,
+    task_size,
+    valid_size,
+)
+
+ARGS = ["bid-a", "auction-1/", "auction_1.shp", "bid-a/"]
+
+
+def run(input_bytes, feature_count, cpu=None, memory=None, exit_code=0, minutes=10):
+    return {
+        "input_bytes": input_bytes,
+        "feature_count": feature_count,
+        "cpu": cpu,
+        "memory": memory,
+        "exit_code": exit_code,
+        "stopped_reason": "OutOfMemoryError" if exit_code == 137 else "",
+        "started_at": 0,
+        "stopped_at": minutes * 60,
+    }
+
+
+def test_valid_and_fit_size():
+    assert valid_size(1024, 3072)
+    assert not valid_size(1024, 1024)
+    assert fit_size(1024, 9000) == (2048, 9216)
+    assert fit_size(100, 100) == (256, 512)
+    assert fit_size(10**6, 10**6) == (16384, 122880)
+
+
+@pytest.mark.parametrize(
+    "cpu, memory, size",
+    [
+        (None, None, (None, None)),
+        ("", "", (None, None)),
+        (2048, 4096, (2048, 4096)),
+        # the missing half comes from the task definition, fitted to a Fargate size
+        (4096, None, (4096, 8192)),
+        ("512", None, (512, 3072)),
+        (None, 16384, (2048, 16384)),
+        (None, 2048, (1024, 2048)),
+    ],
+)
+def test_task_size(cpu, memory, size):
+    assert task_size(cpu, memory) == size
+
+
+def test_task_size_rejects_invalid_pairs():
+    with pytest.raises(ValueError, match="no task size of 4096 cpu / 3072 MiB"):
+        task_size(4096, 3072)
+
+
+def test_one_sided_size_overrides(runner):
+    overrides = runner.task_overrides(ARGS, cpu=4096)
+    assert (overrides["cpu"], overrides["memory"]) == ("4096", "8192")
+    overrides = runner.task_overrides(ARGS, memory=16384)
+    assert (overrides["cpu"], overrides["memory"]) == ("2048", "16384")
+    assert "cpu" not in runner.task_overrides(ARGS)
+
+
+def test_input_profile_counts_features_from_shx():
+    sizes = {"auction_1.shp": 5000, "auction_1.SHX": 100 + 8 * 42, "data.csv": 64}
+    assert input_profile(sizes, "auction_1.shp") == {
+        "input_bytes": 5000 + 436 + 64,
+        "feature_count": 42,
+    }
+    assert input_profile({"a.csv": 1}, "auction_1.shp")["feature_count"] is None
+
+
+def test_recommend_without_history():
+    suggestion = recommend_size([], input_bytes=10**9, feature_count=1000)
+    assert (suggestion["cpu"], suggestion["memory"]) == (DEFAULT_CPU, DEFAULT_MEMORY)
+    assert suggestion["runs"] == 0
+
+
+def test_recommend_smallest_size_that_worked_for_larger_input():
+    runs = [
+        run(2 * 10**9, 2000, cpu=2048, memory=8192),
+        run(3 * 10**9, 3000, cpu=4096, memory=16384),
+        run(10**6, 10, cpu=256, memory=512),
+    ]
+    suggestion = recommend_size(runs, input_bytes=10**9, feature_count=1000)
+    assert (suggestion["cpu"], suggestion["memory"]) == (2048, 8192)
+
+
+def test_recommend_doubles_memory_after_out_of_memory():
+    runs = [run(2 * 10**9, 2000, exit_code=137)]
+    suggestion = recommend_size(runs, input_bytes=2 * 10**9, feature_count=2000)
+    assert suggestion["memory"] == 2 * DEFAULT_MEMORY
+    assert "ran out of memory" in suggestion["reason"]
+
+
+def test_recommend_doubles_cpu_for_slow_runs():
+    runs = [run(10**9, 1000, minutes=120)]
+    suggestion = recommend_size(
+        runs, input_bytes=10**9, feature_count=1000, target_seconds=3600
+    )
+    assert suggestion["cpu"] == 2 * DEFAULT_CPU
+
+
+class ProfiledS3:
+    """
+    An input folder with a shapefile of 42 features, blocking listings until
+    `listing` is set.
+    """
+
+    def __init__(self):
+        self.listing = threading.Event()
+        self.listings = 0
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        assert self.listing.wait(5)
+        self.listings += 1
+        return {
+            "Contents": [
+                {"Key": Prefix + "auction_1.shx", "Size": 100 + 8 * 42},
+                {"Key": Prefix + "data.csv", "Size": 1000},
+            ]
+        }
+
+    def get_paginator(self, name):
+        return StubPaginator(getattr(self, name))
+
+
+@pytest.fixture
+def s3():
+    return ProfiledS3()
+
+
+@pytest.fixture
+def runner(tmp_path, s3):
+    runner = make_runner(tmp_path, ecs=StubECS(), s3=s3)
+    yield runner
+    s3.listing.set()
+    runner.scheduler.stop()
+
+
+def test_submission_does_not_wait_for_input_profile(runner, s3):
+    arns = [runner.submit_task(ARGS) for _ in range(3)]
+    runs = runner.run_history.runs()
+    assert [r["input_bytes"] for r in runs] == [None] * 3
+
+    s3.listing.set()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        runs = {r["task_arn"]: r for r in runner.run_history.runs()}
+        if all(run["input_bytes"] is not None for run in runs.values()):
+            break
+        time.sleep(0.01)
+    assert [runs[arn]["input_bytes"] for arn in arns] == [1436] * 3
+    assert [runs[arn]["feature_count"] for arn in arns] == [42] * 3
+    # bids of the same folder list it once
+    assert s3.listings == 1
+
+    runner.submit_task(ARGS)
+    assert runner.run_history.runs()[0]["feature_count"] == 42
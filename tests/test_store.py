@@ -0,0 +1,77 @@
+import pytest
+
+from bidrunner2.bench import QUEUE_URL, StubSQS, make_runner
+from bidrunner2.store import MessageStore
+
+
+def message(n, bid_name="bid-1", sent=None):
+    return {
+        "id": f"m{n}",
+        "bid_name": bid_name,
+        "sent_timestamp": 1700000000000 + (n if sent is None else sent),
+        "body": f"progress {n}",
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MessageStore(tmp_path / "messages.db")
+    yield store
+    store.close()
+
+
+def test_redelivered_messages_stored_once(store):
+    assert store.add_messages([message(1), message(2)]) == [message(1), message(2)]
+    assert store.add_messages([message(2), message(3)]) == [message(3)]
+    assert [m["id"] for m in store.messages_for("bid-1")] == ["m1", "m2", "m3"]
+
+
+def test_messages_for_each_bid_in_sent_order(store):
+    store.add_messages(
+        [message(1, sent=30), message(2, "bid-2"), message(3, sent=10), message(4)]
+    )
+    assert [m["id"] for m in store.messages_for("bid-1")] == ["m4", "m3", "m1"]
+    assert [m["id"] for m in store.messages_for("bid-2")] == ["m2"]
+    assert store.messages_for("bid-3") == []
+    assert [(b["bid_name"], b["messages"]) for b in store.bid_names()] == [
+        ("bid-1", 3),
+        ("bid-2", 1),
+    ]
+
+
+def test_messages_after_cursor(store):
+    # messages sent in the same millisecond are ordered by id
+    store.add_messages([message(n, sent=n // 2) for n in range(1, 7)])
+    first = store.messages_for("bid-1", limit=3)
+    assert [m["id"] for m in first] == ["m1", "m2", "m3"]
+    after = (first[-1]["sent_timestamp"], first[-1]["id"])
+    assert [m["id"] for m in store.messages_for("bid-1", after=after)] == [
+        "m4",
+        "m5",
+        "m6",
+    ]
+
+
+def test_store_survives_restart(tmp_path):
+    store = MessageStore(tmp_path / "messages.db")
+    store.add_messages([message(1)])
+    store.close()
+    store = MessageStore(tmp_path / "messages.db")
+    assert store.add_messages([message(1)]) == []
+    assert [m["body"] for m in store.messages_for("bid-1")] == ["progress 1"]
+    store.close()
+
+
+def test_queue_messages_routed_to_their_bids(tmp_path):
+    sqs = StubSQS(messages=25, bids=5)
+    runner = make_runner(tmp_path, sqs=sqs)
+    while messages := runner.sqs_receive_messages(QUEUE_URL, wait_time=0):
+        runner.sqs_store_messages(QUEUE_URL, messages)
+    assert sqs.messages == {}
+    assert [m["id"] for m in runner.message_store.messages_for("bid-3")] == [
+        "m3",
+        "m8",
+        "m13",
+        "m18",
+        "m23",
+    ]
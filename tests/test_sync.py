@@ -0,0 +1,116 @@
+import hashlib
+import os
+
+from bidrunner2 import sync
+from bidrunner2.bench import StubPaginator
+from bidrunner2.sync import (
+    FolderScanner,
+    SyncIndex,
+    compute_sync_delta,
+    likely_unchanged,
+    s3_etag,
+)
+
+MB = 1024 * 1024
+
+
+class StubBucket:
+    """
+    Objects of one bucket, listed 2 keys per page.
+    """
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = {
+            "Contents": [
+                {
+                    "Key": key,
+                    "ETag": f'"{hashlib.md5(self.objects[key]).hexdigest()}"',
+                    "Size": len(self.objects[key]),
+                }
+                for key in keys[start : start + 2]
+            ]
+        }
+        if start + 2 < len(keys):
+            page["NextContinuationToken"] = str(start + 2)
+        return page
+
+    def get_paginator(self, name):
+        return StubPaginator(getattr(self, name))
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def delta(index, bucket, source):
+    return compute_sync_delta(
+        index, bucket, str(source), "bucket", "auction-1/", 8 * MB, 8 * MB
+    )
+
+
+def test_compute_sync_delta(tmp_path):
+    source = tmp_path / "local"
+    write(source / "same.csv", b"same")
+    write(source / "nested" / "edited.csv", b"edited locally")
+    write(source / "new.csv", b"new")
+    bucket = StubBucket(
+        {
+            "auction-1/same.csv": b"same",
+            "auction-1/nested/edited.csv": b"as uploaded",
+            "auction-1/gone.csv": b"gone",
+        }
+    )
+    result = delta(SyncIndex(tmp_path / "sync.db"), bucket, source)
+    assert result["new"] == ["new.csv"]
+    assert result["changed"] == ["nested/edited.csv"]
+    assert result["unchanged"] == ["same.csv"]
+    assert result["deleted"] == ["gone.csv"]
+
+
+def test_unchanged_files_are_not_hashed_again(tmp_path, monkeypatch):
+    source = tmp_path / "local"
+    write(source / "a.csv", b"a")
+    write(source / "b.csv", b"b")
+    bucket = StubBucket({"auction-1/a.csv": b"a", "auction-1/b.csv": b"b"})
+    index = SyncIndex(tmp_path / "sync.db")
+    first = delta(index, bucket, source)
+    index.update(first["destination"], first["entries"])
+
+    def no_hashing(*args):
+        raise AssertionError("unchanged files were hashed")
+
+    monkeypatch.setattr(sync, "s3_etag", no_hashing)
+    second = delta(index, bucket, source)
+    assert sorted(second["unchanged"]) == ["a.csv", "b.csv"]
+    assert likely_unchanged(index, str(source), first["destination"]) == (2, 2)
+
+
+def test_multipart_etag(tmp_path):
+    path = tmp_path / "large.bin"
+    data = os.urandom(5 * 1024)
+    path.write_bytes(data)
+    parts = [data[i : i + 2048] for i in range(0, len(data), 2048)]
+    expected = hashlib.md5(b"".join(hashlib.md5(p).digest() for p in parts))
+    assert s3_etag(path, 2048, 4096) == f"{expected.hexdigest()}-3"
+    assert s3_etag(path, 2048, 8192) == hashlib.md5(data).hexdigest()
+
+
+def test_folder_scanner_lists_only_changed_directories(tmp_path):
+    write(tmp_path / "a" / "one.csv", b"1")
+    write(tmp_path / "b" / "two.csv", b"22")
+    scanner = FolderScanner()
+    totals = scanner.scan(tmp_path)
+    assert (totals["files"], totals["bytes"], totals["listed"]) == (2, 3, 3)
+
+    write(tmp_path / "b" / "three.csv", b"333")
+    # adding a file changes the mtime of b/ only, set apart in case the clock did
+    # not tick between the scans
+    os.utime(tmp_path / "b", ns=(0, 1))
+    totals = scanner.scan(tmp_path)
+    assert (totals["files"], totals["bytes"], totals["listed"]) == (3, 6, 1)
@@ -0,0 +1,66 @@
+from bidrunner2.tracker import TaskTracker
+
+
+def arn(n, region="us-east-2", cluster="c"):
+    return f"arn:aws:ecs:{region}:1:task/{cluster}/{n}"
+
+
+def test_describe_batches_per_region_cluster_and_hundred_tasks():
+    tracker = TaskTracker(None)
+    for n in range(150):
+        tracker.track("c", arn(n))
+    tracker.track("west", arn("w", "us-west-2", "west"))
+    batches = [(r, c, len(arns)) for r, c, arns in tracker.describe_batches()]
+    assert batches == [
+        ("us-east-2", "c", 100),
+        ("us-east-2", "c", 50),
+        ("us-west-2", "west", 1),
+    ]
+
+
+def test_apply_responses():
+    tracker = TaskTracker(None)
+    tracker.track("c", arn(1), bid_name="bid-a")
+    tracker.track("c", arn(2), bid_name="bid-b")
+    described = {
+        "taskArn": arn(1),
+        "lastStatus": "STOPPED",
+        "stopCode": "EssentialContainerExited",
+        "containers": [{"exitCode": 137}],
+    }
+    missing = {"arn": arn(2), "reason": "MISSING"}
+    response = {"tasks": [described], "failures": [missing]}
+    assert tracker.apply_responses([response]) == [arn(1), arn(2)]
+    # stopped tasks are not described again, an unchanged one is not reported
+    assert tracker.apply_responses([{"tasks": [described]}]) == []
+    tasks = {t["task_arn"]: t for t in tracker.snapshot()}
+    assert tasks[arn(1)]["exit_code"] == 137
+    assert tasks[arn(2)]["stopped_reason"] == "task no longer exists"
+    assert tracker.active_tasks() == []
+
+
+def test_refresh_saves_history(runner):
+    runner.tracker.track("bench", arn(1, cluster="bench"))
+    runner.run_history.record_submission(arn(1, cluster="bench"), "bench", ["bid-a"])
+    assert runner.tracker.refresh() == [arn(1, cluster="bench")]
+    assert runner.run_history.runs()[0]["status"] == "RUNNING"
+
+
+def test_next_interval_backs_off():
+    tracker = TaskTracker(None, fast_interval=2, slow_interval=10, max_interval=20)
+    assert tracker.next_interval() is None
+    tracker.track("c", arn(1))
+    assert tracker.next_interval() == 2
+    tracker.apply_responses([{"tasks": [{"taskArn": arn(1), "lastStatus": "RUNNING"}]}])
+    assert tracker.next_interval(changed=True) == 10
+    assert tracker.next_interval(changed=False) == 15
+    assert tracker.next_interval(changed=False) == 20
+    assert tracker.next_interval(changed=False) == 20
+
+
+def test_tracking_wakes_the_loop():
+    tracker = TaskTracker(None)
+    tracker.clear_wake()
+    assert not tracker.woken
+    tracker.track("c", arn(1))
+    assert tracker.woken
@@ -0,0 +1,159 @@
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from botocore.hooks import HierarchicalEmitter
+
+from bidrunner2.bench import StubS3
+from bidrunner2.transfer import MIN_PART_SIZE, TransferProgress, UploadEngine
+
+
+class StubUploads(StubS3):
+    """
+    The benchmark S3 stand-in with objects and multipart uploads, failing the parts
+    numbered in `fail_parts`.
+    """
+
+    def __init__(self):
+        super().__init__(0)
+        # s3transfer registers its handlers on the client's events and reads its config
+        self.meta = SimpleNamespace(
+            events=HierarchicalEmitter(),
+            config=Config(request_checksum_calculation="when_required"),
+        )
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+        self.puts = []
+        self.sent_parts = []
+        self.fail_parts = set()
+
+    def put_object(self, Bucket, Key, Body, **params):
+        self.puts.append(Key)
+        self.objects[Key] = Body.read()
+        return {"ETag": '"put"'}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber in self.fail_parts:
+            raise ConnectionError(f"reset while sending part {PartNumber}")
+        self.sent_parts.append(PartNumber)
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def list_parts(self, Bucket, Key, UploadId, **params):
+        if UploadId not in self.uploads:
+            raise ClientError({"Error": {"Code": "NoSuchUpload"}}, "ListParts")
+        return {
+            "Parts": [
+                {"PartNumber": n, "ETag": f'"{hashlib.md5(body).hexdigest()}"'}
+                for n, body in sorted(self.uploads[UploadId].items())
+            ]
+        }
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        assert numbers == sorted(parts)
+        self.objects[Key] = b"".join(parts[n] for n in numbers)
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+        self.uploads.pop(UploadId, None)
+        return {}
+
+
+@pytest.fixture
+def s3():
+    return StubUploads()
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / "auction-1"
+    source.mkdir()
+    # three parts, the last one short
+    (source / "large.bin").write_bytes(os.urandom(2 * MIN_PART_SIZE + 1024))
+    (source / "small.csv").write_bytes(b"field_id,acres\nf1,10\n")
+    return source
+
+
+def upload(s3, source, state_dir):
+    engine = UploadEngine(s3, part_size=MIN_PART_SIZE, state_dir=state_dir)
+    results = engine.upload_directory(
+        str(source), "bucket", "auction-1/", progress=TransferProgress()
+    )
+    return dict(results)
+
+
+def test_small_files_are_put_large_ones_sent_in_parts(s3, source, tmp_path):
+    assert upload(s3, source, tmp_path / "state") == {
+        "large.bin": None,
+        "small.csv": None,
+    }
+    assert s3.puts == ["auction-1/small.csv"]
+    assert sorted(s3.sent_parts) == [1, 2, 3]
+    for name in ("large.bin", "small.csv"):
+        assert s3.objects[f"auction-1/{name}"] == (source / name).read_bytes()
+
+
+def test_interrupted_upload_sends_only_missing_parts(s3, source, tmp_path):
+    s3.fail_parts = {2}
+    assert "reset" in upload(s3, source, tmp_path / "state")["large.bin"]
+    assert "auction-1/large.bin" not in s3.objects
+
+    s3.fail_parts = set()
+    s3.sent_parts = []
+    assert upload(s3, source, tmp_path / "state")["large.bin"] is None
+    assert s3.sent_parts == [2]
+    assert s3.aborted == []
+    assert s3.objects["auction-1/large.bin"] == (source / "large.bin").read_bytes()
+
+
+def test_changed_file_restarts_upload(s3, source, tmp_path):
+    s3.fail_parts = {2}
+    upload(s3, source, tmp_path / "state")
+    (first_upload,) = s3.uploads
+
+    data = os.urandom(2 * MIN_PART_SIZE + 1024)
+    (source / "large.bin").write_bytes(data)
+    s3.fail_parts = set()
+    s3.sent_parts = []
+    assert upload(s3, source, tmp_path / "state")["large.bin"] is None
+    assert s3.aborted == [first_upload]
+    assert sorted(s3.sent_parts) == [1, 2, 3]
+    assert s3.objects["auction-1/large.bin"] == data
+
+
+def test_upload_gone_from_s3_starts_over(s3, source, tmp_path):
+    s3.fail_parts = {2}
+    upload(s3, source, tmp_path / "state")
+    # e.g. removed by a lifecycle rule for incomplete uploads
+    s3.uploads.clear()
+    s3.fail_parts = set()
+    s3.sent_parts = []
+    assert upload(s3, source, tmp_path / "state")["large.bin"] is None
+    assert sorted(s3.sent_parts) == [1, 2, 3]
+
+
+def test_other_part_size_restarts_upload(s3, source, tmp_path):
+    s3.fail_parts = {2}
+    upload(s3, source, tmp_path / "state")
+    (first_upload,) = s3.uploads
+
+    s3.fail_parts = set()
+    s3.sent_parts = []
+    engine = UploadEngine(s3, part_size=2 * MIN_PART_SIZE, state_dir=tmp_path / "state")
+    results = engine.upload_directory(str(source), "bucket", "auction-1/")
+    assert dict(results)["large.bin"] is None
+    assert s3.aborted == [first_upload]
+    assert sorted(s3.sent_parts) == [1, 2]
+    assert s3.objects["auction-1/large.bin"] == (source / "large.bin").read_bytes()